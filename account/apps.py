@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AccountConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'account'
+
+    def ready(self):
+        # 注册缓存失效等信号处理与系统检查
+        from . import checks, signals  # noqa: F401
@@ -0,0 +1,141 @@
+from functools import partial
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from .conditional import (
+    cached_list_content,
+    detail_validators,
+    is_conditional,
+    list_validators,
+    not_modified,
+    set_validators,
+)
+from .metadata import get_field_map, get_page_layout
+from .materialize import load_overflow
+from .models import Account
+from .pagination import AccountPagination
+from .queries import account_list_queryset, map_account, parse_sort_params
+from .sharding import locate_account, reset_shard, shard_for, use_shard
+from .timing import span
+from .views import account_detail_data
+
+# 账户列表与详情的异步实现（ASGI 下使用），返回数据与 MainViewSet.list / retrieve 相同；
+# 账户查询使用异步 ORM，元数据与计数读取缓存，未命中时经 sync_to_async 在线程中查询
+
+
+def _json_response(data, status_code=status.HTTP_200_OK):
+    return HttpResponse(JSONRenderer().render(data), status=status_code, content_type="application/json")
+
+
+async def _list_content(request, object_id, field_map, sort_field, sort_order):
+    """查询、分页并映射一页账户，返回 JSON 字节串；页码无效时抛出 NotFound，不写入缓存"""
+    with span("query"):
+        # 与 MainViewSet.list 相同的数据源（含物化表）、搜索与排序
+        queryset = Account.objects.filter(deleted="0", object_id=object_id)
+        sorted_queryset = await sync_to_async(account_list_queryset)(
+            queryset, request.query_params, object_id, field_map, sort_field, sort_order
+        )
+    paginator = AccountPagination()
+    with span("paginate"):
+        page = await paginator.apaginate_queryset(sorted_queryset, request)
+    with span("render"):
+        await sync_to_async(load_overflow)(page)
+        result = [map_account(account, field_map) for account in page]
+        return JSONRenderer().render(paginator.get_paginated_response(result).data)
+
+
+@require_GET
+async def account_list(request):
+    """异步获取账户列表，参数同 GET /api/main/（不支持 cursor 游标分页）"""
+    request = Request(request)
+    token = None
+    try:
+        object_id = request.query_params.get("object_id")
+        if not object_id:
+            return _json_response({"error": "缺少 object_id 参数"}, status.HTTP_400_BAD_REQUEST)
+        sort_field, sort_order = parse_sort_params(request.query_params)
+        token = use_shard(await sync_to_async(shard_for)(object_id))
+
+        with span("metadata"):
+            field_map, error = await sync_to_async(get_field_map)(object_id)
+        if error:
+            return _json_response({"error": error}, status.HTTP_404_NOT_FOUND)
+
+        etag, last_modified = await sync_to_async(list_validators)(object_id, request.query_params)
+        response = not_modified(request, etag, last_modified)
+        if response is not None:
+            return response
+
+        build = partial(_list_content, request, object_id, field_map, sort_field, sort_order)
+        if settings.ACCOUNT_LIST_CACHE_TIMEOUT > 0:
+            # 缓存读取与防击穿等待在线程中进行，未命中时回到事件循环执行异步查询
+            content = await sync_to_async(cached_list_content)(
+                object_id, etag, request.build_absolute_uri(), async_to_sync(build)
+            )
+        else:
+            content = await build()
+        response = HttpResponse(content, content_type="application/json")
+        return set_validators(response, etag, last_modified)
+    except ValidationError as e:
+        return _json_response(e.detail, status.HTTP_400_BAD_REQUEST)
+    except APIException as e:
+        return _json_response({"error": str(e.detail)}, e.status_code)
+    except Exception as e:
+        return _json_response(
+            {"code": 500, "error": f"服务器内部错误: {str(e)}"}, status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+    finally:
+        if token is not None:
+            reset_shard(token)
+
+
+@require_GET
+async def account_detail(request, pk):
+    """异步获取账户详情，参数同 GET /api/main/<id>/"""
+    token = None
+    try:
+        pagelist_id = request.GET.get("pagelist_id")
+        if not pagelist_id:
+            return _json_response({"error": "缺少 pagelist_id"}, status.HTTP_400_BAD_REQUEST)
+        token = use_shard(await sync_to_async(locate_account)(pk))
+
+        # 条件请求先只读取 updated_at，未修改时返回 304
+        if is_conditional(request):
+            with span("query"):
+                version = await Account.objects.filter(id=pk, deleted="0").values_list("id", "updated_at").afirst()
+            if version is None:
+                return _json_response({"error": "账户不存在"}, status.HTTP_404_NOT_FOUND)
+            validators = await sync_to_async(detail_validators)(*version, pagelist_id)
+            response = not_modified(request, *validators)
+            if response is not None:
+                return response
+
+        try:
+            with span("query"):
+                account = await Account.objects.aget(id=pk, deleted="0")
+        except Account.DoesNotExist:
+            return _json_response({"error": "账户不存在"}, status.HTTP_404_NOT_FOUND)
+
+        with span("metadata"):
+            page_layout = await sync_to_async(get_page_layout)(pagelist_id)
+        if page_layout is None:
+            return _json_response({"error": "PageLayout 未找到"}, status.HTTP_404_NOT_FOUND)
+
+        with span("render"):
+            response = _json_response(account_detail_data(account, page_layout))
+        validators = await sync_to_async(detail_validators)(account.id, account.updated_at, pagelist_id)
+        return set_validators(response, *validators)
+    except Exception as e:
+        return _json_response(
+            {"error": f"服务器内部错误: {str(e)}"}, status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+    finally:
+        if token is not None:
+            reset_shard(token)
@@ -0,0 +1,10 @@
+from django.db.backends.mysql import base
+
+from account.pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    """使用连接池的 MySQL 后端（ENGINE = "account.backends.mysql"）"""
+
+    def ping_connection(self, conn):
+        conn.ping()
@@ -0,0 +1,14 @@
+from django.db.backends.sqlite3 import base
+
+from account.pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    """使用连接池的 SQLite 后端（ENGINE = "account.backends.sqlite3"），用于本地验证连接池；内存数据库不使用连接池"""
+
+    @property
+    def pool_enabled(self):
+        return not self.is_in_memory_db() and super().pool_enabled
+
+    def ping_connection(self, conn):
+        conn.execute("SELECT 1").fetchone()
@@ -0,0 +1,171 @@
+import asyncio
+import json
+import math
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import ThreadSensitiveContext
+from django.db import close_old_connections, connections
+from django.test.utils import CaptureQueriesContext
+
+# 写入结果 JSON 的百分位
+PERCENTILES = (50, 90, 95, 99)
+
+
+def percentile(values, pct):
+    """最近秩法百分位"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class Scenario:
+    """一个基准场景：请求方法、路径、参数，以及每次请求前生成请求体/路径的可选回调"""
+
+    def __init__(self, name, method, path, params=None, body=None, prepare=None):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.params = params or {}
+        self.body = body
+        self.prepare = prepare
+
+    def request(self, client, i):
+        path, body = self.path, self.body
+        if self.prepare is not None:
+            path, body = self.prepare(i)
+        handler = getattr(client, self.method)
+        if self.method == "get":
+            return handler(path, self.params)
+        return handler(path, json.dumps(body), content_type="application/json")
+
+
+@contextmanager
+def capture_queries():
+    """记录全部数据库别名（default、副本、分片）上执行的查询，产出各别名的 CaptureQueriesContext"""
+    with ExitStack() as stack:
+        yield [stack.enter_context(CaptureQueriesContext(connections[alias])) for alias in connections]
+
+
+def run_scenario(client, scenario, repeat, warmup=0):
+    """执行场景 warmup + repeat 次，统计耗时（毫秒）、查询数与查询总耗时（合计全部数据库别名）"""
+    for i in range(warmup):
+        scenario.request(client, i)
+
+    timings = []
+    query_counts = []
+    query_times = []
+    statuses = set()
+    for i in range(warmup, warmup + repeat):
+        with capture_queries() as contexts:
+            start = time.perf_counter()
+            response = scenario.request(client, i)
+            timings.append((time.perf_counter() - start) * 1000)
+        queries = [query for ctx in contexts for query in ctx.captured_queries]
+        statuses.add(response.status_code)
+        query_counts.append(len(queries))
+        query_times.append(sum(float(q["time"]) for q in queries) * 1000)
+
+    result = {
+        "method": scenario.method.upper(),
+        "path": scenario.path,
+        "params": scenario.params,
+        "status": sorted(statuses),
+        "count": repeat,
+        "mean_ms": round(statistics.fmean(timings), 3),
+        "max_ms": round(max(timings), 3),
+        "queries": max(query_counts),
+        "query_ms": round(statistics.median(query_times), 3),
+    }
+    for pct in PERCENTILES:
+        result[f"p{pct}_ms"] = round(percentile(timings, pct), 3)
+    return result
+
+
+def compare_results(baseline, current, threshold, metric="p50_ms"):
+    """与基线对比，返回回归列表 [(场景, 说明)]
+
+    耗时超过基线 (1 + threshold) 倍，或查询数多于基线，视为回归；基线中没有的场景忽略。
+    """
+    regressions = []
+    previous = baseline.get("scenarios", {})
+    for name, result in current["scenarios"].items():
+        before = previous.get(name)
+        if before is None:
+            continue
+        if result["queries"] > before["queries"]:
+            regressions.append((name, f"查询数 {before['queries']} -> {result['queries']}"))
+        if before.get(metric) and result[metric] > before[metric] * (1 + threshold):
+            regressions.append(
+                (name, f"{metric} {before[metric]:.2f} -> {result[metric]:.2f} (+{result[metric] / before[metric] - 1:.0%})")
+            )
+    return regressions
+
+
+def summarize_load(latencies, statuses, elapsed, concurrency):
+    """汇总一轮固定并发负载：吞吐量（请求/秒）与客户端视角的延迟百分位（含排队等待）"""
+    result = {
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "status": sorted(set(statuses)),
+        "mean_ms": round(statistics.fmean(latencies), 3) if latencies else 0.0,
+    }
+    for pct in PERCENTILES:
+        result[f"p{pct}_ms"] = round(percentile(latencies, pct), 3)
+    return result
+
+
+def run_sync_load(make_client, paths, concurrency, workers):
+    """同步负载：workers 个线程各自串行处理请求（模拟同步 worker），客户端保持 concurrency 个请求在途
+
+    paths 为依次发送的 GET 路径，make_client() 为每个线程创建 django.test.Client。
+    """
+    local = threading.local()
+    in_flight = threading.Semaphore(concurrency)
+    latencies, statuses = [], []
+    lock = threading.Lock()
+
+    def handle(path, submitted):
+        try:
+            client = getattr(local, "client", None)
+            if client is None:
+                client = local.client = make_client()
+            status = client.get(path).status_code
+            with lock:
+                latencies.append((time.perf_counter() - submitted) * 1000)
+                statuses.append(status)
+        finally:
+            close_old_connections()
+            in_flight.release()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for path in paths:
+            in_flight.acquire()
+            executor.submit(handle, path, time.perf_counter())
+    return summarize_load(latencies, statuses, time.perf_counter() - start, concurrency)
+
+
+async def run_async_load(client, paths, concurrency):
+    """异步负载：单个事件循环内经 django.test.AsyncClient 保持 concurrency 个请求在途"""
+    in_flight = asyncio.Semaphore(concurrency)
+    latencies, statuses = [], []
+
+    async def handle(path):
+        # 与 ASGIHandler 一致：每个请求的同步调用在各自的线程中执行（测试客户端不创建该上下文）
+        async with in_flight, ThreadSensitiveContext():
+            submitted = time.perf_counter()
+            response = await client.get(path)
+            latencies.append((time.perf_counter() - submitted) * 1000)
+            statuses.append(response.status_code)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(handle(path) for path in paths))
+    return summarize_load(latencies, statuses, time.perf_counter() - start, concurrency)
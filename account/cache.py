@@ -0,0 +1,182 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .routers import read_from_primary, recently_written
+from .timing import current_timer
+
+_MISSING = object()
+
+# 等待其他 worker 生成缓存时的轮询间隔（秒）
+STAMPEDE_POLL_INTERVAL = 0.05
+
+# 所有已创建的缓存实例，用于统一输出命中率
+_registry = []
+
+
+def _record_request(namespace, hit):
+    """将命中情况计入当前请求（未启用请求计时/指标时跳过）"""
+    timer = current_timer()
+    if timer is not None:
+        timer.record_cache(namespace, hit)
+
+
+class VersionedCache:
+    """两级缓存：进程内 LRU + Django 缓存框架，按代数（generation）整体失效
+
+    代数计数器保存在 Django 缓存中，任一 worker 递增代数后，其他 worker
+    在下次读取时发现代数变化，本地条目随之作废。多进程部署必须使用共享缓存后端（见 checks.py）。
+    """
+
+    def __init__(self, namespace, maxsize_setting, timeout_setting, maxsize=512, timeout=3600):
+        self.namespace = namespace
+        self._maxsize_setting = maxsize_setting
+        self._timeout_setting = timeout_setting
+        self._default_maxsize = maxsize
+        self._default_timeout = timeout
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        _registry.append(self)
+
+    @property
+    def maxsize(self):
+        return getattr(settings, self._maxsize_setting, self._default_maxsize)
+
+    @property
+    def timeout(self):
+        return getattr(settings, self._timeout_setting, self._default_timeout)
+
+    def _generation_key(self, scope=None):
+        if scope is None:
+            return f"crm:{self.namespace}:gen"
+        return f"crm:{self.namespace}:gen:{scope}"
+
+    def _shared_key(self, key, generation):
+        digest = hashlib.md5(repr(key).encode("utf-8")).hexdigest()
+        return f"crm:{self.namespace}:{generation}:{digest}"
+
+    def generation(self, scope=None):
+        """读取当前代数，不存在时初始化"""
+        key = self._generation_key(scope)
+        value = cache.get(key)
+        if value is None:
+            cache.add(key, time.time_ns(), None)
+            value = cache.get(key)
+        return value
+
+    def invalidate(self, scope=None, using=None):
+        """递增代数，使该范围内的全部条目失效
+
+        在 using 的事务中调用时，提交后再递增一次：提交前并发读取者可能以新代数缓存了提交前的数据。
+        """
+        self._bump(scope)
+        if transaction.get_connection(using).in_atomic_block:
+            transaction.on_commit(partial(self._bump, scope), using=using)
+
+    def _bump(self, scope=None):
+        cache.set(self._generation_key(scope), time.time_ns(), None)
+
+    def get_or_set(self, key, builder, scope=None, lock_timeout=None):
+        """命中则直接返回，否则调用 builder() 生成并写入两级缓存
+
+        指定 lock_timeout（秒）时启用防击穿：并发未命中（含其他 worker）只有取得锁的一方调用 builder，
+        其余等待其写入共享缓存，超时后各自生成。builder 抛出异常时不缓存。
+        """
+        generations = (self.generation(),) if scope is None else (self.generation(), self.generation(scope))
+        # 拼接为不含空格的字符串，共享缓存键可用于 memcached
+        generation = "-".join(map(str, generations))
+
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is not None and entry[0] == generation:
+                self._local.move_to_end(key)
+                self.local_hits += 1
+                hit = entry[1]
+            else:
+                hit = _MISSING
+        if hit is not _MISSING:
+            _record_request(self.namespace, True)
+            return hit
+
+        shared_key = self._shared_key(key, generation)
+        value = cache.get(shared_key, _MISSING)
+        locked = False
+        if value is _MISSING and lock_timeout:
+            value, locked = self._wait_for_builder(shared_key, lock_timeout)
+        if value is _MISSING:
+            try:
+                if recently_written(max(generations)):
+                    # 刚失效时副本可能尚未同步该次写入，从主库重建，避免旧数据以新代数写入缓存
+                    with read_from_primary():
+                        value = builder()
+                else:
+                    value = builder()
+                cache.set(shared_key, value, self.timeout)
+            finally:
+                if locked:
+                    cache.delete(f"{shared_key}:lock")
+            with self._lock:
+                self.misses += 1
+            _record_request(self.namespace, False)
+        else:
+            with self._lock:
+                self.shared_hits += 1
+            _record_request(self.namespace, True)
+
+        with self._lock:
+            self._local[key] = (generation, value)
+            self._local.move_to_end(key)
+            while len(self._local) > self.maxsize:
+                self._local.popitem(last=False)
+        return value
+
+    def _wait_for_builder(self, shared_key, lock_timeout):
+        """尝试取得生成锁，返回 (值, 是否持锁)
+
+        取得锁时返回 (_MISSING, True) 由调用方生成；否则轮询共享缓存直到其他方写入，
+        超时（持锁方失败或过慢）返回 (_MISSING, False)，由调用方不持锁自行生成。
+        """
+        lock_key = f"{shared_key}:lock"
+        deadline = time.monotonic() + lock_timeout
+        while not cache.add(lock_key, os.getpid(), lock_timeout):
+            if time.monotonic() >= deadline:
+                return _MISSING, False
+            time.sleep(STAMPEDE_POLL_INTERVAL)
+            value = cache.get(shared_key, _MISSING)
+            if value is not _MISSING:
+                return value, False
+        return _MISSING, True
+
+    def clear_local(self):
+        with self._lock:
+            self._local.clear()
+
+    def stats(self):
+        with self._lock:
+            hits = self.local_hits + self.shared_hits
+            total = hits + self.misses
+            return {
+                "namespace": self.namespace,
+                "size": len(self._local),
+                "maxsize": self.maxsize,
+                "local_hits": self.local_hits,
+                "shared_hits": self.shared_hits,
+                "hits": hits,
+                "misses": self.misses,
+                "hit_ratio": round(hits / total, 4) if total else 0.0,
+            }
+
+
+def cache_stats():
+    """返回全部缓存实例的命中统计"""
+    return [c.stats() for c in _registry]
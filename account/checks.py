@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.core.checks import Error, register
+from django.core.exceptions import ImproperlyConfigured
+
+# 只在当前进程内有效的缓存后端：缓存代数无法在 worker 与管理命令之间同步
+PROCESS_LOCAL_CACHE_BACKENDS = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+def multi_process():
+    """是否以多个 worker（WEB_CONCURRENCY > 1）或 ASGI 服务器运行"""
+    return settings.WEB_CONCURRENCY > 1 or settings.ASGI_SERVER
+
+
+def check_shared_cache(app_configs, **kwargs):
+    """要求共享缓存后端，否则其他 worker 或管理命令的失效无法到达运行中的 worker"""
+    backend = settings.CACHES.get("default", {}).get("BACKEND")
+    if backend not in PROCESS_LOCAL_CACHE_BACKENDS:
+        return []
+    return [
+        Error(
+            f"缓存后端 {backend} 只在进程内有效，元数据与账户列表缓存的失效无法到达其他 worker",
+            hint="通过 CACHE_BACKEND / CACHE_LOCATION 配置 Redis 或 Memcached 等共享缓存；"
+            "确认只有单个进程时可将 account.E001 加入 SILENCED_SYSTEM_CHECKS",
+            id="account.E001",
+        )
+    ]
+
+
+@register("caches")
+def check_process_cache(app_configs, **kwargs):
+    """常规检查：多 worker 或 ASGI 下要求共享缓存（runserver、migrate 等命令执行前报错）"""
+    return check_shared_cache(app_configs) if multi_process() else []
+
+
+@register("caches", deploy=True)
+def check_deploy_cache(app_configs, **kwargs):
+    """部署检查（manage.py check --deploy）：单进程配置下同样要求共享缓存（多进程时已由常规检查报告）"""
+    return [] if multi_process() else check_shared_cache(app_configs)
+
+
+def raise_for_process_cache():
+    """服务进程启动时调用：gunicorn/uvicorn 不执行系统检查，未忽略的 account.E001 直接拒绝启动"""
+    errors = [error for error in check_process_cache(None) if not error.is_silenced()]
+    if errors:
+        raise ImproperlyConfigured(f"{errors[0].id}: {errors[0].msg}（{errors[0].hint}）")
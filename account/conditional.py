@@ -0,0 +1,90 @@
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .cache import VersionedCache
+from .metadata import field_index_cache, field_map_cache, layout_cache
+
+# 账户数据版本：按 Object 划分范围，账户写入（含合并补丁、软删除）时递增对应 Object 的代数；
+# 全局代数用于使全部 Object 失效
+account_cache = VersionedCache(
+    "accounts", "ACCOUNT_LIST_CACHE_SIZE", "ACCOUNT_LIST_CACHE_TIMEOUT"
+)
+
+
+def object_scope(object_id):
+    """Object 的版本范围名：统一为带连字符的 UUID 字符串，避免同一 Object 的不同写法对应不同版本"""
+    try:
+        return str(uuid.UUID(str(object_id)))
+    except ValueError:
+        return str(object_id)
+
+
+def invalidate_accounts(object_ids=None, using=None):
+    """账户变更后递增版本；object_ids 为空时使所有 Object 的版本失效，using 为写入所在的数据库"""
+    if object_ids is None:
+        account_cache.invalidate(using=using)
+        return
+    for scope in {object_scope(object_id) for object_id in object_ids}:
+        account_cache.invalidate(scope, using=using)
+
+
+def list_version(object_id):
+    """列表版本：(全局代数, Object 代数)，代数为 time_ns，可作为最后修改时间"""
+    return account_cache.generation(), account_cache.generation(object_scope(object_id))
+
+
+def _etag(*parts):
+    digest = hashlib.md5(":".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+    return f'W/"{digest}"'
+
+
+def list_validators(object_id, query_params):
+    """列表的 (ETag, Last-Modified 时间戳)：账户版本 + 元数据版本 + 查询参数"""
+    version = list_version(object_id)
+    params = sorted((key, value) for key in query_params for value in query_params.getlist(key))
+    etag = _etag(
+        object_id, *version, field_map_cache.generation(), field_index_cache.generation(), params
+    )
+    return etag, max(version) / 1e9
+
+
+def cached_list_content(object_id, etag, url, builder):
+    """列表响应缓存：按 ETag（含账户与元数据版本、查询参数）与完整 URL 缓存渲染后的 JSON，
+    并发未命中只生成一次"""
+    return account_cache.get_or_set(
+        ("list", etag, url),
+        builder,
+        scope=object_scope(object_id),
+        lock_timeout=settings.ACCOUNT_LIST_CACHE_LOCK_TIMEOUT,
+    )
+
+
+def detail_validators(account_id, updated_at, pagelist_id):
+    """详情的 (ETag, Last-Modified 时间戳)：账户 id + updated_at + 布局版本"""
+    etag = _etag(account_id, updated_at.isoformat(), layout_cache.generation(), pagelist_id)
+    return etag, updated_at.timestamp()
+
+
+def is_conditional(request):
+    return "HTTP_IF_NONE_MATCH" in request.META or "HTTP_IF_MODIFIED_SINCE" in request.META
+
+
+def not_modified(request, etag, last_modified):
+    """请求条件满足时返回带校验头的 304 响应，否则返回 None"""
+    response = get_conditional_response(request, etag=etag, last_modified=int(last_modified))
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified):
+    response["ETag"] = etag
+    # HTTP 日期只精确到秒；同时带 If-None-Match 时以 ETag 为准，不受此限制
+    response["Last-Modified"] = http_date(int(last_modified))
+    # 允许缓存但每次使用前必须重新验证
+    response["Cache-Control"] = "private, no-cache"
+    return response
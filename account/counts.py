@@ -0,0 +1,162 @@
+import secrets
+from collections import Counter
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Count, F
+
+from .conditional import account_cache, object_scope
+from .models import Account, AccountCount
+
+# 分页总数的来源
+EXACT = "exact"
+APPROXIMATE = "approximate"
+
+
+def object_count(object_id, using=None):
+    """Object 下未删除账户数：读取计数表，计数行不存在时统计一次并写入
+
+    统计前先写入本次统计专属的占位行（负数标记），统计期间的 adjust_counts 会删除占位行，
+    统计结果只在占位行仍在时写入，避免统计与写入之间的增量丢失；被作废的结果仅用于本次返回。
+    """
+    using = using or router.db_for_read(AccountCount)
+    count = (
+        AccountCount.objects.using(using)
+        .filter(object_id=object_id)
+        .values_list("count", flat=True)
+        .first()
+    )
+    if count is not None and count >= 0:
+        return count
+    write_using = router.db_for_write(AccountCount)
+    queryset = AccountCount.objects.using(write_using).filter(object_id=object_id)
+    marker = -1 - secrets.randbits(62)
+    # 接管未完成（或已中断）的统计留下的占位行，否则插入新的占位行
+    if not queryset.filter(count__lt=0).update(count=marker):
+        AccountCount.objects.using(write_using).bulk_create(
+            [AccountCount(object_id=object_id, count=marker)], ignore_conflicts=True
+        )
+    count = Account.objects.using(write_using).filter(object_id=object_id, deleted="0").count()
+    queryset.filter(count=marker).update(count=count)
+    return count
+
+
+def init_count(object_id, using=None):
+    """新建 Object 时写入 0 计数，之后全部由增量维护"""
+    using = using or router.db_for_write(AccountCount)
+    AccountCount.objects.using(using).bulk_create(
+        [AccountCount(object_id=object_id, count=0)], ignore_conflicts=True
+    )
+
+
+def rebuild_count(object_id, using=None):
+    """重新统计并写入计数，返回 (原计数或 None, 新计数)"""
+    using = using or router.db_for_write(AccountCount)
+    with transaction.atomic(using=using):
+        previous = (
+            AccountCount.objects.using(using)
+            .select_for_update()
+            .filter(object_id=object_id)
+            .values_list("count", flat=True)
+            .first()
+        )
+        if previous is not None and previous < 0:
+            # 统计中的占位行视为计数行不存在
+            previous = None
+        count = Account.objects.using(using).filter(object_id=object_id, deleted="0").count()
+        AccountCount.objects.using(using).update_or_create(object_id=object_id, defaults={"count": count})
+    return previous, count
+
+
+def adjust_counts(deltas, using=None):
+    """按 {object_id: 增量} 增减计数；计数行不存在时跳过，首次读取时再统计
+
+    计数行是统计中的占位行时删除它，使进行中的统计结果不被写入（见 object_count）。
+    """
+    using = using or router.db_for_write(AccountCount)
+    for object_id, delta in deltas.items():
+        if not delta:
+            continue
+        queryset = AccountCount.objects.using(using).filter(object_id=object_id)
+        if not queryset.filter(count__gte=0).update(count=F("count") + delta):
+            queryset.filter(count__lt=0).delete()
+
+
+def reset_counts(object_ids=None, using=None):
+    """删除计数行（object_ids 为空时删除全部），下次读取时重新统计"""
+    using = using or router.db_for_write(AccountCount)
+    queryset = AccountCount.objects.using(using)
+    if object_ids is not None:
+        queryset = queryset.filter(object_id__in=list(object_ids))
+    queryset.delete()
+
+
+def soft_deleted_deltas(account_ids, deleted, updated, using=None):
+    """软删除/恢复后各 Object 的计数增量，返回 (增量, 涉及的 Object)；无法确定实际变更的行时增量为 None
+
+    UPDATE 只改动了状态不同的行，之后按新状态分组统计；分组总数等于 updated 时
+    说明传入的 id 全部发生了变更，否则其中有原本已是该状态的行。
+    """
+    rows = dict(
+        Account.objects.using(using)
+        .filter(id__in=account_ids, deleted=deleted)
+        .values_list("object_id")
+        .annotate(n=Count("id"))
+        .order_by()
+    )
+    if sum(rows.values()) != updated:
+        return None, set(rows)
+    sign = -1 if deleted == "1" else 1
+    return Counter({object_id: sign * n for object_id, n in rows.items()}), set(rows)
+
+
+def estimate_count(queryset):
+    """按数据库统计信息估算查询集行数（MySQL EXPLAIN 首行的 rows × filtered%），不支持时返回 None
+
+    首行描述的是外层扫描，不反映搜索条件的选择性，只在有界统计已达到上限时使用（见 filtered_count）。
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != "mysql":
+        return None
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute("EXPLAIN " + sql, params)
+        columns = [column[0].lower() for column in cursor.description]
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    plan = dict(zip(columns, row))
+    if plan.get("rows") is None:
+        return None
+    return int(int(plan["rows"]) * float(plan.get("filtered") or 100) / 100)
+
+
+def filtered_count(queryset):
+    """过滤后的总数，返回 (count, mode)
+
+    最多精确统计 ACCOUNT_COUNT_APPROX_THRESHOLD + 1 行（有界 COUNT），未达到上限时即为精确值；
+    达到上限时改用估算值（不小于已统计的行数），mode 为 "approximate"。
+    """
+    threshold = settings.ACCOUNT_COUNT_APPROX_THRESHOLD
+    if threshold <= 0:
+        return queryset.count(), EXACT
+    count = queryset[: threshold + 1].count()
+    if count <= threshold:
+        return count, EXACT
+    return max(estimate_count(queryset) or 0, count), APPROXIMATE
+
+
+def account_count(queryset, object_id, search=""):
+    """列表分页总数，返回 (count, mode)
+
+    - 无搜索条件：读取增量维护的计数表，不扫描 t_account；
+    - 有搜索条件：按 (Object, 搜索词) 缓存，账户写入递增 Object 版本后失效；
+      结果集超过 ACCOUNT_COUNT_APPROX_THRESHOLD 时使用估算值，mode 为 "approximate"。
+    """
+    if not search:
+        return object_count(object_id, using=queryset.db), EXACT
+    if settings.ACCOUNT_LIST_CACHE_TIMEOUT <= 0:
+        return filtered_count(queryset)
+    return account_cache.get_or_set(
+        ("count", search), lambda: filtered_count(queryset), scope=object_scope(object_id)
+    )
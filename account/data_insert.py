@@ -24,6 +24,7 @@ from account.models import (
     PageListField,
     Account,
 )
+from account.signals import accounts_bulk_saved
 
 
 class DataInsert:
@@ -141,8 +142,10 @@ class DataInsert:
                     for i in range(1, 21)
                 ]
 
-                for data in accounts_data:
-                    Account.objects.create(object=self.object1, data=data)
+                # 批量写入（大文件请使用 manage.py import_accounts）
+                accounts = [Account(object=self.object1, data=data) for data in accounts_data]
+                Account.objects.bulk_create(accounts)
+                accounts_bulk_saved.send(sender=Account, accounts=accounts)
 
             print("数据插入成功")
         except Exception as e:
@@ -0,0 +1,148 @@
+import itertools
+import math
+import random
+import uuid
+
+from django.db import transaction
+
+from .models import (
+    Account,
+    Object,
+    ObjectField,
+    PageLayout,
+    PageLayoutField,
+    PageList,
+    PageListField,
+)
+from .sharding import purge_object
+from .signals import accounts_bulk_saved
+
+# 按人口占比粗略排序的常见姓氏
+SURNAMES = "王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗郑梁谢宋唐许韩冯邓曹彭曾肖田董袁潘于蒋蔡余杜叶程苏魏吕丁任沈姚卢姜崔钟谭陆汪范金石廖贾夏韦付方白邹孟熊秦邱江尹薛闫段雷侯龙史陶黎贺顾毛郝龚邵万钱严覃武戴莫孔向汤"
+GIVEN_CHARS = "伟芳娜秀英敏静丽强磊军洋勇艳杰娟涛明超秀霞平刚桂英华玉兰萍红娥辉建国文斌宇浩凯健俊帆鹏晨阳雪梅琳欣怡佳慧思雨婷晓峰海波东"
+CITIES = ["北京", "上海", "广州", "深圳", "成都", "杭州", "武汉", "西安", "南京", "重庆", "天津", "苏州", "长沙", "郑州", "沈阳", "青岛"]
+HOSPITAL_KINDS = ["人民医院", "中医院", "妇幼保健院", "儿童医院", "肿瘤医院", "第一附属医院", "中心医院", "协和医院"]
+DEPARTMENTS = [
+    "心内科", "心外科", "神经内科", "神经外科", "呼吸内科", "消化内科", "内分泌科", "肾内科",
+    "血液科", "肿瘤科", "普外科", "骨科", "泌尿外科", "胸外科", "妇科", "产科", "儿科",
+    "眼科", "耳鼻喉科", "口腔科", "皮肤科", "急诊科", "麻醉科", "影像科", "检验科", "康复科",
+]
+ENGLISH_NAMES = ["Smith", "Johnson", "Lee", "Brown", "Wang", "Garcia", "Miller", "Davis", "Chen", "Wilson"]
+
+
+def zipf_weights(size, exponent):
+    """Zipf 分布累积权重：排名第 k 的取值概率与 1/k^exponent 成正比"""
+    return list(itertools.accumulate(1 / math.pow(rank, exponent) for rank in range(1, size + 1)))
+
+
+class DatasetGenerator:
+    """按固定随机种子生成可复现的元数据与账户数据（含主键），seed 为 None 时每次不同"""
+
+    def __init__(self, seed=42, hospitals=500, departments=40, skew=1.1, blob_size=0, english_ratio=0.1):
+        self.random = random.Random(seed)
+        self.hospitals = [self.hospital_name(i) for i in range(hospitals)]
+        self.departments = [
+            DEPARTMENTS[i] if i < len(DEPARTMENTS) else f"{DEPARTMENTS[i % len(DEPARTMENTS)]}{i // len(DEPARTMENTS) + 1}病区"
+            for i in range(departments)
+        ]
+        self.hospital_weights = zipf_weights(hospitals, skew)
+        self.department_weights = zipf_weights(departments, skew)
+        self.surname_weights = zipf_weights(len(SURNAMES), 1.0)
+        self.blob_size = blob_size
+        self.english_ratio = english_ratio
+
+    def new_id(self):
+        """由随机种子派生的主键，相同种子生成的数据主键相同，分页的 id 次序也可复现"""
+        return uuid.UUID(int=self.random.getrandbits(128), version=4)
+
+    def hospital_name(self, index):
+        city = CITIES[index % len(CITIES)]
+        kind = HOSPITAL_KINDS[(index // len(CITIES)) % len(HOSPITAL_KINDS)]
+        number = index // (len(CITIES) * len(HOSPITAL_KINDS))
+        return f"{city}市{kind}" if number == 0 else f"{city}市第{number + 1}{kind}"
+
+    def account_name(self):
+        rnd = self.random
+        if rnd.random() < self.english_ratio:
+            return f"Dr. {rnd.choice(ENGLISH_NAMES)} {rnd.randint(1, 9999)}"
+        surname = rnd.choices(SURNAMES, cum_weights=self.surname_weights)[0]
+        given = "".join(rnd.choice(GIVEN_CHARS) for _ in range(rnd.choice((1, 2, 2, 2))))
+        return surname + given
+
+    def account_data(self, extra_fields=()):
+        rnd = self.random
+        data = {
+            "account_name": self.account_name(),
+            "hospital": rnd.choices(self.hospitals, cum_weights=self.hospital_weights)[0],
+            "department": rnd.choices(self.departments, cum_weights=self.department_weights)[0],
+            "phone": f"1{rnd.choice('3578')}{rnd.randint(0, 999999999):09d}",
+        }
+        for name in extra_fields:
+            data[name] = f"{name}-{rnd.randint(0, 9999)}"
+        if self.blob_size:
+            # 对数正态分布的备注长度，模拟少量大文档
+            length = min(int(rnd.lognormvariate(math.log(self.blob_size), 0.8)), self.blob_size * 20)
+            data["notes"] = "".join(rnd.choice(GIVEN_CHARS) for _ in range(length))
+        return data
+
+    @transaction.atomic
+    def create_metadata(self, name, extra_fields=(), flag_indexes=False):
+        """创建 Object 及其 ObjectField / PageList / PageLayout 配置"""
+        obj = Object.objects.create(id=self.new_id(), name=name, label=f"{name} 医生", table_name=f"t_{name}")
+        names = ["account_name", "hospital", "department", "phone", *extra_fields]
+        if self.blob_size:
+            names.append("notes")
+        indexed = {"account_name", "hospital", "department"} if flag_indexes else set()
+        fields = {
+            field_name: ObjectField.objects.create(
+                id=self.new_id(),
+                object=obj,
+                name=field_name,
+                type="text",
+                sortable="1" if field_name in indexed else "0",
+                searchable="1" if field_name in indexed else "0",
+            )
+            for field_name in names
+        }
+        page_list = PageList.objects.create(id=self.new_id(), name=f"{name}_list", label=f"{name} 列表")
+        page_layout = PageLayout.objects.create(id=self.new_id(), name=f"{name} 详情", page_list=page_list)
+        for field_name, field in fields.items():
+            PageListField.objects.create(
+                id=self.new_id(),
+                name=field_name,
+                object_field=field,
+                page_list=page_list,
+                type="text",
+                hidden="0" if field_name in ("account_name", "hospital", "department") else "1",
+            )
+            PageLayoutField.objects.create(
+                id=self.new_id(),
+                name=field_name, label=field_name, object_field=field, page_layout=page_layout, type="text"
+            )
+        return obj, page_list
+
+    def create_accounts(self, obj, count, extra_fields=(), batch_size=5000):
+        """分批 bulk_create 账户，每批一个事务，逐批 yield 已写入数量"""
+        created = 0
+        while created < count:
+            size = min(batch_size, count - created)
+            accounts = [
+                Account(id=self.new_id(), object=obj, data=self.account_data(extra_fields)) for _ in range(size)
+            ]
+            with transaction.atomic():
+                Account.objects.bulk_create(accounts)
+                accounts_bulk_saved.send(sender=Account, accounts=accounts)
+            created += size
+            yield created
+
+
+def purge_dataset(obj):
+    """删除生成的 Object：分块删除其账户数据，再删除字段与列表/布局配置"""
+    for _ in purge_object(obj.pk, obj.shard):
+        pass
+    page_lists = list(
+        PageListField.objects.filter(object_field__object=obj).values_list("page_list_id", flat=True).distinct()
+    )
+    with transaction.atomic():
+        PageList.objects.filter(id__in=page_lists).delete()
+        obj.delete()
@@ -0,0 +1,81 @@
+import csv
+import json
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .materialize import load_overflow
+from .queries import map_account, seek_after
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson; charset=utf-8",
+}
+
+
+class _Echo:
+    """csv.writer 的伪文件对象，write 直接返回写入内容"""
+
+    def write(self, value):
+        return value
+
+
+def iter_keyset(queryset, descending, chunk_size):
+    """按 (_sort_key, id) 键集分块遍历查询集，每块一次有界查询，内存占用与总行数无关
+
+    物化表中溢出行的原始数据按块一次读取（load_overflow），不逐行查询 t_account。
+    """
+    last = None
+    while True:
+        chunk = queryset if last is None else seek_after(queryset, last._sort_key, last.pk, descending)
+        accounts = list(chunk[:chunk_size])
+        load_overflow(accounts)
+        yield from accounts
+        if len(accounts) < chunk_size:
+            return
+        last = accounts[-1]
+
+
+def iter_csv(accounts, field_map):
+    writer = csv.writer(_Echo())
+    # BOM 便于 Excel 正确识别中文
+    yield "\ufeff" + writer.writerow(list(field_map.values()) + ["id"])
+    for account in accounts:
+        row = map_account(account, field_map)
+        yield writer.writerow([row[label] for label in field_map.values()] + [account.id])
+
+
+def iter_ndjson(accounts, field_map):
+    for account in accounts:
+        yield json.dumps(map_account(account, field_map), ensure_ascii=False, cls=DjangoJSONEncoder) + "\n"
+
+
+def iter_buffered(chunks, compress=False, buffer_size=64 * 1024):
+    """将逐行文本合并为约 buffer_size 字节的块输出，compress 为 True 时边生成边 gzip 压缩"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16) if compress else None
+    pending = []
+    size = 0
+    for chunk in chunks:
+        data = chunk.encode("utf-8")
+        if compressor is not None:
+            data = compressor.compress(data)
+        if data:
+            pending.append(data)
+            size += len(data)
+        if size >= buffer_size:
+            yield b"".join(pending)
+            pending, size = [], 0
+    if compressor is not None:
+        pending.append(compressor.flush())
+    if pending:
+        yield b"".join(pending)
+
+
+def iter_export(queryset, field_map, export_format, descending, chunk_size, compress=False):
+    """生成导出内容的字节流"""
+    accounts = iter_keyset(queryset, descending, chunk_size)
+    if export_format == "csv":
+        chunks = iter_csv(accounts, field_map)
+    else:
+        chunks = iter_ndjson(accounts, field_map)
+    return iter_buffered(chunks, compress)
@@ -0,0 +1,41 @@
+from django.db import NotSupportedError
+from django.db.models import F, Func, JSONField, Value
+from django.db.models.functions import Coalesce
+
+
+class JSONMergePatch(Func):
+    """RFC 7396 合并补丁，在数据库内完成 JSON 文档的局部更新
+
+    MySQL 使用 JSON_MERGE_PATCH，SQLite 使用 json_patch，二者语义一致：
+    补丁中的对象逐键合并，值为 null 的键被删除，其余值直接覆盖。
+    """
+
+    output_field = JSONField()
+
+    def __init__(self, field_name, patch):
+        super().__init__(
+            Coalesce(F(field_name), Value({}, output_field=JSONField())),
+            Value(patch, output_field=JSONField()),
+        )
+
+    def as_sql(self, compiler, connection, **extra_context):
+        raise NotSupportedError(f"{connection.vendor} 不支持 JSON 合并补丁")
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return super().as_sql(compiler, connection, function="JSON_MERGE_PATCH", **extra_context)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(compiler, connection, function="JSON_PATCH", **extra_context)
+
+
+def merge_patch(target, patch):
+    """RFC 7396 合并补丁的 Python 实现，与 JSONMergePatch 语义一致，返回新文档（不修改 target）"""
+    if not isinstance(patch, dict):
+        return patch
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = merge_patch(result.get(key), value)
+    return result
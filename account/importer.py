@@ -0,0 +1,105 @@
+import csv
+import io
+import json
+import os
+import uuid
+
+from .validators import coerce_csv_row, validate_account_data, validate_field_types
+
+# 支持的导入格式（jsonl 与 ndjson 相同，每行一个 JSON 对象）
+IMPORT_FORMATS = ("csv", "ndjson", "jsonl")
+
+
+def detect_format(path):
+    ext = os.path.splitext(path)[1].lstrip(".").lower()
+    return ext if ext in IMPORT_FORMATS else None
+
+
+class _CountingLines:
+    """按行读取二进制文件并记录已消费的字节数，供 csv.reader 使用"""
+
+    def __init__(self, handle, offset):
+        self.handle = handle
+        self.offset = offset
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = self.handle.readline()
+        if not line:
+            raise StopIteration
+        self.offset += len(line)
+        return line.decode("utf-8-sig")
+
+
+def iter_records(path, file_format, offset=0):
+    """流式读取文件，逐条 yield (原始记录, 读完该记录后的字节偏移)
+
+    NDJSON 的原始记录为一行文本；CSV 的原始记录为 {列名: 值}，列名取自首行。
+    offset 为上次检查点记录的字节偏移，用于断点续传。
+    """
+    with open(path, "rb") as handle:
+        if file_format == "csv":
+            header = next(csv.reader([handle.readline().decode("utf-8-sig")]))
+            if offset:
+                handle.seek(offset)
+            lines = _CountingLines(handle, handle.tell())
+            for row in csv.reader(lines):
+                if row:
+                    yield dict(zip(header, row)), lines.offset
+        else:
+            handle.seek(offset)
+            position = offset
+            for line in handle:
+                position += len(line)
+                if line.strip():
+                    yield line.decode("utf-8-sig"), position
+
+
+def parse_chunk(records, field_types, first_record_no):
+    """解析并校验一块原始记录（在进程池中执行），返回 ([(记录号, 有效数据)], [(记录号, 错误信息)])
+
+    field_types 为 Object 已定义字段的 {字段名: ObjectField.type}，字段名与值的类型均需相符；
+    CSV 的字符串值先按类型转换。
+    """
+    valid = []
+    errors = []
+    for record_no, raw in enumerate(records, start=first_record_no):
+        if isinstance(raw, str):
+            try:
+                raw = json.loads(raw)
+            except ValueError as e:
+                errors.append((record_no, f"JSON 解析失败: {e}"))
+                continue
+            problems = validate_account_data(raw, field_types) or validate_field_types(raw, field_types)
+        else:
+            problems = validate_account_data(raw, field_types)
+            if not problems:
+                raw, problems = coerce_csv_row(raw, field_types)
+        if problems:
+            errors.append((record_no, "; ".join(problems)))
+        else:
+            valid.append((record_no, raw))
+    return valid, errors
+
+
+def record_account_id(run_id, record_no):
+    """记录对应的账户 id：由导入批次与记录号确定，断点续传重复写入同一块时可识别已提交的记录"""
+    return uuid.uuid5(uuid.UUID(run_id), str(record_no))
+
+
+def read_checkpoint(path):
+    try:
+        with open(path, encoding="utf-8") as handle:
+            return json.load(handle)
+    except FileNotFoundError:
+        return None
+
+
+def write_checkpoint(path, state):
+    """原子写入检查点（先写临时文件再替换）"""
+    tmp_path = f"{path}.tmp"
+    with io.open(tmp_path, "w", encoding="utf-8") as handle:
+        json.dump(state, handle, ensure_ascii=False)
+    os.replace(tmp_path, path)
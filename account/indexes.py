@@ -0,0 +1,84 @@
+from django.db import transaction
+
+from .materialize import sync_materialized
+from .metadata import get_field_indexes
+from .models import Account, AccountSortKey
+from .search import sync_search_tokens
+
+
+def sort_key_value(value):
+    """将 JSON 值规整为可排序的字符串，超出索引长度的部分截断"""
+    if value is None:
+        return ""
+    if not isinstance(value, str):
+        value = str(value)
+    return value[: AccountSortKey.VALUE_MAX_LENGTH]
+
+
+def build_sort_keys(accounts, fields=None):
+    """为一批账户生成影子列行；fields 为空时使用各 Object 的可排序字段"""
+    rows = []
+    for account in accounts:
+        names = fields if fields is not None else get_field_indexes(account.object_id).sort_fields
+        data = account.data or {}
+        rows.extend(
+            AccountSortKey(
+                account_id=account.id,
+                object_id=account.object_id,
+                field=name,
+                value=sort_key_value(data.get(name)),
+            )
+            for name in names
+        )
+    return rows
+
+
+def sync_sort_keys(accounts, fields=None, using=None):
+    """重建一批账户的影子列（先删后插），没有可排序字段时不访问数据库"""
+    if fields is not None:
+        names = set(fields)
+    else:
+        names = set()
+        for account in accounts:
+            names |= set(get_field_indexes(account.object_id).sort_fields)
+    if not names:
+        return 0
+
+    rows = build_sort_keys(accounts, fields)
+    with transaction.atomic(using=using):
+        AccountSortKey.objects.using(using).filter(
+            account_id__in=[account.id for account in accounts], field__in=names
+        ).delete()
+        AccountSortKey.objects.using(using).bulk_create(rows)
+    return len(rows)
+
+
+def sync_account_indexes(accounts, using=None):
+    """账户写入后维护影子列、全文索引与物化表"""
+    sync_sort_keys(accounts, using=using)
+    sync_search_tokens(accounts, using=using)
+    sync_materialized(accounts, using=using)
+
+
+def backfill_indexes(object_id, sort_fields=(), search_fields=(), batch_size=1000, using=None):
+    """按主键分批回填某个 Object 的影子列与全文索引，每批一个短事务并锁定本批账户行
+
+    每批完成后 yield 已处理的账户数。
+    """
+    total = 0
+    last_id = None
+    while True:
+        with transaction.atomic(using=using):
+            batch = Account.objects.using(using).filter(object_id=object_id).order_by("id")
+            if last_id is not None:
+                batch = batch.filter(id__gt=last_id)
+            accounts = list(batch.select_for_update()[:batch_size])
+            if not accounts:
+                break
+            if sort_fields:
+                sync_sort_keys(accounts, sort_fields, using=using)
+            if search_fields:
+                sync_search_tokens(accounts, search_fields, using=using)
+        total += len(accounts)
+        last_id = accounts[-1].id
+        yield total
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from account.counts import rebuild_count
+from account.models import Object
+
+
+class Command(BaseCommand):
+    help = "重新统计各 Object 的未删除账户数（t_account_count），修正增量维护产生的偏差"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--object", dest="object_id", help="仅重建指定 Object")
+
+    def handle(self, *args, **options):
+        objects = Object.objects.filter(deleted="0")
+        if options["object_id"]:
+            objects = objects.filter(id=options["object_id"])
+            if not objects.exists():
+                raise CommandError("Object 不存在")
+
+        fixed = 0
+        for obj in objects:
+            previous, count = rebuild_count(obj.id, using=obj.shard)
+            if previous != count:
+                fixed += 1
+                self.stdout.write(f"[{obj.name}] {previous} -> {count}")
+        self.stdout.write(self.style.SUCCESS(f"完成，修正 {fixed} 个 Object"))
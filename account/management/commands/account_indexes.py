@@ -0,0 +1,121 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from account.indexes import backfill_indexes
+from account.models import Account, AccountSearchToken, AccountSortKey, Object, ObjectField
+from account.queries import SEARCH_FIELD, SORT_FIELDS
+from account.sharding import using_shard
+
+
+class Command(BaseCommand):
+    help = "回填可排序字段的影子列与可搜索字段的全文索引，或检查列表查询是否会回退到 JSON 扫描"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--object", dest="object_id", help="仅处理指定 Object")
+        parser.add_argument("--field", action="append", dest="fields", help="仅处理指定字段，可重复")
+        parser.add_argument("--batch-size", type=int, default=1000, help="每批回填的账户数")
+        parser.add_argument("--rebuild", action="store_true", help="重新回填已完成的字段")
+        parser.add_argument("--check", action="store_true", help="仅检查，不回填")
+
+    def handle(self, *args, **options):
+        objects = Object.objects.filter(deleted="0")
+        if options["object_id"]:
+            objects = objects.filter(id=options["object_id"])
+            if not objects.exists():
+                raise CommandError("Object 不存在")
+
+        for obj in objects:
+            # 账户索引与账户在同一分片
+            with using_shard(obj.shard):
+                if options["check"]:
+                    self.check_object(obj)
+                else:
+                    self.build_object(obj, options)
+
+    def build_object(self, obj, options):
+        fields = ObjectField.objects.filter(object=obj, deleted="0")
+        if options["fields"]:
+            fields = fields.filter(name__in=options["fields"])
+        pending_sort = [f for f in fields if f.sortable == "1" and (options["rebuild"] or f.sort_indexed != "1")]
+        pending_search = [
+            f for f in fields if f.searchable == "1" and (options["rebuild"] or f.search_indexed != "1")
+        ]
+
+        # 清理已取消标记字段的旧索引
+        all_fields = list(ObjectField.objects.filter(object=obj, deleted="0"))
+        sort_names = [f.name for f in all_fields if f.sortable == "1"]
+        search_names = [f.name for f in all_fields if f.searchable == "1"]
+        stale, _ = AccountSortKey.objects.filter(object=obj).exclude(field__in=sort_names).delete()
+        stale_tokens, _ = (
+            AccountSearchToken.objects.filter(object=obj).exclude(field__in=search_names).delete()
+        )
+        if stale or stale_tokens:
+            self.stdout.write(f"[{obj.name}] 清理过期索引 {stale + stale_tokens} 条")
+
+        if not (pending_sort or pending_search):
+            self.stdout.write(f"[{obj.name}] 无需回填")
+            return
+
+        if pending_sort:
+            self.stdout.write(f"[{obj.name}] 回填排序字段: {', '.join(f.name for f in pending_sort)}")
+        if pending_search:
+            self.stdout.write(f"[{obj.name}] 回填搜索字段: {', '.join(f.name for f in pending_search)}")
+        total = 0
+        for total in backfill_indexes(
+            obj.id,
+            sort_fields=[f.name for f in pending_sort],
+            search_fields=[f.name for f in pending_search],
+            batch_size=options["batch_size"],
+            using=obj.shard,
+        ):
+            self.stdout.write(f"[{obj.name}] 已处理 {total} 个账户")
+
+        # 回填完成后标记字段，列表的排序 / 搜索开始走索引
+        for field in pending_sort:
+            field.sort_indexed = "1"
+            field.save(update_fields=["sort_indexed"])
+        for field in pending_search:
+            field.search_indexed = "1"
+            field.save(update_fields=["search_indexed"])
+        self.stdout.write(self.style.SUCCESS(f"[{obj.name}] 完成，共处理 {total} 个账户"))
+
+    def check_object(self, obj):
+        fields = {
+            f.name: f for f in ObjectField.objects.filter(object=obj, deleted="0")
+        }
+        checks = [("排序", name, "sortable", "sort_indexed") for name in SORT_FIELDS]
+        searchable = [
+            f for f in fields.values() if f.searchable == "1" and f.search_indexed == "1"
+        ]
+        if searchable:
+            names = ", ".join(f.name for f in searchable)
+            self.stdout.write(f"[{obj.name}] 搜索 {names}: 全文索引")
+        else:
+            checks.append(("搜索", SEARCH_FIELD, "searchable", "search_indexed"))
+        for usage, name, flag, indexed in checks:
+            field = fields.get(name)
+            if field is None:
+                reason = "未定义 ObjectField"
+            elif getattr(field, flag) != "1":
+                reason = f"未标记 {flag}"
+            elif getattr(field, indexed) != "1":
+                reason = "已标记但未回填（请运行 account_indexes）"
+            else:
+                # 排序内连接影子列，缺少影子列行的账户不会出现在列表中
+                missing = self.missing_sort_keys(obj, name) if usage == "排序" else 0
+                if missing:
+                    self.stdout.write(
+                        self.style.ERROR(
+                            f"[{obj.name}] {usage} {name}: 索引缺少 {missing} 个账户的影子列"
+                            f"（请运行 account_indexes --rebuild --field {name}）"
+                        )
+                    )
+                else:
+                    self.stdout.write(f"[{obj.name}] {usage} {name}: 索引")
+                continue
+            self.stdout.write(
+                self.style.WARNING(f"[{obj.name}] {usage} {name}: JSON 扫描（{reason}）")
+            )
+
+    def missing_sort_keys(self, obj, name):
+        keys = AccountSortKey.objects.filter(object=obj, field=name).values("account_id")
+        return Account.objects.filter(object=obj).exclude(id__in=keys).count()
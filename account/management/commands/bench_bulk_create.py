@@ -0,0 +1,81 @@
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from account.datagen import DatasetGenerator, purge_dataset
+
+
+class Command(BaseCommand):
+    help = "对比逐条创建与批量创建接口的吞吐量（条/秒），写入临时 Object，结束后删除"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--indexed", action="store_true", help="临时 Object 的业务字段标记为可排序/可搜索")
+        parser.add_argument("--count", type=int, default=5000, help="批量创建的记录数")
+        parser.add_argument("--single-count", type=int, default=200, help="逐条创建的记录数")
+        parser.add_argument("--batch-size", type=int, default=settings.BULK_CREATE_BATCH_SIZE)
+        parser.add_argument("--keep", action="store_true", help="保留临时 Object 及写入的数据")
+
+    def handle(self, *args, **options):
+        # 每个请求照常提交（与线上一致），不在外层事务中回滚，否则提交会变成保存点
+        # 只用到元数据，不固定种子，避免与已生成的数据集主键冲突
+        obj, _ = DatasetGenerator(seed=None).create_metadata("bench_bulk_create", flag_indexes=options["indexed"])
+        client = Client(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+        try:
+            self.run(client, obj, options)
+        finally:
+            if options["keep"]:
+                self.stdout.write(f"已保留临时 Object {obj.pk}")
+            else:
+                purge_dataset(obj)
+                self.stdout.write("已删除基准测试写入的数据")
+
+    def run(self, client, obj, options):
+        def record(i):
+            return {
+                "account_name": f"Dr. bench{i}",
+                "hospital": f"bench Hospital{i % 50}",
+                "department": f"bench{i % 20}",
+                "phone": f"1380000{i:04d}",
+            }
+
+        # 逐条创建
+        start = time.perf_counter()
+        for i in range(options["single_count"]):
+            response = client.post(
+                "/api/main/",
+                json.dumps({"object_id": str(obj.id), "data": record(i)}),
+                content_type="application/json",
+            )
+            if response.status_code != 201:
+                raise CommandError(f"逐条创建失败: {response.content!r}")
+        single_elapsed = time.perf_counter() - start
+        single_rate = options["single_count"] / single_elapsed if single_elapsed else 0
+
+        # 批量创建，每个请求最多 BULK_CREATE_MAX_ITEMS 条
+        items = [record(i) for i in range(options["count"])]
+        start = time.perf_counter()
+        for offset in range(0, len(items), settings.BULK_CREATE_MAX_ITEMS):
+            response = client.post(
+                "/api/main/bulk/",
+                json.dumps({
+                    "object_id": str(obj.id),
+                    "data": items[offset:offset + settings.BULK_CREATE_MAX_ITEMS],
+                    "batch_size": options["batch_size"],
+                }),
+                content_type="application/json",
+            )
+            if response.status_code != 201:
+                raise CommandError(f"批量创建失败: {response.content[:500]!r}")
+        bulk_elapsed = time.perf_counter() - start
+        bulk_rate = options["count"] / bulk_elapsed if bulk_elapsed else 0
+
+        self.stdout.write(f"逐条创建: {options['single_count']} 条, {single_elapsed:.2f}s, {single_rate:.0f} 条/秒")
+        self.stdout.write(
+            f"批量创建: {options['count']} 条, batch_size={options['batch_size']}, "
+            f"{bulk_elapsed:.2f}s, {bulk_rate:.0f} 条/秒"
+        )
+        if single_rate:
+            self.stdout.write(self.style.SUCCESS(f"加速比: {bulk_rate / single_rate:.1f}x"))
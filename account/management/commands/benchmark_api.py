@@ -0,0 +1,179 @@
+import json
+import math
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, connection
+from django.test import Client, override_settings
+from django.utils import timezone
+
+from account.benchmark import Scenario, compare_results, run_scenario
+from account.datagen import DatasetGenerator, purge_dataset
+from account.models import Account, Object, PageListField
+from account.pagination import AccountPagination
+from account.queries import SORT_FIELDS
+
+
+class Command(BaseCommand):
+    help = "在生成的数据集上对账户接口做进程内基准测试，输出可在提交间对比的 JSON 结果"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--object", dest="object_id", help="读接口使用已有 Object 的数据（写接口仍使用临时数据集），默认生成临时数据集"
+        )
+        parser.add_argument("--accounts", type=int, default=2000, help="临时数据集的账户数")
+        parser.add_argument("--seed", type=int, default=42, help="临时数据集的随机种子")
+        parser.add_argument("--repeat", type=int, default=20, help="每个场景的计时次数")
+        parser.add_argument("--warmup", type=int, default=2, help="每个场景的预热次数（不计时）")
+        parser.add_argument("--search", help="搜索场景的关键词，默认取样本账户姓名的前两个字符")
+        parser.add_argument("--only", help="只运行名称包含该字符串的场景")
+        parser.add_argument("--output", help="结果 JSON 文件路径，默认输出到标准输出")
+        parser.add_argument("--baseline", help="基线结果 JSON，存在回归时以非零状态退出")
+        parser.add_argument("--threshold", type=float, default=0.2, help="耗时回归阈值（相对基线的比例）")
+        parser.add_argument("--metric", default="p50_ms", help="对比使用的耗时指标，如 p50_ms / p95_ms")
+        parser.add_argument("--response-cache", action="store_true", help="启用列表响应缓存（默认关闭以测量实际查询）")
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options["baseline"]:
+            try:
+                with open(options["baseline"], encoding="utf-8") as handle:
+                    baseline = json.load(handle)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"无法读取基线文件: {e}")
+
+        # 临时数据集与写接口的修改照常提交（与线上一致，不在外层事务中回滚），结束后删除临时 Object
+        cache_timeout = settings.ACCOUNT_LIST_CACHE_TIMEOUT if options["response_cache"] else 0
+        with override_settings(ACCOUNT_LIST_CACHE_TIMEOUT=cache_timeout):
+            results = self.run(options)
+
+        payload = json.dumps(results, ensure_ascii=False, indent=2, sort_keys=True)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as handle:
+                handle.write(payload + "\n")
+        else:
+            self.stdout.write(payload)
+        for name, result in results["scenarios"].items():
+            self.stderr.write(
+                f"{name}: p50={result['p50_ms']:.2f}ms p95={result['p95_ms']:.2f}ms "
+                f"queries={result['queries']} query_ms={result['query_ms']:.2f}"
+            )
+
+        if baseline is not None:
+            regressions = compare_results(baseline, results, options["threshold"], options["metric"])
+            if regressions:
+                for name, message in regressions:
+                    self.stderr.write(self.style.ERROR(f"回归: {name}: {message}"))
+                raise CommandError(f"{len(regressions)} 项性能回归（阈值 {options['threshold']:.0%}）")
+            self.stderr.write(self.style.SUCCESS("未发现性能回归"))
+
+    def create_dataset(self, name, seed, count):
+        generator = DatasetGenerator(seed=seed)
+        try:
+            obj, _ = generator.create_metadata(name)
+        except IntegrityError:
+            raise CommandError("相同 --seed 生成的数据已存在（主键冲突），请更换 --seed")
+        for _ in generator.create_accounts(obj, count):
+            pass
+        return obj
+
+    def run(self, options):
+        runs = options["warmup"] + options["repeat"]
+        if options["object_id"]:
+            obj = Object.objects.filter(id=options["object_id"], deleted="0").first()
+            if obj is None:
+                raise CommandError("Object 不存在")
+        elif options["accounts"] < runs * 2:
+            raise CommandError(f"账户数不足，至少需要 {runs * 2} 个")
+
+        scratch = []
+        try:
+            if not options["object_id"]:
+                obj = self.create_dataset("benchmark", options["seed"], options["accounts"])
+                scratch.append(obj)
+            # 写接口只修改临时数据集，不改动 --object 指定的数据；该数据集不要求可复现，
+            # 不固定种子，避免与 --object（可能由相同种子生成）主键冲突
+            if options["object_id"]:
+                target = self.create_dataset("benchmark_writes", None, runs * 2)
+                scratch.append(target)
+            else:
+                target = obj
+            return self.run_scenarios(obj, target, runs, options)
+        finally:
+            for dataset in scratch:
+                purge_dataset(dataset)
+
+    def run_scenarios(self, obj, target, runs, options):
+        pagelist_id = (
+            PageListField.objects.filter(object_field__object=obj, deleted="0")
+            .values_list("page_list_id", flat=True)
+            .first()
+        )
+        total = Account.objects.filter(object=obj, deleted="0").count()
+        if not total:
+            raise CommandError("Object 下没有账户")
+
+        # 写接口各用一组不重复的账户，避免互相影响
+        ids = Account.objects.filter(object=target, deleted="0").order_by("id").values_list("id", flat=True)
+        ids = [str(pk) for pk in ids[: runs * 2]]
+        update_ids, delete_ids = ids[:runs], ids[runs:]
+        sample = Account.objects.filter(object=obj, deleted="0").order_by("id").last()
+        search = options["search"] or str((sample.data or {}).get("account_name", ""))[:2]
+        deep_page = max(1, math.ceil(total / AccountPagination.page_size))
+
+        client = Client(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+        scenarios = self.scenarios(obj, target, pagelist_id, search, deep_page, sample, update_ids, delete_ids)
+        if options["only"]:
+            scenarios = [s for s in scenarios if options["only"] in s.name]
+
+        results = {}
+        for scenario in scenarios:
+            results[scenario.name] = run_scenario(client, scenario, options["repeat"], options["warmup"])
+        return {
+            "meta": {
+                "created_at": timezone.now().isoformat(),
+                "database": connection.vendor,
+                "accounts": total,
+                "seed": None if options["object_id"] else options["seed"],
+                "repeat": options["repeat"],
+                "warmup": options["warmup"],
+                "search": search,
+                "deep_page": deep_page,
+                "response_cache": settings.ACCOUNT_LIST_CACHE_TIMEOUT > 0,
+            },
+            "scenarios": results,
+        }
+
+    def scenarios(self, obj, target, pagelist_id, search, deep_page, sample, update_ids, delete_ids):
+        object_id = str(obj.id)
+        scenarios = []
+        for field in SORT_FIELDS:
+            for order in ("asc", "desc"):
+                params = {"object_id": object_id, "sort_field": field, "sort_order": order}
+                scenarios.append(Scenario(f"list.{field}.{order}.page1", "get", "/api/main/", params))
+                scenarios.append(
+                    Scenario(f"list.{field}.{order}.deep", "get", "/api/main/", {**params, "page": deep_page})
+                )
+                scenarios.append(
+                    Scenario(f"list.{field}.{order}.search", "get", "/api/main/", {**params, "search": search})
+                )
+        scenarios.append(
+            Scenario("list.search.ranked", "get", "/api/main/", {"object_id": object_id, "search": search})
+        )
+
+        record = {"account_name": "Dr. benchmark", "hospital": "benchmark Hospital", "department": "benchmark"}
+        scenarios += [
+            Scenario(
+                "retrieve", "get", f"/api/main/{sample.id}/", {"pagelist_id": str(pagelist_id)},
+            ),
+            Scenario("create", "post", "/api/main/", body={"object_id": str(target.id), "data": record}),
+            Scenario(
+                "update", "put", "/api/main/{id}/",
+                prepare=lambda i: (f"/api/main/{update_ids[i]}/", {**record, "phone": str(i)}),
+            ),
+            Scenario(
+                "destroy", "delete", "/api/main/{id}/",
+                prepare=lambda i: (f"/api/main/{delete_ids[i]}/", None),
+            ),
+        ]
+        return scenarios
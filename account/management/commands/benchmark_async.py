@@ -0,0 +1,135 @@
+import asyncio
+import json
+import math
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, connection
+from django.test import AsyncClient, Client, override_settings
+from django.utils import timezone
+
+from account.benchmark import run_async_load, run_sync_load
+from account.datagen import DatasetGenerator
+from account.models import Account, Object, PageListField
+from account.pagination import AccountPagination
+from account.queries import SORT_FIELDS
+
+
+class Command(BaseCommand):
+    help = (
+        "固定并发下对比同步（WSGI，/api/main/）与异步（ASGI，/api/async/main/）账户列表、详情接口的吞吐量；"
+        "请求在进程内经测试客户端发送，数据集需提交到数据库，未指定 --object 时生成临时数据集并在结束后删除"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--object", dest="object_id", help="使用已有 Object 的数据，默认生成临时数据集")
+        parser.add_argument("--accounts", type=int, default=2000, help="临时数据集的账户数")
+        parser.add_argument("--seed", type=int, default=42, help="临时数据集的随机种子")
+        parser.add_argument("--requests", type=int, default=200, help="每个场景每种模式发送的请求数")
+        parser.add_argument("--concurrency", type=int, default=16, help="客户端在途请求数")
+        parser.add_argument("--workers", type=int, default=1, help="同步模式的 worker 线程数（对应同步 worker 进程数）")
+        parser.add_argument("--only", help="只运行名称包含该字符串的场景")
+        parser.add_argument("--output", help="结果 JSON 文件路径，默认输出到标准输出")
+        parser.add_argument("--response-cache", action="store_true", help="启用列表响应缓存（默认关闭以测量实际查询）")
+
+    def handle(self, *args, **options):
+        if options["requests"] <= 0 or options["concurrency"] <= 0 or options["workers"] <= 0:
+            raise CommandError("--requests、--concurrency、--workers 必须为正整数")
+
+        created = None
+        if options["object_id"]:
+            obj = Object.objects.filter(id=options["object_id"], deleted="0").first()
+            if obj is None:
+                raise CommandError("Object 不存在")
+        else:
+            # 并发请求使用各自的数据库连接，数据集必须提交，结束后删除
+            generator = DatasetGenerator(seed=options["seed"])
+            try:
+                obj, _ = generator.create_metadata("benchmark_async")
+            except IntegrityError:
+                raise CommandError("相同 --seed 生成的数据已存在（主键冲突），请更换 --seed")
+            for _ in generator.create_accounts(obj, options["accounts"]):
+                pass
+            created = obj
+
+        cache_timeout = settings.ACCOUNT_LIST_CACHE_TIMEOUT if options["response_cache"] else 0
+        # 测试客户端的 Host 固定为 testserver
+        allowed_hosts = [*settings.ALLOWED_HOSTS, "testserver"]
+        try:
+            with override_settings(ACCOUNT_LIST_CACHE_TIMEOUT=cache_timeout, ALLOWED_HOSTS=allowed_hosts):
+                results = self.run(obj, options)
+        finally:
+            if created is not None:
+                created.delete()
+
+        payload = json.dumps(results, ensure_ascii=False, indent=2, sort_keys=True)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as handle:
+                handle.write(payload + "\n")
+        else:
+            self.stdout.write(payload)
+        for name, result in results["scenarios"].items():
+            self.stderr.write(
+                f"{name}: sync={result['sync']['throughput_rps']:.1f} rps "
+                f"async={result['async']['throughput_rps']:.1f} rps (x{result['speedup']:.2f}) "
+                f"p95 sync={result['sync']['p95_ms']:.1f}ms async={result['async']['p95_ms']:.1f}ms"
+            )
+
+    def run(self, obj, options):
+        pagelist_id = (
+            PageListField.objects.filter(object_field__object=obj, deleted="0")
+            .values_list("page_list_id", flat=True)
+            .first()
+        )
+        ids = list(
+            Account.objects.filter(object=obj, deleted="0").order_by("id").values_list("id", flat=True)[:200]
+        )
+        if not ids:
+            raise CommandError("Object 下没有账户")
+        total = Account.objects.filter(object=obj, deleted="0").count()
+        pages = min(5, math.ceil(total / AccountPagination.page_size))
+
+        results = {}
+        for name, paths in self.scenarios(obj, pagelist_id, ids, pages, options["requests"]):
+            if options["only"] and options["only"] not in name:
+                continue
+            sync_result = run_sync_load(
+                Client, [path for path, _ in paths], options["concurrency"], options["workers"]
+            )
+            async_result = asyncio.run(
+                run_async_load(AsyncClient(), [path for _, path in paths], options["concurrency"])
+            )
+            for mode, result in (("sync", sync_result), ("async", async_result)):
+                if result["status"] != [200]:
+                    raise CommandError(f"{name} ({mode}) 返回了非 200 状态: {result['status']}")
+            results[name] = {
+                "sync": sync_result,
+                "async": async_result,
+                "speedup": round(async_result["throughput_rps"] / sync_result["throughput_rps"], 3)
+                if sync_result["throughput_rps"]
+                else 0.0,
+            }
+        return {
+            "meta": {
+                "created_at": timezone.now().isoformat(),
+                "database": connection.vendor,
+                "accounts": total,
+                "requests": options["requests"],
+                "concurrency": options["concurrency"],
+                "workers": options["workers"],
+                "response_cache": settings.ACCOUNT_LIST_CACHE_TIMEOUT > 0,
+            },
+            "scenarios": results,
+        }
+
+    def scenarios(self, obj, pagelist_id, ids, pages, count):
+        """返回 [(场景名, [(同步路径, 异步路径), ...])]；列表按排序字段与前 pages 页轮换，避免全部命中同一页"""
+        object_id = str(obj.id)
+        lists = []
+        details = []
+        for i in range(count):
+            query = f"?object_id={object_id}&sort_field={SORT_FIELDS[i % len(SORT_FIELDS)]}&page={i % pages + 1}"
+            lists.append((f"/api/main/{query}", f"/api/async/main/{query}"))
+            suffix = f"{ids[i % len(ids)]}/?pagelist_id={pagelist_id}"
+            details.append((f"/api/main/{suffix}", f"/api/async/main/{suffix}"))
+        return [("list", lists), ("retrieve", details)]
@@ -0,0 +1,64 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from account.datagen import DatasetGenerator
+
+
+class Command(BaseCommand):
+    help = "生成容量测试用的合成数据：N 个 Object 及其字段/列表/布局配置，每个 Object 下批量写入大量偏斜分布的账户"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--objects", type=int, default=1, help="生成的 Object 数量")
+        parser.add_argument("--accounts", type=int, default=100000, help="每个 Object 的账户数")
+        parser.add_argument("--extra-fields", type=int, default=0, help="每个 Object 额外的字段数")
+        parser.add_argument("--hospitals", type=int, default=500, help="医院取值个数（基数）")
+        parser.add_argument("--departments", type=int, default=40, help="科室取值个数（基数）")
+        parser.add_argument("--skew", type=float, default=1.1, help="医院/科室的 Zipf 偏斜指数，0 为均匀分布")
+        parser.add_argument("--blob-size", type=int, default=0, help="备注字段的典型长度（字符），0 表示不生成")
+        parser.add_argument("--english-ratio", type=float, default=0.1, help="英文姓名（Dr. 前缀）的比例")
+        parser.add_argument("--flag-indexes", action="store_true", help="将姓名/医院/科室标记为可排序、可搜索")
+        parser.add_argument("--prefix", default="bench", help="Object 名称前缀")
+        parser.add_argument("--seed", type=int, default=42, help="随机种子，相同参数与种子生成相同数据")
+        parser.add_argument("--batch-size", type=int, default=5000, help="每批写入的账户数（一个事务）")
+
+    def handle(self, *args, **options):
+        if options["objects"] < 1 or options["accounts"] < 0:
+            raise CommandError("--objects 至少为 1，--accounts 不能为负数")
+        if options["hospitals"] < 1 or options["departments"] < 1:
+            raise CommandError("--hospitals / --departments 至少为 1")
+
+        generator = DatasetGenerator(
+            seed=options["seed"],
+            hospitals=options["hospitals"],
+            departments=options["departments"],
+            skew=options["skew"],
+            blob_size=options["blob_size"],
+            english_ratio=options["english_ratio"],
+        )
+        extra_fields = [f"field_{i}" for i in range(1, options["extra_fields"] + 1)]
+        batch_size = max(1, options["batch_size"])
+        started = time.perf_counter()
+        total = 0
+        for i in range(1, options["objects"] + 1):
+            try:
+                obj, page_list = generator.create_metadata(
+                    f"{options['prefix']}_{i}", extra_fields, options["flag_indexes"]
+                )
+            except IntegrityError:
+                raise CommandError("相同 --seed 生成的数据已存在（主键冲突），请更换 --seed")
+            self.stdout.write(f"Object {obj.name}: id={obj.id}，PageList id={page_list.id}")
+            created = 0
+            for created in generator.create_accounts(obj, options["accounts"], extra_fields, batch_size):
+                elapsed = time.perf_counter() - started
+                rate = (total + created) / elapsed if elapsed else 0
+                self.stdout.write(f"  已写入 {created}/{options['accounts']} 个账户，{rate:.0f} 条/秒")
+            total += created
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(f"生成完成: {options['objects']} 个 Object，{total} 个账户，耗时 {elapsed:.2f}s")
+        )
+        if options["flag_indexes"]:
+            self.stdout.write("已标记索引字段，请运行 account_indexes 回填后列表查询才会走索引")
@@ -0,0 +1,156 @@
+import os
+import time
+import uuid
+from collections import deque
+from multiprocessing import get_context
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+
+from account.importer import (
+    IMPORT_FORMATS,
+    detect_format,
+    iter_records,
+    parse_chunk,
+    read_checkpoint,
+    record_account_id,
+    write_checkpoint,
+)
+from account.models import Account, Object, ObjectField
+from account.sharding import using_shard, writable_shard
+from account.signals import accounts_bulk_saved
+
+
+class Command(BaseCommand):
+    help = "从 CSV / NDJSON / JSONL 文件流式导入账户：进程池解析校验，分块事务批量写入，支持断点续传"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="导入文件路径")
+        parser.add_argument("--object", dest="object_id", required=True, help="导入到的 Object")
+        parser.add_argument("--format", dest="file_format", choices=IMPORT_FORMATS, help="默认按扩展名识别")
+        parser.add_argument("--batch-size", type=int, default=1000, help="每块记录数（一个事务）")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="解析进程数，0 表示不使用进程池")
+        parser.add_argument("--checkpoint", help="检查点文件，默认 <path>.checkpoint")
+        parser.add_argument("--resume", action="store_true", help="从检查点继续导入")
+        parser.add_argument("--strict", action="store_true", help="遇到无效记录即停止（已提交的块保留）")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        if not os.path.exists(path):
+            raise CommandError(f"文件不存在: {path}")
+        file_format = options["file_format"] or detect_format(path)
+        if file_format is None:
+            raise CommandError("无法识别文件格式，请使用 --format 指定")
+        try:
+            obj = Object.objects.get(id=options["object_id"], deleted="0")
+        except Object.DoesNotExist:
+            raise CommandError("Object 不存在")
+
+        checkpoint_path = options["checkpoint"] or f"{path}.checkpoint"
+        # run_id 标识一次导入，账户 id 由 run_id 与记录号生成，续传时保持不变
+        state = {
+            "path": os.path.abspath(path), "run_id": uuid.uuid4().hex,
+            "offset": 0, "records": 0, "imported": 0, "rejected": 0,
+        }
+        if options["resume"]:
+            saved = read_checkpoint(checkpoint_path)
+            if saved and saved.get("path") == state["path"]:
+                state = {**state, **saved}
+                self.stdout.write(f"从检查点继续: 已处理 {state['records']} 条，偏移 {state['offset']} 字节")
+        # 先记录 run_id，第一块提交后即中断时续传也能识别已写入的账户
+        write_checkpoint(checkpoint_path, state)
+
+        field_types = dict(
+            ObjectField.objects.filter(object=obj, deleted="0").values_list("name", "type")
+        )
+        batch_size = max(1, options["batch_size"])
+        workers = max(0, options["workers"])
+        # fork 前关闭数据库连接，子进程只做解析，不与父进程共享连接
+        connections.close_all()
+        pool = get_context("fork").Pool(workers) if workers else None
+
+        self.obj = obj
+        self.state = state
+        self.strict = options["strict"]
+        self.checkpoint_path = checkpoint_path
+        self.started = time.perf_counter()
+        self.initial_imported = state["imported"]
+        next_record_no = state["records"] + 1
+        try:
+            pending = deque()
+            for chunk, end_offset in self.iter_chunks(path, file_format, state["offset"], batch_size):
+                args = (chunk, field_types, next_record_no)
+                next_record_no += len(chunk)
+                if pool is None:
+                    self.write_chunk(parse_chunk(*args), len(chunk), end_offset)
+                    continue
+                pending.append((pool.apply_async(parse_chunk, args), len(chunk), end_offset))
+                # 限制在途的块数，避免读取速度超过写入速度时占用过多内存
+                if len(pending) >= workers * 2:
+                    result, size, offset = pending.popleft()
+                    self.write_chunk(result.get(), size, offset)
+            while pending:
+                result, size, offset = pending.popleft()
+                self.write_chunk(result.get(), size, offset)
+        finally:
+            if pool is not None:
+                pool.terminate()
+
+        imported = state["imported"] - self.initial_imported
+        elapsed = time.perf_counter() - self.started
+        rate = imported / elapsed if elapsed else 0
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"导入完成: 本次成功 {imported} 条，累计成功 {state['imported']} 条，"
+                f"无效 {state['rejected']} 条，耗时 {elapsed:.2f}s，{rate:.0f} 条/秒"
+            )
+        )
+
+    def iter_chunks(self, path, file_format, offset, batch_size):
+        chunk = []
+        end_offset = offset
+        for record, end_offset in iter_records(path, file_format, offset):
+            chunk.append(record)
+            if len(chunk) >= batch_size:
+                yield chunk, end_offset
+                chunk = []
+        if chunk:
+            yield chunk, end_offset
+
+    def write_chunk(self, parsed, size, end_offset):
+        valid, errors = parsed
+        for record_no, message in errors[:10]:
+            self.stderr.write(f"第 {record_no} 条记录无效: {message}")
+        if errors and self.strict:
+            raise CommandError(f"存在 {len(errors)} 条无效记录，已停止；修正后可使用 --resume 继续")
+
+        state = self.state
+        accounts = [
+            Account(id=record_account_id(state["run_id"], record_no), object_id=self.obj.id, data=data)
+            for record_no, data in valid
+        ]
+        # 写入 Object 所在分片，迁移切换阶段抛出 ShardLocked，可稍后使用 --resume 继续
+        using = writable_shard(self.obj.id)
+        with using_shard(using), transaction.atomic(using=using):
+            # 块已提交但检查点未写入时（中断于两者之间），续传会重复处理该块，跳过已存在的账户
+            existing = set(
+                Account.objects.using(using)
+                .filter(id__in=[account.id for account in accounts])
+                .values_list("id", flat=True)
+            )
+            accounts = [account for account in accounts if account.id not in existing]
+            Account.objects.using(using).bulk_create(accounts)
+            accounts_bulk_saved.send(sender=Account, accounts=accounts, using=using)
+
+        # 块提交后再记录检查点，中断后从下一块继续
+        state["offset"] = end_offset
+        state["records"] += size
+        state["imported"] += len(valid)
+        state["rejected"] += len(errors)
+        write_checkpoint(self.checkpoint_path, state)
+
+        elapsed = time.perf_counter() - self.started
+        rate = (state["imported"] - self.initial_imported) / elapsed if elapsed else 0
+        self.stdout.write(f"已处理 {state['records']} 条，成功 {state['imported']} 条，{rate:.0f} 条/秒")
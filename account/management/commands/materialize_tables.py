@@ -0,0 +1,86 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from account.materialize import (
+    MAINTAINED,
+    NOT_MATERIALIZED,
+    MaterializeError,
+    backfill_table,
+    create_table,
+    drop_table,
+    mark_ready,
+    prune_rows,
+    sync_columns,
+    table_spec,
+)
+from account.models import Object
+
+
+class Command(BaseCommand):
+    help = (
+        "按 ObjectField 为 Object 建立以 table_name 为表名的物化表（类型化、带索引的列），"
+        "回填新建的表或新增的列；回填完成后列表与导出读取物化表"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--object", dest="object_id", help="仅处理指定 Object（--enable / --drop 时必填）")
+        parser.add_argument("--enable", action="store_true", help="为 Object 建立物化表并回填")
+        parser.add_argument("--drop", action="store_true", help="取消物化并删除物化表")
+        parser.add_argument("--batch-size", type=int, default=1000, help="每批回填的账户数")
+
+    def handle(self, *args, **options):
+        if (options["enable"] or options["drop"]) and not options["object_id"]:
+            raise CommandError("--enable / --drop 需指定 --object")
+        objects = Object.objects.all()
+        if options["object_id"]:
+            objects = objects.filter(id=options["object_id"])
+            if not objects.exists():
+                raise CommandError("Object 不存在")
+        if not (options["enable"] or options["object_id"]):
+            objects = objects.exclude(materialized=NOT_MATERIALIZED)
+
+        for obj in objects:
+            if options["drop"]:
+                if obj.materialized != NOT_MATERIALIZED:
+                    drop_table(obj)
+                self.stdout.write(self.style.SUCCESS(f"[{obj.name}] 已删除物化表 {obj.table_name}"))
+                continue
+            if options["enable"] and obj.materialized == NOT_MATERIALIZED:
+                try:
+                    create_table(obj)
+                except MaterializeError as e:
+                    raise CommandError(f"[{obj.name}] {e}")
+                self.stdout.write(f"[{obj.name}] 已建立物化表 {obj.table_name}")
+            if obj.materialized == NOT_MATERIALIZED:
+                self.stdout.write(self.style.WARNING(f"[{obj.name}] 未物化（使用 --enable 建立物化表）"))
+                continue
+            self.build_object(obj, options)
+
+    def build_object(self, obj, options):
+        # 补齐字段变更后未执行的加列/删列
+        added, dropped = sync_columns(obj.id)
+        if added or dropped:
+            self.stdout.write(f"[{obj.name}] 新增列: {', '.join(added) or '无'}，删除列: {', '.join(dropped) or '无'}")
+        spec = table_spec(obj.id)
+        if spec is None:
+            self.stdout.write(f"[{obj.name}] 没有可物化的字段")
+            return
+        pending = [name for name, _, state in spec.columns if state == MAINTAINED]
+        removed = prune_rows(obj, options["batch_size"])
+        if removed:
+            self.stdout.write(f"[{obj.name}] 清理已删除账户的物化行 {removed} 条")
+
+        # 新建的表整行回填，已回填的表只回填新增列
+        if obj.materialized == MAINTAINED:
+            names = None
+            self.stdout.write(f"[{obj.name}] 回填物化表 {obj.table_name}")
+        elif pending:
+            names = pending
+            self.stdout.write(f"[{obj.name}] 回填列: {', '.join(pending)}")
+        else:
+            self.stdout.write(f"[{obj.name}] 无需回填")
+            return
+        total = 0
+        for total in backfill_table(obj, names, options["batch_size"]):
+            self.stdout.write(f"[{obj.name}] 已处理 {total} 个账户")
+        mark_ready(obj, pending)
+        self.stdout.write(self.style.SUCCESS(f"[{obj.name}] 完成，共处理 {total} 个账户"))
@@ -0,0 +1,34 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from account.profiling import read_folded
+
+
+class Command(BaseCommand):
+    help = "合并各 worker 写入的折叠栈文件，输出可直接用于 flamegraph.pl / speedscope 的单个文件"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dir", dest="directory", default=settings.PROFILE_DIR, help="折叠栈目录")
+        parser.add_argument("--output", help="输出文件，默认输出到标准输出")
+        parser.add_argument("--top", type=int, default=0, help="只输出采样数最多的前 N 个栈")
+        parser.add_argument("--clear", action="store_true", help="合并后删除原文件")
+
+    def handle(self, *args, **options):
+        directory = options["directory"]
+        if not os.path.isdir(directory):
+            raise CommandError(f"目录不存在: {directory}")
+        stacks = read_folded(directory)
+        items = stacks.most_common(options["top"] or None)
+        lines = "".join(f"{stack} {count}\n" for stack, count in items)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as handle:
+                handle.write(lines)
+            self.stdout.write(self.style.SUCCESS(f"已合并 {len(items)} 个栈，共 {sum(stacks.values())} 个样本"))
+        else:
+            self.stdout.write(lines, ending="")
+        if options["clear"]:
+            for name in os.listdir(directory):
+                if name.endswith(".folded"):
+                    os.remove(os.path.join(directory, name))
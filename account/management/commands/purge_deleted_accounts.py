@@ -0,0 +1,41 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from account.models import Account
+from account.sharding import shard_aliases, using_shard
+from account.updates import purge_deleted
+
+
+class Command(BaseCommand):
+    help = "物理删除超过保留期的软删除账户（分批执行，可由定时任务调用）"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, default=settings.ACCOUNT_PURGE_RETENTION_DAYS, help="保留天数"
+        )
+        parser.add_argument("--batch-size", type=int, default=1000, help="每批删除的账户数")
+        parser.add_argument("--pause", type=float, default=0.0, help="批次间休眠秒数，降低对线上的影响")
+        parser.add_argument("--dry-run", action="store_true", help="只统计不删除")
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options["days"])
+        if options["dry_run"]:
+            count = sum(
+                Account.objects.using(alias).filter(deleted="1", updated_at__lt=before).count()
+                for alias in shard_aliases()
+            )
+            self.stdout.write(f"待清理 {count} 个账户（删除时间早于 {before:%Y-%m-%d %H:%M:%S}）")
+            return
+
+        # 逐个分片清理
+        total = 0
+        for alias in shard_aliases():
+            done = 0
+            with using_shard(alias):
+                for done in purge_deleted(before, options["batch_size"], options["pause"]):
+                    self.stdout.write(f"已清理 {total + done} 个账户")
+            total += done
+        self.stdout.write(self.style.SUCCESS(f"清理完成，共 {total} 个账户"))
@@ -0,0 +1,100 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from account.checks import check_shared_cache
+from account.conditional import invalidate_accounts
+from account.counts import rebuild_count
+from account.materialize import NOT_MATERIALIZED, drop_table_on, ensure_table
+from account.models import Object
+from account.sharding import copy_accounts, place_object, purge_object, remove_missing, shard_aliases
+
+
+class Command(BaseCommand):
+    help = (
+        "在线将 Object 的账户迁移到其他分片：分块复制，按 updated_at 追平增量，"
+        "短暂锁定写入后做最后一次追平并切换，最后分块清理原分片；迁移期间读取不受影响"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--object", dest="object_id", required=True, help="要迁移的 Object")
+        parser.add_argument("--to", dest="target", required=True, help="目标分片（DATABASE_SHARDS 中的别名或 default）")
+        parser.add_argument("--batch-size", type=int, default=500, help="每块复制/删除的账户数")
+        parser.add_argument("--pause", type=float, default=0.0, help="块间休眠秒数，降低对线上的影响")
+        parser.add_argument("--max-passes", type=int, default=5, help="锁定写入前最多追平增量的轮数")
+        parser.add_argument("--margin", type=float, default=5.0, help="增量追平回看的秒数，覆盖写入事务从取时间到提交的延迟")
+        parser.add_argument("--grace", type=float, default=2.0, help="锁定写入、切换分片后等待在途请求结束的秒数")
+        parser.add_argument("--keep-source", action="store_true", help="切换后保留原分片中的数据")
+
+    def handle(self, *args, **options):
+        # 写入锁定与分片切换经共享缓存的代数通知各 worker，进程内缓存下 worker 会继续写入原分片
+        errors = check_shared_cache(None)
+        if errors:
+            raise CommandError(f"{errors[0].msg}，无法在线迁移；请通过 CACHE_BACKEND / CACHE_LOCATION 配置共享缓存")
+        try:
+            obj = Object.objects.get(id=options["object_id"])
+        except Object.DoesNotExist:
+            raise CommandError("Object 不存在")
+        source, target = obj.shard, options["target"]
+        if target not in shard_aliases():
+            raise CommandError(f"分片不存在，可选: {', '.join(shard_aliases())}")
+        if source == target:
+            raise CommandError(f"Object 已在分片 {target}")
+        self.options = options
+        margin = timedelta(seconds=options["margin"])
+
+        place_object(obj, target)
+        # 物化表随账户迁移，复制时同步写入目标分片的物化表
+        if obj.materialized != NOT_MATERIALIZED:
+            ensure_table(obj, target)
+        self.stdout.write(f"[{obj.name}] {source} -> {target}：全量复制")
+        started = timezone.now()
+        copied = self.copy(obj, source, target, None)
+        for _ in range(options["max_passes"]):
+            since, started = started - margin, timezone.now()
+            copied = self.copy(obj, source, target, since)
+            self.stdout.write(f"[{obj.name}] 追平增量 {copied} 个账户")
+            if copied <= options["batch_size"]:
+                break
+
+        # 锁定写入（写请求返回 503），等待已取得分片的在途写入提交后做最后一次追平
+        self.set_locked(obj, "1")
+        try:
+            time.sleep(options["grace"])
+            copied = self.copy(obj, source, target, started - margin)
+            removed = remove_missing(obj.id, source, target, options["batch_size"])
+            _, count = rebuild_count(obj.id, using=target)
+            obj.shard = target
+            obj.shard_locked = "0"
+            obj.save(update_fields=["shard", "shard_locked"])
+        except BaseException:
+            self.set_locked(obj, "0")
+            raise
+        invalidate_accounts([obj.id])
+        self.stdout.write(f"[{obj.name}] 已切换到 {target}：最后追平 {copied} 个，删除 {removed} 个，共 {count} 个未删除账户")
+
+        if options["keep_source"]:
+            return
+        # 等待仍在读取原分片的请求结束后再清理
+        time.sleep(options["grace"])
+        total = 0
+        for total in purge_object(obj.id, source, options["batch_size"]):
+            self.stdout.write(f"[{obj.name}] 已清理原分片 {total} 个账户")
+            if options["pause"]:
+                time.sleep(options["pause"])
+        if obj.materialized != NOT_MATERIALIZED:
+            drop_table_on(source, obj.table_name)
+        self.stdout.write(self.style.SUCCESS(f"[{obj.name}] 迁移完成，已清理原分片 {total} 个账户"))
+
+    def copy(self, obj, source, target, since):
+        total = 0
+        for total in copy_accounts(obj.id, source, target, since, self.options["batch_size"]):
+            if self.options["pause"]:
+                time.sleep(self.options["pause"])
+        return total
+
+    def set_locked(self, obj, locked):
+        obj.shard_locked = locked
+        obj.save(update_fields=["shard_locked"])
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from account.indexes import backfill_indexes
+from account.models import AccountSearchToken, Object, ObjectField
+from account.sharding import using_shard
+
+
+class Command(BaseCommand):
+    help = "重建可搜索字段的全文倒排索引"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--object", dest="object_id", help="仅重建指定 Object")
+        parser.add_argument("--batch-size", type=int, default=1000, help="每批处理的账户数")
+
+    def handle(self, *args, **options):
+        objects = Object.objects.filter(deleted="0")
+        if options["object_id"]:
+            objects = objects.filter(id=options["object_id"])
+            if not objects.exists():
+                raise CommandError("Object 不存在")
+
+        for obj in objects:
+            # 词元与账户在同一分片
+            with using_shard(obj.shard):
+                fields = list(
+                    ObjectField.objects.filter(object=obj, deleted="0", searchable="1")
+                )
+                names = [f.name for f in fields]
+                # 清理已取消搜索标记字段的词元；其余按批原地重建，重建期间搜索仍可用
+                deleted, _ = (
+                    AccountSearchToken.objects.filter(object=obj).exclude(field__in=names).delete()
+                )
+                if not fields:
+                    self.stdout.write(f"[{obj.name}] 无可搜索字段，已清理 {deleted} 条词元")
+                    continue
+
+                self.stdout.write(f"[{obj.name}] 重建字段: {', '.join(names)}")
+                total = 0
+                for total in backfill_indexes(
+                    obj.id, search_fields=names, batch_size=options["batch_size"], using=obj.shard
+                ):
+                    self.stdout.write(f"[{obj.name}] 已处理 {total} 个账户")
+                tokens = AccountSearchToken.objects.filter(object=obj).count()
+                self.stdout.write(
+                    self.style.SUCCESS(f"[{obj.name}] 完成，{total} 个账户，{tokens} 条词元")
+                )
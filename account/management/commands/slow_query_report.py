@@ -0,0 +1,52 @@
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from account.slowlog import aggregate, read_entries
+
+SORT_KEYS = ("total", "count", "max", "avg")
+
+
+class Command(BaseCommand):
+    help = "按 SQL 指纹汇总慢查询记录：次数、总耗时、最大/平均耗时、来源路由与执行计划"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dir", dest="directory", default=settings.SLOW_QUERY_DIR, help="慢查询记录目录")
+        parser.add_argument("--top", type=int, default=20, help="输出前 N 个指纹")
+        parser.add_argument("--sort", choices=SORT_KEYS, default="total", help="排序依据")
+        parser.add_argument("--hours", type=float, help="只统计最近 N 小时的记录")
+        parser.add_argument("--plans", action="store_true", help="输出执行计划")
+        parser.add_argument("--json", action="store_true", help="以 JSON 输出")
+
+    def handle(self, *args, **options):
+        since = time.time() - options["hours"] * 3600 if options["hours"] else None
+        groups = aggregate(read_entries(options["directory"], since))
+        sort_key = "count" if options["sort"] == "count" else f"{options['sort']}_ms"
+        groups.sort(key=lambda group: group[sort_key], reverse=True)
+        groups = groups[: options["top"]]
+
+        if options["json"]:
+            self.stdout.write(json.dumps(groups, ensure_ascii=False, indent=2))
+            return
+        if not groups:
+            self.stdout.write("没有慢查询记录")
+            return
+        for rank, group in enumerate(groups, start=1):
+            routes = sorted(group["routes"].items(), key=lambda item: -item[1])
+            routes = ", ".join(f"{route}×{count}" for route, count in routes)
+            self.stdout.write(
+                self.style.WARNING(
+                    f"#{rank} [{group['fingerprint']}] 次数 {group['count']}，总耗时 {group['total_ms']:.1f}ms，"
+                    f"平均 {group['avg_ms']:.1f}ms，最大 {group['max_ms']:.1f}ms"
+                )
+            )
+            self.stdout.write(f"  来源: {routes}")
+            self.stdout.write(f"  SQL: {group['normalized']}")
+            if group["sample_params"] is not None:
+                self.stdout.write(f"  最慢一次参数（脱敏）: {group['sample_params']}")
+            if options["plans"] and group["plan"]:
+                self.stdout.write("  执行计划:")
+                for row in group["plan"]:
+                    self.stdout.write("    " + " | ".join(f"{key}={value}" for key, value in row.items()))
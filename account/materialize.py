@@ -0,0 +1,418 @@
+import json
+import re
+import threading
+from datetime import date
+
+from django.apps import apps as django_apps
+from django.apps.registry import Apps
+from django.db import connections, models, router, transaction
+from django.db.models import Exists, OuterRef, Q
+
+from .metadata import get_field_indexes, invalidate_field_indexes
+from .models import Account, Object, ObjectField
+
+# Object.materialized / ObjectField.materialized 的取值
+NOT_MATERIALIZED = "0"
+MAINTAINED = "1"
+READY = "2"
+
+# 物化表的表名与列名：字母开头，不含双下划线（ORM 查询分隔符），不超过 MySQL 标识符上限
+IDENTIFIER_RE = re.compile(r"[A-Za-z][A-Za-z0-9_]{0,63}")
+
+# 物化表的固定列，业务字段不能使用
+RESERVED_COLUMNS = frozenset({"id", "overflow"})
+
+# 短文本列长度上限（utf8mb4 下单列索引最多 191 字符），更长的值只保存前缀并记为溢出
+TEXT_MAX_LENGTH = 191
+
+# 文本类列，可用于搜索
+TEXT_TYPES = frozenset({None, "", "text", "textarea", "longtext"})
+
+# 按 (表名, 列) 缓存的物化表模型
+_models = {}
+_models_lock = threading.Lock()
+
+
+class MaterializeError(Exception):
+    """无法建立物化表（表名不合法或冲突）"""
+
+
+def column_name_ok(name):
+    return bool(IDENTIFIER_RE.fullmatch(name)) and "__" not in name and name.lower() not in RESERVED_COLUMNS
+
+
+def column_field(field_type, name):
+    """ObjectField.type 对应的列，未知类型按短文本处理；除长文本外每列单独建索引"""
+    options = {"db_column": name, "null": True, "db_index": True}
+    if field_type in ("integer", "int"):
+        return models.BigIntegerField(**options)
+    if field_type in ("number", "float", "decimal"):
+        return models.FloatField(**options)
+    if field_type in ("boolean", "bool"):
+        return models.BooleanField(**options)
+    if field_type == "date":
+        return models.DateField(**options)
+    if field_type in ("textarea", "longtext"):
+        return models.TextField(db_column=name, null=True)
+    return models.CharField(max_length=TEXT_MAX_LENGTH, **options)
+
+
+def to_column(field_type, value):
+    """JSON 值转为列值，返回 (列值, 是否可由列值精确还原)
+
+    无法精确还原时，文本列保存截断的文本（仍用于排序与过滤，展示时读取原值），其他列为 None。
+    """
+    if value is None:
+        return None, False
+    if field_type in ("integer", "int"):
+        exact = isinstance(value, int) and not isinstance(value, bool) and abs(value) < 2 ** 63
+    elif field_type in ("number", "float", "decimal"):
+        # 整数还原为浮点数会改变 JSON 表示，只接受 2^53 以内的整数与非整数浮点数
+        exact = (isinstance(value, int) and not isinstance(value, bool) and abs(value) < 2 ** 53) or (
+            isinstance(value, float) and not value.is_integer()
+        )
+    elif field_type in ("boolean", "bool"):
+        exact = isinstance(value, bool)
+    elif field_type == "date":
+        try:
+            exact = isinstance(value, str) and date.fromisoformat(value).isoformat() == value
+        except ValueError:
+            exact = False
+        return (date.fromisoformat(value), True) if exact else (None, False)
+    elif field_type in ("textarea", "longtext"):
+        if isinstance(value, str):
+            return value, True
+        return json.dumps(value, ensure_ascii=False), False
+    else:
+        text = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+        return text[:TEXT_MAX_LENGTH], isinstance(value, str) and len(value) <= TEXT_MAX_LENGTH
+    return (value, True) if exact else (None, False)
+
+
+def from_column(field_type, value):
+    """列值还原为 JSON 值"""
+    if field_type == "date":
+        return value.isoformat()
+    if field_type in ("number", "float", "decimal") and value.is_integer():
+        return int(value)
+    return value
+
+
+class MaterializedRow:
+    """物化表的行：提供列表与导出所需的 id、data，与 Account 用法相同
+
+    业务字段 name 的列在模型上的属性名为 c_<name>（db_column 为 name），避免与模型方法重名。
+    """
+
+    # ((业务字段名, 类型), ...)
+    columns = ()
+
+    @staticmethod
+    def attr(name):
+        return f"c_{name}"
+
+    @classmethod
+    def from_account(cls, account):
+        data = account.data or {}
+        row = cls(id=account.id)
+        exact = True
+        for name, field_type in cls.columns:
+            if name in data:
+                value, ok = to_column(field_type, data[name])
+                exact = exact and ok
+                setattr(row, cls.attr(name), value)
+        row.overflow = "0" if exact else "1"
+        return row
+
+    @property
+    def data(self):
+        """由列还原的业务数据；溢出行读取 t_account 中的原始数据"""
+        if self.overflow == "1":
+            if "_data" not in self.__dict__:
+                self._data = (
+                    Account.objects.using(self._state.db).filter(pk=self.pk).values_list("data", flat=True).first()
+                    or {}
+                )
+            return self._data
+        data = {}
+        for name, field_type in self.columns:
+            value = getattr(self, self.attr(name))
+            if value is not None:
+                data[name] = from_column(field_type, value)
+        return data
+
+
+def table_model(table_name, columns):
+    """物化表的模型（非托管，注册在独立的 app registry 中，不影响迁移与全局模型）"""
+    key = (table_name, tuple(columns))
+    with _models_lock:
+        model = _models.get(key)
+        if model is None:
+            meta = type("Meta", (), {"apps": Apps(), "app_label": "account", "db_table": table_name, "managed": False})
+            attrs = {
+                "__module__": __name__,
+                "Meta": meta,
+                "id": models.UUIDField(primary_key=True),
+                # 是否存在列无法精确表示的值，是则展示时读取 t_account
+                "overflow": models.CharField(max_length=1, default="0"),
+                "columns": tuple(columns),
+            }
+            for name, field_type in columns:
+                attrs[MaterializedRow.attr(name)] = column_field(field_type, name)
+            model = _models[key] = type(f"Materialized_{table_name}", (MaterializedRow, models.Model), attrs)
+        return model
+
+
+def spec_model(spec):
+    return table_model(spec.table_name, [(name, field_type) for name, field_type, _ in spec.columns])
+
+
+def table_spec(object_id):
+    """Object 的物化表配置（带缓存），未物化时返回 None"""
+    return get_field_indexes(object_id).table
+
+
+def materialized_queryset(object_id, field_names, text_names=()):
+    """Object 已物化且 field_names、text_names 的列均已回填时，返回物化表中未删除账户的查询集，否则返回 None
+
+    text_names 为需做文本匹配（搜索）的字段，要求为文本列。删除标记以 t_account 为准（按主键半连接过滤）。
+    """
+    spec = table_spec(object_id)
+    if spec is None or spec.state != READY:
+        return None
+    columns = {name: (field_type, state) for name, field_type, state in spec.columns}
+    for name in {*field_names, *text_names}:
+        if columns.get(name, (None, None))[1] != READY:
+            return None
+    if any(columns[name][0] not in TEXT_TYPES for name in text_names):
+        return None
+    model = spec_model(spec)
+    active = Account.objects.filter(pk=OuterRef("pk"), object_id=object_id, deleted="0")
+    return model.objects.using(router.db_for_read(Account)).filter(Exists(active))
+
+
+def is_materialized(queryset):
+    return issubclass(queryset.model, MaterializedRow)
+
+
+def data_q(queryset, object_id, name, lookup, value):
+    """业务字段的过滤条件，等价于 Account 的 data__<name>__<lookup>
+
+    queryset 为物化表时，溢出行回到 t_account 判断：子查询限定在该 Object 与物化表所在的数据库（分片）。
+    """
+    model = queryset.model
+    if not issubclass(model, MaterializedRow):
+        return Q(**{f"data__{name}__{lookup}": value})
+    overflow = (
+        Account.objects.using(queryset.db)
+        .filter(object_id=object_id, **{f"data__{name}__{lookup}": value})
+        .values("id")
+    )
+    return Q(**{f"{model.attr(name)}__{lookup}": value}) | Q(overflow="1", id__in=overflow)
+
+
+def load_overflow(rows):
+    """一次读取一批物化行中溢出行的原始数据，避免逐行查询"""
+    pending = [
+        row for row in rows
+        if isinstance(row, MaterializedRow) and row.overflow == "1" and "_data" not in row.__dict__
+    ]
+    if pending:
+        data = dict(
+            Account.objects.using(pending[0]._state.db)
+            .filter(pk__in=[row.pk for row in pending])
+            .values_list("id", "data")
+        )
+        for row in pending:
+            row._data = data.get(row.pk) or {}
+
+
+def write_rows(model, accounts, using, names=None):
+    """按账户覆盖写入物化行（upsert），names 指定时已存在的行只更新这些列"""
+    names = [name for name, _ in model.columns] if names is None else names
+    update_fields = [model.attr(name) for name in names] + ["overflow"]
+    # MySQL 的 ON DUPLICATE KEY UPDATE 不能指定冲突列
+    target = {"unique_fields": ["id"]} if connections[using].features.supports_update_conflicts_with_target else {}
+    model.objects.using(using).bulk_create(
+        [model.from_account(account) for account in accounts],
+        update_conflicts=True,
+        update_fields=update_fields,
+        **target,
+    )
+
+
+def sync_materialized(accounts, using=None):
+    """账户写入后更新所属 Object 的物化表，Object 未物化时不访问数据库"""
+    groups = {}
+    for account in accounts:
+        spec = table_spec(account.object_id)
+        if spec is not None and spec.columns:
+            groups.setdefault(spec, []).append(account)
+    for spec, batch in groups.items():
+        write_rows(spec_model(spec), batch, using or router.db_for_write(Account))
+
+
+def check_table_name(obj):
+    """检查 Object.table_name 可用作物化表名，冲突时抛出 MaterializeError"""
+    name = obj.table_name
+    if not name or not IDENTIFIER_RE.fullmatch(name) or "__" in name:
+        raise MaterializeError(f"table_name 不是合法的表名: {name!r}")
+    # MySQL 表名可能不区分大小写，按小写比较
+    managed = {model._meta.db_table.lower() for model in django_apps.get_models(include_auto_created=True)}
+    if name.lower() in managed:
+        raise MaterializeError(f"表 {name} 是系统表")
+    others = Object.objects.exclude(pk=obj.pk).exclude(materialized=NOT_MATERIALIZED)
+    if any((other or "").lower() == name.lower() for other in others.values_list("table_name", flat=True)):
+        raise MaterializeError(f"表 {name} 已被其他 Object 使用")
+    if name.lower() in {table.lower() for table in connections[obj.shard].introspection.table_names()}:
+        raise MaterializeError(f"表 {name} 已存在")
+
+
+def _table_columns(alias, table_name):
+    """数据库中物化表的现有列，表不存在时返回 None"""
+    connection = connections[alias]
+    with connection.cursor() as cursor:
+        if table_name not in connection.introspection.table_names(cursor):
+            return None
+        return {column.name for column in connection.introspection.get_table_description(cursor, table_name)}
+
+
+def _column_fields(obj):
+    """Object 中可物化的字段（未删除、字段名可作列名），同名字段只取第一个"""
+    fields = {}
+    for field in ObjectField.objects.filter(object=obj, deleted="0").order_by("name", "id"):
+        if column_name_ok(field.name):
+            fields.setdefault(field.name, field)
+    return list(fields.values())
+
+
+def create_table(obj):
+    """建立物化表（每个可物化字段一列），之后账户写入同步维护，回填完成前列表仍读取 t_account"""
+    check_table_name(obj)
+    fields = _column_fields(obj)
+    model = table_model(obj.table_name, [(field.name, field.type) for field in fields])
+    with connections[obj.shard].schema_editor() as editor:
+        editor.create_model(model)
+    ObjectField.objects.filter(object=obj).update(materialized=NOT_MATERIALIZED)
+    ObjectField.objects.filter(pk__in=[field.pk for field in fields]).update(materialized=MAINTAINED)
+    Object.objects.filter(pk=obj.pk).update(materialized=MAINTAINED)
+    obj.materialized = MAINTAINED
+    invalidate_field_indexes()
+
+
+def ensure_table(obj, alias):
+    """在 alias 中建立与当前列相同的物化表（迁移分片时使用），已存在时不处理"""
+    if _table_columns(alias, obj.table_name) is not None:
+        return
+    invalidate_field_indexes()
+    spec = table_spec(obj.id)
+    columns = [] if spec is None else [(name, field_type) for name, field_type, _ in spec.columns]
+    with connections[alias].schema_editor() as editor:
+        editor.create_model(table_model(obj.table_name, columns))
+
+
+def drop_table(obj):
+    """取消物化：先停止读写物化表，再删除表"""
+    ObjectField.objects.filter(object=obj).update(materialized=NOT_MATERIALIZED)
+    Object.objects.filter(pk=obj.pk).update(materialized=NOT_MATERIALIZED)
+    obj.materialized = NOT_MATERIALIZED
+    invalidate_field_indexes()
+    drop_table_on(obj.shard, obj.table_name)
+
+
+def drop_table_on(alias, table_name):
+    if _table_columns(alias, table_name) is not None:
+        with connections[alias].schema_editor() as editor:
+            editor.delete_model(table_model(table_name, []))
+
+
+def sync_columns(object_id):
+    """按 ObjectField 增删物化表的列（ADD / DROP COLUMN，不重建整表），返回 (新增列, 删除列)
+
+    新列标记为写入维护、等待回填（materialize_tables）；改名、改类型的字段删除旧列后重新加列。
+    """
+    obj = Object.objects.filter(pk=object_id).first()
+    if obj is None or obj.materialized == NOT_MATERIALIZED:
+        return [], []
+    existing = _table_columns(obj.shard, obj.table_name)
+    if existing is None:
+        return [], []
+    fields = _column_fields(obj)
+    keep = [field for field in fields if field.materialized != NOT_MATERIALIZED and field.name in existing]
+    add = [field for field in fields if field not in keep]
+    stale = sorted(existing - RESERVED_COLUMNS - {field.name for field in keep})
+
+    columns = [(field.name, field.type) for field in keep]
+    with connections[obj.shard].schema_editor() as editor:
+        # 先删旧列（stale 中可能有与新列同名的改类型字段）
+        for index, name in enumerate(stale):
+            model = table_model(obj.table_name, columns + [(column, None) for column in stale[index:]])
+            editor.remove_field(model, model._meta.get_field(MaterializedRow.attr(name)))
+        for field in add:
+            columns.append((field.name, field.type))
+            model = table_model(obj.table_name, columns)
+            editor.add_field(model, model._meta.get_field(MaterializedRow.attr(field.name)))
+
+    ObjectField.objects.filter(object=obj).exclude(pk__in=[field.pk for field in keep]).update(
+        materialized=NOT_MATERIALIZED
+    )
+    ObjectField.objects.filter(pk__in=[field.pk for field in add]).update(materialized=MAINTAINED)
+    invalidate_field_indexes()
+    return [field.name for field in add], stale
+
+
+def backfill_table(obj, names=None, batch_size=1000):
+    """按主键分批回填物化表，每批一个短事务并锁定本批账户行，逐批 yield 已处理的账户数
+
+    names 指定时只更新这些列（新增列的回填），缺失的行整行写入。
+    """
+    spec = table_spec(obj.id)
+    if spec is None:
+        return
+    model = spec_model(spec)
+    total = 0
+    last_id = None
+    while True:
+        with transaction.atomic(using=obj.shard):
+            batch = Account.objects.using(obj.shard).filter(object_id=obj.id).order_by("id")
+            if last_id is not None:
+                batch = batch.filter(id__gt=last_id)
+            accounts = list(batch.select_for_update()[:batch_size])
+            if not accounts:
+                break
+            write_rows(model, accounts, obj.shard, names)
+        total += len(accounts)
+        last_id = accounts[-1].id
+        yield total
+
+
+def prune_rows(obj, batch_size=1000):
+    """删除物化表中账户已被物理删除（或已迁出）的行，返回删除数"""
+    spec = table_spec(obj.id)
+    if spec is None:
+        return 0
+    rows = spec_model(spec).objects.using(obj.shard)
+    removed = 0
+    last_id = None
+    while True:
+        chunk = rows.order_by("id") if last_id is None else rows.filter(id__gt=last_id).order_by("id")
+        ids = list(chunk.values_list("id", flat=True)[:batch_size])
+        if not ids:
+            return removed
+        existing = set(
+            Account.objects.using(obj.shard).filter(id__in=ids, object_id=obj.id).values_list("id", flat=True)
+        )
+        missing = [row_id for row_id in ids if row_id not in existing]
+        if missing:
+            # 物化表模型没有删除信号与关联，delete() 直接执行单条 DELETE
+            deleted, _ = rows.filter(id__in=missing).delete()
+            removed += deleted
+        last_id = ids[-1]
+
+
+def mark_ready(obj, names):
+    """回填完成：列表与导出开始读取这些列"""
+    ObjectField.objects.filter(object=obj, name__in=names, materialized=MAINTAINED).update(materialized=READY)
+    Object.objects.filter(pk=obj.pk).update(materialized=READY)
+    obj.materialized = READY
+    invalidate_field_indexes()
@@ -0,0 +1,173 @@
+from collections import namedtuple
+
+from .cache import VersionedCache
+from .models import Object, ObjectField, PageList, PageListField, PageLayout, PageLayoutField
+
+# 字段映射缓存（Object + PageList + PageListField）
+field_map_cache = VersionedCache(
+    "field_map", "METADATA_CACHE_SIZE", "METADATA_CACHE_TIMEOUT"
+)
+
+# 页面布局缓存（PageLayout + PageLayoutField + ObjectField）
+layout_cache = VersionedCache(
+    "page_layout", "METADATA_CACHE_SIZE", "METADATA_CACHE_TIMEOUT"
+)
+
+# 字段索引配置缓存（ObjectField.sortable / searchable / sort_indexed / search_indexed）
+field_index_cache = VersionedCache(
+    "field_index", "METADATA_CACHE_SIZE", "METADATA_CACHE_TIMEOUT"
+)
+
+# 编译后的页面布局：name 为布局名称，fields 为有序的 ((业务字段名, 显示名称), ...)
+CompiledLayout = namedtuple("CompiledLayout", ["name", "fields"])
+
+# 字段索引配置：sort_fields/search_fields 为写入时需维护索引的字段（已标记），
+# sortable/searchable 为已回填完成、查询可用的字段，table 为物化表配置（未物化时为 None）
+FieldIndexes = namedtuple(
+    "FieldIndexes", ["sort_fields", "search_fields", "sortable", "searchable", "table"]
+)
+
+# 物化表配置：state 为 Object.materialized，columns 为已建立的列 ((业务字段名, 类型, 列状态), ...)
+TableSpec = namedtuple("TableSpec", ["table_name", "state", "columns"])
+
+
+def _build_field_map(object_id):
+    """从数据库生成字段映射，返回 (field_map, error)"""
+    try:
+        obj = Object.objects.get(id=object_id)
+    except Object.DoesNotExist:
+        return {}, "Object 不存在"
+
+    # 查询关联的 PageList
+    page_list = (
+        PageList.objects.filter(pagelistfield__object_field__object=obj, deleted="0")
+        .distinct()
+        .first()
+    )
+    if not page_list:
+        return {}, "未找到页面配置"
+
+    # 一次查询取出 {业务字段名: 显示名称}，避免逐条访问 object_field
+    field_map = dict(
+        PageListField.objects.filter(
+            page_list=page_list, deleted="0", hidden="0"
+        ).values_list("object_field__name", "name")
+    )
+    if not field_map:
+        return {}, "未配置展示字段"
+
+    return field_map, None
+
+
+def get_field_map(object_id):
+    """生成字段映射（带缓存）"""
+    field_map, error = field_map_cache.get_or_set(
+        str(object_id), lambda: _build_field_map(object_id)
+    )
+    # 返回副本，防止调用方修改缓存内容
+    return dict(field_map), error
+
+
+def invalidate_field_maps(using=None):
+    field_map_cache.invalidate(using=using)
+
+
+def _build_layout(pagelist_id):
+    """从数据库编译页面布局，未配置时返回 None"""
+    try:
+        page_layout = PageLayout.objects.get(page_list_id=pagelist_id)
+    except PageLayout.DoesNotExist:
+        return None
+
+    fields = tuple(
+        PageLayoutField.objects.filter(page_layout=page_layout).values_list(
+            "object_field__name", "name"
+        )
+    )
+    return CompiledLayout(page_layout.name, fields)
+
+
+def get_page_layout(pagelist_id):
+    """根据 pagelist_id 获取编译后的页面布局（带缓存）"""
+    return layout_cache.get_or_set(str(pagelist_id), lambda: _build_layout(pagelist_id))
+
+
+def invalidate_layouts(using=None):
+    layout_cache.invalidate(using=using)
+
+
+def _build_field_indexes(object_id):
+    sort_fields, search_fields, sortable, searchable, columns = [], [], [], [], []
+    table = None
+    rows = ObjectField.objects.filter(object_id=object_id, deleted="0").values_list(
+        "name", "sortable", "searchable", "sort_indexed", "search_indexed",
+        "type", "materialized", "object__table_name", "object__materialized",
+    )
+    for (
+        name, is_sortable, is_searchable, sort_indexed, search_indexed,
+        field_type, column, table_name, materialized,
+    ) in rows:
+        if materialized != "0":
+            table = (table_name, materialized)
+            if column != "0":
+                columns.append((name, field_type, column))
+        if is_sortable == "1":
+            sort_fields.append(name)
+            if sort_indexed == "1":
+                sortable.append(name)
+        if is_searchable == "1":
+            search_fields.append(name)
+            if search_indexed == "1":
+                searchable.append(name)
+    return FieldIndexes(
+        tuple(sort_fields),
+        tuple(search_fields),
+        frozenset(sortable),
+        tuple(searchable),
+        table and TableSpec(*table, tuple(columns)),
+    )
+
+
+def get_field_indexes(object_id):
+    """获取某个 Object 的字段索引配置（带缓存）"""
+    return field_index_cache.get_or_set(
+        str(object_id), lambda: _build_field_indexes(object_id)
+    )
+
+
+def invalidate_field_indexes(using=None):
+    field_index_cache.invalidate(using=using)
+
+
+def get_object_field_names(object_id):
+    """获取某个 Object 已定义的字段名集合（带缓存）"""
+    return field_index_cache.get_or_set(
+        ("names", str(object_id)),
+        lambda: frozenset(
+            ObjectField.objects.filter(object_id=object_id, deleted="0").values_list(
+                "name", flat=True
+            )
+        ),
+    )
+
+
+def get_object_field_types(object_id):
+    """获取某个 Object 已定义字段的 {字段名: ObjectField.type}（带缓存），用于校验写入的值"""
+    return field_index_cache.get_or_set(
+        ("types", str(object_id)),
+        lambda: dict(
+            ObjectField.objects.filter(object_id=object_id, deleted="0").values_list("name", "type")
+        ),
+    )
+
+
+def get_indexed_field_names():
+    """获取所有 Object 中已标记可排序/可搜索或已物化的字段名（带缓存），用于判断局部更新是否需要维护索引"""
+    return field_index_cache.get_or_set(
+        ("indexed_names",),
+        lambda: frozenset(
+            ObjectField.objects.filter(deleted="0")
+            .exclude(sortable="0", searchable="0", materialized="0")
+            .values_list("name", flat=True)
+        ),
+    )
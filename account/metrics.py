@@ -0,0 +1,350 @@
+import glob
+import hmac
+import json
+import math
+import os
+import threading
+import time
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows：不判断 worker 是否退出（见 _pid_alive），不需要文件锁
+    fcntl = None
+
+from .cache import cache_stats
+from .pool import pool_stats
+
+# 请求耗时直方图的桶上界（秒）
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# 指标名 -> (类型, 说明)
+METRICS = {
+    "crm_http_requests_total": ("counter", "按路由、动作、方法与状态码统计的请求数"),
+    "crm_http_request_errors_total": ("counter", "返回 5xx 的请求数"),
+    "crm_http_request_duration_seconds": ("histogram", "请求耗时"),
+    "crm_db_queries_total": ("counter", "请求内执行的 SQL 条数"),
+    "crm_db_query_duration_seconds_total": ("counter", "请求内 SQL 累计耗时"),
+    "crm_metadata_cache_requests_total": ("counter", "请求内元数据缓存的命中/未命中次数"),
+    "crm_metadata_cache_hits_total": ("counter", "元数据缓存命中数（进程内 / 共享缓存）"),
+    "crm_metadata_cache_misses_total": ("counter", "元数据缓存未命中数"),
+    "crm_metadata_cache_hit_ratio": ("gauge", "元数据缓存命中率"),
+    "crm_db_pool_checkouts_total": ("counter", "从连接池借出连接的次数"),
+    "crm_db_pool_waits_total": ("counter", "连接全部借出、需要等待归还的借出次数"),
+    "crm_db_pool_wait_seconds_total": ("counter", "等待连接归还的累计时间"),
+    "crm_db_pool_timeouts_total": ("counter", "等待连接超时的次数"),
+    "crm_db_pool_connections_created_total": ("counter", "连接池新建的连接数"),
+    "crm_db_pool_connections_closed_total": ("counter", "连接池关闭的连接数（空闲超时、出错、检查失败）"),
+    "crm_db_pool_ping_failures_total": ("counter", "借出前检查失败的连接数"),
+    "crm_db_pool_connections": ("gauge", "连接池当前的空闲/借出连接数"),
+}
+
+# 已退出 worker 的计数器与直方图累计值（不含 gauge）及合并时使用的锁文件，位于 METRICS_DIR
+AGGREGATE_FILE = "aggregate.json"
+AGGREGATE_LOCK = "aggregate.lock"
+
+# 连接池统计项 -> 指标名
+POOL_COUNTERS = {
+    "checkouts": "crm_db_pool_checkouts_total",
+    "waits": "crm_db_pool_waits_total",
+    "wait_seconds": "crm_db_pool_wait_seconds_total",
+    "timeouts": "crm_db_pool_timeouts_total",
+    "created": "crm_db_pool_connections_created_total",
+    "closed": "crm_db_pool_connections_closed_total",
+    "ping_failures": "crm_db_pool_ping_failures_total",
+}
+
+
+class MetricsRegistry:
+    """进程内指标注册表
+
+    多 worker 部署时配置 METRICS_DIR：每个进程定期将累计值原子写入 METRICS_DIR/metrics-<pid>.json，
+    /metrics 读取存活 worker 的文件求和。已退出 worker 的计数器与直方图并入 aggregate.json 后删除其文件
+    （与 prometheus_client 多进程模式相同，worker 回收后计数器不回退），gauge 直接丢弃；
+    超过 METRICS_STALE_SECONDS 未更新的文件（如其他主机或 pid 被复用）跳过。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self._last_flush = 0.0
+
+    def inc(self, name, labels, value=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            entry = self.histograms.get(key)
+            if entry is None:
+                entry = self.histograms[key] = [[0] * len(DURATION_BUCKETS), 0.0, 0]
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def snapshot(self):
+        """当前进程的累计值（可 JSON 序列化）"""
+        with self._lock:
+            counters = [[name, list(labels), value] for (name, labels), value in self.counters.items()]
+            histograms = [
+                [name, list(labels), list(buckets), total, count]
+                for (name, labels), (buckets, total, count) in self.histograms.items()
+            ]
+        for stats in cache_stats():
+            labels = [["namespace", stats["namespace"]]]
+            counters.append(["crm_metadata_cache_hits_total", labels + [["level", "local"]], stats["local_hits"]])
+            counters.append(["crm_metadata_cache_hits_total", labels + [["level", "shared"]], stats["shared_hits"]])
+            counters.append(["crm_metadata_cache_misses_total", labels, stats["misses"]])
+        for stats in pool_stats():
+            labels = [["alias", stats["alias"]]]
+            for key, name in POOL_COUNTERS.items():
+                counters.append([name, labels, stats[key]])
+            # 各进程的连接数求和即为全部 worker 占用的连接数
+            counters.append(["crm_db_pool_connections", labels + [["state", "idle"]], stats["idle"]])
+            counters.append(["crm_db_pool_connections", labels + [["state", "in_use"]], stats["in_use"]])
+        return {"pid": os.getpid(), "counters": counters, "histograms": histograms}
+
+    def flush(self, force=False):
+        """将累计值写入 METRICS_DIR（未配置时不写），非强制时按 METRICS_FLUSH_INTERVAL 限频"""
+        directory = settings.METRICS_DIR
+        if not directory:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < settings.METRICS_FLUSH_INTERVAL:
+            return
+        self._last_flush = now
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"metrics-{os.getpid()}.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            json.dump(self.snapshot(), handle)
+        os.replace(tmp_path, path)
+
+    def collect(self):
+        """汇总所有进程的指标，返回 (counters, histograms)"""
+        directory = settings.METRICS_DIR
+        if directory:
+            self.flush(force=True)
+            snapshots = []
+            dead = []
+            stale_before = time.time() - settings.METRICS_STALE_SECONDS
+            for path in glob.glob(os.path.join(directory, "metrics-*.json")):
+                pid = _file_pid(path)
+                if pid is None or not _pid_alive(pid):
+                    dead.append(path)
+                    continue
+                try:
+                    if os.path.getmtime(path) < stale_before:
+                        continue
+                    snapshots.append(_read_snapshot(path))
+                except (OSError, ValueError):
+                    continue
+            if dead:
+                merge_dead_workers(directory, dead)
+            try:
+                snapshots.append(_read_snapshot(os.path.join(directory, AGGREGATE_FILE)))
+            except (OSError, ValueError):
+                pass
+        else:
+            snapshots = [self.snapshot()]
+        return sum_snapshots(snapshots)
+
+
+registry = MetricsRegistry()
+
+
+def sum_snapshots(snapshots):
+    """按指标名与标签求和，返回 (counters, histograms)"""
+    counters = {}
+    histograms = {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot["counters"]:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, buckets, total, count in snapshot["histograms"]:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            entry = histograms.setdefault(key, [[0] * len(DURATION_BUCKETS), 0.0, 0])
+            entry[0] = [a + b for a, b in zip(entry[0], buckets)]
+            entry[1] += total
+            entry[2] += count
+    return counters, histograms
+
+
+def merge_dead_workers(directory, paths):
+    """将已退出 worker 的计数器与直方图并入 aggregate.json 后删除其文件，gauge 丢弃
+
+    持有文件锁执行，多个 worker 同时汇总时每个文件只合并一次。
+    """
+    with open(os.path.join(directory, AGGREGATE_LOCK), "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        aggregate_path = os.path.join(directory, AGGREGATE_FILE)
+        try:
+            snapshots = [_read_snapshot(aggregate_path)]
+        except FileNotFoundError:
+            snapshots = []
+        merged = []
+        for path in paths:
+            try:
+                snapshot = _read_snapshot(path)
+            except FileNotFoundError:
+                # 已由其他 worker 合并
+                continue
+            except (OSError, ValueError):
+                snapshot = None
+            if snapshot is not None:
+                snapshot["counters"] = [
+                    entry for entry in snapshot["counters"] if METRICS.get(entry[0], ("counter",))[0] != "gauge"
+                ]
+                snapshots.append(snapshot)
+            merged.append(path)
+        if not merged:
+            return
+        counters, histograms = sum_snapshots(snapshots)
+        aggregate = {
+            "pid": None,
+            "counters": [[name, list(labels), value] for (name, labels), value in counters.items()],
+            "histograms": [
+                [name, list(labels), buckets, total, count]
+                for (name, labels), (buckets, total, count) in histograms.items()
+            ],
+        }
+        tmp_path = f"{aggregate_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            json.dump(aggregate, handle)
+        os.replace(tmp_path, aggregate_path)
+        for path in merged:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def _read_snapshot(path):
+    with open(path, encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def _file_pid(path):
+    try:
+        return int(os.path.basename(path)[len("metrics-"):-len(".json")])
+    except ValueError:
+        return None
+
+
+def _pid_alive(pid):
+    """pid 对应的进程是否存在（Windows 上 os.kill 会结束进程，不检查，只依据文件更新时间）"""
+    if pid == os.getpid() or os.name == "nt":
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def metrics_authorized(request):
+    """指标与缓存统计只对 staff 用户或携带 Authorization: Bearer <METRICS_TOKEN> 的请求开放"""
+    token = settings.METRICS_TOKEN
+    if token and hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return True
+    user = getattr(request, "user", None)
+    return bool(user is not None and user.is_staff)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (k, str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')) for k, v in labels
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        if math.isinf(value):
+            return "+Inf"
+        return repr(value)
+    return str(value)
+
+
+def render_metrics(counters, histograms):
+    """按 Prometheus 文本格式（0.0.4）输出"""
+    # 命中率由汇总后的命中/未命中数计算
+    ratios = {}
+    for (name, labels), value in counters.items():
+        if name in ("crm_metadata_cache_hits_total", "crm_metadata_cache_misses_total"):
+            namespace = dict(labels)["namespace"]
+            hits, total = ratios.get(namespace, (0, 0))
+            ratios[namespace] = (hits + (value if name == "crm_metadata_cache_hits_total" else 0), total + value)
+    gauges = {
+        ("crm_metadata_cache_hit_ratio", (("namespace", namespace),)): round(hits / total, 4) if total else 0.0
+        for namespace, (hits, total) in ratios.items()
+    }
+
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        samples = [(labels, value) for (n, labels), value in sorted({**counters, **gauges}.items()) if n == name]
+        series = sorted((labels, entry) for (n, labels), entry in histograms.items() if n == name)
+        if not samples and not series:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for labels, (buckets, total, count) in series:
+            cumulative = 0
+            for bound, bucket in zip(DURATION_BUCKETS, buckets):
+                cumulative += bucket
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(float(total))}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+    return "\n".join(lines) + "\n"
+
+
+def route_labels(request):
+    """从路由解析结果得到 (route, action)：DRF 视图集取 basename 与动作名，其余取 URL 名称"""
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unmatched", ""
+    func = match.func
+    initkwargs = getattr(func, "initkwargs", None) or {}
+    actions = getattr(func, "actions", None)
+    route = initkwargs.get("basename") or match.url_name or "other"
+    if actions:
+        action = actions.get(request.method.lower(), "")
+    else:
+        action = match.url_name or ""
+    return route, action
+
+
+def record_request(request, response, duration, timer):
+    """请求结束时记录指标，duration 为请求耗时（秒），timer 提供 SQL 与缓存统计"""
+    route, action = route_labels(request)
+    labels = {"route": route, "action": action}
+    registry.inc(
+        "crm_http_requests_total", {**labels, "method": request.method, "status": str(response.status_code)}
+    )
+    if response.status_code >= 500:
+        registry.inc("crm_http_request_errors_total", labels)
+    registry.observe("crm_http_request_duration_seconds", labels, duration)
+    registry.inc("crm_db_queries_total", labels, timer.queries)
+    registry.inc("crm_db_query_duration_seconds_total", labels, timer.sql_ms / 1000)
+    for namespace, (hits, misses) in timer.cache.items():
+        if hits:
+            registry.inc("crm_metadata_cache_requests_total", {**labels, "namespace": namespace, "result": "hit"}, hits)
+        if misses:
+            registry.inc(
+                "crm_metadata_cache_requests_total", {**labels, "namespace": namespace, "result": "miss"}, misses
+            )
+    registry.flush()
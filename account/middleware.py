@@ -0,0 +1,275 @@
+import json
+import logging
+import re
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+
+from .metrics import record_request, route_labels
+from .profiling import RequestSampler, aprofile_call, profile_call
+from .routers import PIN_COOKIE, PIN_HEADER, choose_replica, reset_replica, use_replica
+from .slowlog import clear_route, set_route
+from .timing import RequestTimer, activate, current_timer, deactivate
+
+logger = logging.getLogger("account.timing")
+
+
+class RequestTimingMiddleware:
+    """请求计时：总耗时、SQL 次数与耗时、视图内命名阶段，输出 Server-Timing 响应头与结构化日志
+
+    REQUEST_TIMING_ENABLED 为 False 时在加载阶段抛出 MiddlewareNotUsed，不进入中间件链。
+    SQL 由 timing.execute_wrapper 计入当前计时器，同时支持同步与异步请求链。
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_TIMING_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timer = RequestTimer()
+        token = activate(timer)
+        try:
+            response = self.get_response(request)
+        finally:
+            deactivate(token)
+        return self.finish(request, response, timer)
+
+    async def __acall__(self, request):
+        timer = RequestTimer()
+        token = activate(timer)
+        try:
+            response = await self.get_response(request)
+        finally:
+            deactivate(token)
+        return self.finish(request, response, timer)
+
+    def finish(self, request, response, timer):
+        # 流式响应只统计到视图返回为止，不含响应体生成
+        timer.finish()
+
+        if settings.REQUEST_TIMING_HEADER:
+            response["Server-Timing"] = timer.server_timing()
+        if timer.total_ms >= settings.REQUEST_TIMING_LOG_MIN_MS:
+            logger.info(
+                json.dumps(
+                    {
+                        "method": request.method,
+                        "path": request.path,
+                        "status": response.status_code,
+                        **timer.as_dict(),
+                    },
+                    ensure_ascii=False,
+                )
+            )
+        return response
+
+
+class MetricsMiddleware:
+    """按路由与动作汇总请求数、耗时直方图、错误数、SQL 次数与元数据缓存命中，供 /metrics 输出
+
+    与 RequestTimingMiddleware 同时启用时复用其计时器，否则自行启用一个计时器。
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        timer = current_timer()
+        token = None
+        if timer is None:
+            timer = RequestTimer()
+            token = activate(timer)
+        try:
+            response = self.get_response(request)
+        finally:
+            if token is not None:
+                deactivate(token)
+        record_request(request, response, time.perf_counter() - started, timer)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        timer = current_timer()
+        token = None
+        if timer is None:
+            timer = RequestTimer()
+            token = activate(timer)
+        try:
+            response = await self.get_response(request)
+        finally:
+            if token is not None:
+                deactivate(token)
+        record_request(request, response, time.perf_counter() - started, timer)
+        return response
+
+
+class ProfilingMiddleware:
+    """按需性能分析
+
+    - PROFILE_QUERY_ENABLED 时，staff 用户请求带 ?profile=1 返回 cProfile 摘要（替代原响应）；
+    - PROFILE_SAMPLE_RATE > 0 时，对匹配 PROFILE_SAMPLE_ROUTES 的请求按 1/N 做栈采样，
+      折叠栈按进程写入 PROFILE_DIR，供生成火焰图。
+
+    需放在 AuthenticationMiddleware 之后；两者均未启用时不进入中间件链。
+    异步请求链中分析与采样的是事件循环线程，同一循环上并发的其他请求也会计入。
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PROFILE_QUERY_ENABLED and settings.PROFILE_SAMPLE_RATE <= 0:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        self.sampler = RequestSampler(
+            settings.PROFILE_SAMPLE_RATE,
+            re.compile(settings.PROFILE_SAMPLE_ROUTES),
+            settings.PROFILE_SAMPLE_INTERVAL_MS / 1000,
+            settings.PROFILE_DIR,
+        )
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if settings.PROFILE_QUERY_ENABLED and request.GET.get("profile") == "1":
+            user = getattr(request, "user", None)
+            if user is not None and user.is_staff:
+                return self.profiled(*profile_call(lambda: self.get_response(request), limit=settings.PROFILE_TOP_N))
+        if self.sampler.should_sample(request.path):
+            return self.sampler.sample(lambda: self.get_response(request), f"{request.method} {request.path}")
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if settings.PROFILE_QUERY_ENABLED and request.GET.get("profile") == "1":
+            user = await request.auser() if hasattr(request, "auser") else None
+            if user is not None and user.is_staff:
+                return self.profiled(
+                    *await aprofile_call(lambda: self.get_response(request), limit=settings.PROFILE_TOP_N)
+                )
+        if self.sampler.should_sample(request.path):
+            return await self.sampler.asample(lambda: self.get_response(request), f"{request.method} {request.path}")
+        return await self.get_response(request)
+
+    def profiled(self, response, summary):
+        """以 cProfile 摘要替换原响应；已有其他请求在分析时返回原响应并标记 busy"""
+        if summary is None:
+            response["X-Profile"] = "busy"
+            return response
+        profiled = HttpResponse(summary, content_type="text/plain; charset=utf-8")
+        profiled["X-Profile-Status"] = str(response.status_code)
+        return profiled
+
+
+class SlowQueryMiddleware:
+    """为慢查询记录标注来源路由与动作；SLOW_QUERY_MS < 0 时不进入中间件链"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if settings.SLOW_QUERY_MS < 0:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+            # 异步链中 process_view 也需为协程，否则 Django 会将其放到线程中执行
+            self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        try:
+            return self.get_response(request)
+        finally:
+            clear_route()
+
+    async def __acall__(self, request):
+        try:
+            return await self.get_response(request)
+        finally:
+            clear_route()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        set_route(*route_labels(request))
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        set_route(*route_labels(request))
+
+
+class ReplicaRoutingMiddleware:
+    """读请求（GET/HEAD/OPTIONS）的查询走按权重选中的副本，同一请求内固定使用同一个副本
+
+    写请求之后的 DB_PRIMARY_PIN_SECONDS 秒内，该客户端的读请求仍走主库，避免读到副本尚未同步的数据：
+    写请求的响应设置 Cookie（浏览器）与 X-Primary-Until 响应头（其他客户端在后续请求头中带回），
+    值为固定截止时间。未配置 DATABASE_REPLICAS 时不进入中间件链。
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = use_replica(self.read_alias(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            reset_replica(token)
+        return self.finish(request, response)
+
+    async def __acall__(self, request):
+        token = use_replica(self.read_alias(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            reset_replica(token)
+        return self.finish(request, response)
+
+    def read_alias(self, request):
+        if request.method not in ("GET", "HEAD", "OPTIONS"):
+            return None
+        pinned_until = request.headers.get(PIN_HEADER) or request.COOKIES.get(PIN_COOKIE)
+        try:
+            if pinned_until and float(pinned_until) > time.time():
+                return None
+        except ValueError:
+            pass
+        return choose_replica()
+
+    def finish(self, request, response):
+        if request.method not in ("GET", "HEAD", "OPTIONS"):
+            seconds = settings.DB_PRIMARY_PIN_SECONDS
+            until = str(int(time.time()) + seconds + 1)
+            response[PIN_HEADER] = until
+            response.set_cookie(PIN_COOKIE, until, max_age=seconds + 1, httponly=True, samesite="Lax")
+        return response
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:00
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='objectfield',
+            name='indexed',
+            field=models.CharField(db_default='0', default='0', max_length=1),
+        ),
+        migrations.AddField(
+            model_name='objectfield',
+            name='searchable',
+            field=models.CharField(db_default='0', default='0', max_length=1),
+        ),
+        migrations.AddField(
+            model_name='objectfield',
+            name='sortable',
+            field=models.CharField(db_default='0', default='0', max_length=1),
+        ),
+        migrations.CreateModel(
+            name='AccountSortKey',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('field', models.CharField(max_length=255)),
+                ('value', models.CharField(db_default='', default='', max_length=191)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sort_keys', to='account.account')),
+                ('object', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='account.object')),
+            ],
+            options={
+                'db_table': 't_account_sort_key',
+                'indexes': [models.Index(fields=['object', 'field', 'value'], name='t_account_s_object__2c78af_idx')],
+                'unique_together': {('account', 'field')},
+            },
+        ),
+    ]
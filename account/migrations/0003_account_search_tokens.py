@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:02
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0002_account_sort_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountSearchToken',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('field', models.CharField(max_length=255)),
+                ('token', models.CharField(max_length=32)),
+                ('weight', models.PositiveSmallIntegerField(default=1)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='account.account')),
+                ('object', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='account.object')),
+            ],
+            options={
+                'db_table': 't_account_search_token',
+                'indexes': [models.Index(fields=['object', 'token'], name='t_account_s_object__a67a08_idx')],
+            },
+        ),
+    ]
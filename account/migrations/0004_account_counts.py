@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0003_account_search_tokens'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountCount',
+            fields=[
+                ('object', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='account.object')),
+                ('count', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 't_account_count',
+            },
+        ),
+    ]
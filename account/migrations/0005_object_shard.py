@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0004_account_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='object',
+            name='shard',
+            field=models.CharField(db_default='default', default='default', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='object',
+            name='shard_locked',
+            field=models.CharField(db_default='0', default='0', max_length=1),
+        ),
+    ]
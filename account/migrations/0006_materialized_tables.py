@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0005_object_shard'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='object',
+            name='materialized',
+            field=models.CharField(db_default='0', default='0', max_length=1),
+        ),
+        migrations.AddField(
+            model_name='objectfield',
+            name='materialized',
+            field=models.CharField(db_default='0', default='0', max_length=1),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:02
+
+from django.db import migrations, models
+
+
+def copy_search_indexed(apps, schema_editor):
+    # 原 indexed 同时表示排序与搜索索引已回填，拆分后沿用到两个标记
+    ObjectField = apps.get_model("account", "ObjectField")
+    fields = ObjectField.objects.using(schema_editor.connection.alias)
+    fields.filter(searchable="1", sort_indexed="1").update(search_indexed="1")
+    fields.exclude(sortable="1").update(sort_indexed="0")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0006_materialized_tables'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='objectfield',
+            old_name='indexed',
+            new_name='sort_indexed',
+        ),
+        migrations.AddField(
+            model_name='objectfield',
+            name='search_indexed',
+            field=models.CharField(db_default='0', default='0', max_length=1),
+        ),
+        migrations.RunPython(copy_search_indexed, migrations.RunPython.noop),
+    ]
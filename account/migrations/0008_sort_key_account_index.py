@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0007_split_indexed'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='accountsortkey',
+            name='t_account_s_object__2c78af_idx',
+        ),
+        migrations.AddIndex(
+            model_name='accountsortkey',
+            index=models.Index(fields=['object', 'field', 'value', 'account'], name='t_account_s_object__54b242_idx'),
+        ),
+    ]
@@ -7,6 +7,12 @@ class Object(models.Model):
     name = models.CharField(max_length=255)
     label = models.CharField(max_length=255, null=True, blank=True)
     table_name = models.CharField(max_length=255, null=True, blank=True)
+    # 账户数据所在的数据库别名（DATABASE_SHARDS），由 rebalance_shards 命令迁移；迁移切换阶段 shard_locked 为 "1"，暂停写入
+    shard = models.CharField(max_length=64, default="default", db_default="default")
+    shard_locked = models.CharField(max_length=1, default="0", db_default="0")
+    # 物化表（以 table_name 为表名的类型化列表）状态，由 materialize_tables 命令维护：
+    # "0" 未物化，"1" 已建表、写入同步维护（回填中），"2" 回填完成，列表与导出读取物化表
+    materialized = models.CharField(max_length=1, default="0", db_default="0")
     deleted = models.CharField(max_length=1, default="0", db_default="0")
 
     def __str__(self):
@@ -21,6 +27,14 @@ class ObjectField(models.Model):
     object = models.ForeignKey(Object, on_delete=models.CASCADE)
     name = models.CharField(max_length=255)
     type = models.CharField(max_length=255, null=True, blank=True)
+    # 是否可排序 / 可搜索：标记后分别由 t_account_sort_key / t_account_search_token 维护索引
+    sortable = models.CharField(max_length=1, default="0", db_default="0")
+    searchable = models.CharField(max_length=1, default="0", db_default="0")
+    # 影子列 / 全文索引是否已回填完成（由 account_indexes 命令设置），完成后列表的排序 / 搜索才会走索引
+    sort_indexed = models.CharField(max_length=1, default="0", db_default="0")
+    search_indexed = models.CharField(max_length=1, default="0", db_default="0")
+    # 物化表中对应列的状态："0" 无列，"1" 已加列、写入同步维护（待回填），"2" 已回填
+    materialized = models.CharField(max_length=1, default="0", db_default="0")
     deleted = models.CharField(max_length=1, default="0", db_default="0")
 
     def __str__(self):
@@ -103,5 +117,77 @@ class Account(models.Model):
             models.Index(fields=["object"]),
         ]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # 记录读取时的删除标记，保存时据此增减账户计数
+        instance._loaded_deleted = instance.__dict__.get("deleted")
+        return instance
+
     def __str__(self):
         return f"{self.object.name} - {self.created_at.strftime('%Y-%m-%d %H:%M:%S')}"
+
+
+class AccountCount(models.Model):
+    """每个 Object 下未删除账户数，由账户写入信号增量维护，列表分页不必执行 COUNT(*)
+
+    计数行不存在时首次读取会统计一次并写入（统计期间 count 为负数占位标记）；可用 manage.py account_counts 重建。
+    """
+
+    object = models.OneToOneField(Object, on_delete=models.CASCADE, primary_key=True)
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        db_table = "t_account_count"
+
+    def __str__(self):
+        return f"{self.object_id}={self.count}"
+
+
+class AccountSortKey(models.Model):
+    """Account.data 中可排序字段的影子列，按 (object, field, value, account) 建索引
+
+    字段标记为可排序后，每个账户（含值为空的）都有一行，列表可直接按索引顺序读取。
+    """
+
+    # 索引列长度上限（utf8mb4 下单列索引最多 191 字符）
+    VALUE_MAX_LENGTH = 191
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name="sort_keys")
+    object = models.ForeignKey(Object, on_delete=models.CASCADE)
+    field = models.CharField(max_length=255)
+    value = models.CharField(max_length=VALUE_MAX_LENGTH, default="", db_default="")
+
+    class Meta:
+        db_table = "t_account_sort_key"
+        unique_together = [("account", "field")]
+        indexes = [
+            models.Index(fields=["object", "field", "value", "account"]),
+        ]
+
+    def __str__(self):
+        return f"{self.field}={self.value}"
+
+
+class AccountSearchToken(models.Model):
+    """全文搜索倒排索引：可搜索字段的 n-gram 词元 -> 账户"""
+
+    TOKEN_MAX_LENGTH = 32
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name="search_tokens")
+    object = models.ForeignKey(Object, on_delete=models.CASCADE)
+    field = models.CharField(max_length=255)
+    token = models.CharField(max_length=TOKEN_MAX_LENGTH)
+    # 权重：词元位于字段开头时更高，用于相关度排序
+    weight = models.PositiveSmallIntegerField(default=1)
+
+    class Meta:
+        db_table = "t_account_search_token"
+        indexes = [
+            models.Index(fields=["object", "token"]),
+        ]
+
+    def __str__(self):
+        return f"{self.field}:{self.token}"
@@ -0,0 +1,180 @@
+import base64
+import json
+from collections import OrderedDict
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.core.paginator import InvalidPage, Page, Paginator as DjangoPaginator
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .counts import EXACT, account_count
+from .queries import seek_after
+
+
+class CountedPaginator(DjangoPaginator):
+    """总数由 count_func 提供的分页器，替代 queryset.count()"""
+
+    def __init__(self, object_list, per_page, count_func=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_func = count_func
+
+    @cached_property
+    def count(self):
+        if self.count_func is None:
+            return super().count
+        return self.count_func()
+
+
+# 自定义分页
+class AccountPagination(PageNumberPagination):
+    """页码分页；请求带 object_id 时总数取自账户计数表或计数缓存（见 counts.account_count）
+
+    响应中的 count_mode 为 "exact" 或 "approximate"（估算值，前端可显示为“约 N 条”）。
+    """
+
+    page_size = 20  # 每页显示 20 条数据
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    count_mode = EXACT
+
+    def paginate_queryset(self, queryset, request, view=None):
+        object_id = request.query_params.get("object_id")
+        if object_id:
+            search = request.query_params.get("search") or ""
+            self.django_paginator_class = partial(
+                CountedPaginator, count_func=lambda: self.resolve_count(queryset, object_id, search)
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request):
+        """paginate_queryset 的异步版本：总数经线程读取计数表或计数缓存，当前页用异步 ORM 查询"""
+        self.request = request
+        page_size = self.get_page_size(request)
+        object_id = request.query_params.get("object_id")
+        search = request.query_params.get("search") or ""
+        count, self.count_mode = await sync_to_async(account_count)(queryset, object_id, search)
+        paginator = CountedPaginator(queryset, page_size, count_func=lambda: count)
+        page_number = request.query_params.get(self.page_query_param) or 1
+        if page_number in self.last_page_strings:
+            page_number = paginator.num_pages
+        try:
+            number = paginator.validate_number(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+        bottom = (number - 1) * page_size
+        rows = [row async for row in queryset[bottom:bottom + page_size]]
+        self.page = Page(rows, number, paginator)
+        return rows
+
+    def resolve_count(self, queryset, object_id, search):
+        count, self.count_mode = account_count(queryset, object_id, search)
+        return count
+
+    def get_paginated_response(self, data):
+        return Response(
+            OrderedDict(
+                [
+                    ("count", self.page.paginator.count),
+                    ("count_mode", self.count_mode),
+                    ("next", self.get_next_link()),
+                    ("previous", self.get_previous_link()),
+                    ("results", data),
+                ]
+            )
+        )
+
+
+class AccountCursorPagination(BasePagination):
+    """游标分页：按 (_sort_key, id) 定位，不做 COUNT，也不做 OFFSET 扫描
+
+    查询集需已注解 _sort_key 并按 ("_sort_key", "id") 或 ("-_sort_key", "-id") 排序，
+    游标为 base64 编码的 {"k": 排序值, "i": id, "p": 是否向前翻页}。
+    """
+
+    cursor_query_param = "cursor"
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode("ascii")).decode("utf-8"))
+            return payload["k"], payload["i"], bool(payload.get("p"))
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise ValidationError({"error": "无效的 cursor 参数"})
+
+    def encode_cursor(self, sort_key, pk, previous):
+        # 物化表的日期列排序值按 ISO 字符串编码
+        payload = json.dumps({"k": sort_key, "i": str(pk), "p": int(previous)}, ensure_ascii=False, default=str)
+        encoded = base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        first = queryset.query.order_by[0]
+        # 排序项为字段名（"-_sort_key"）或 OrderBy 表达式（物化表）
+        descending = first.startswith("-") if isinstance(first, str) else first.descending
+
+        cursor = self.decode_cursor(request)
+        previous = cursor is not None and cursor[2]
+        if cursor is not None:
+            # 向前翻页时反向定位
+            queryset = seek_after(queryset, cursor[0], cursor[1], descending != previous)
+        if previous:
+            queryset = queryset.reverse()
+
+        rows = list(queryset[: page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if previous:
+            rows.reverse()
+
+        if previous:
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+        self.first = rows[0] if rows else None
+        self.last = rows[-1] if rows else None
+        return rows
+
+    def get_next_link(self):
+        if not self.has_next or self.last is None:
+            return None
+        return self.encode_cursor(self.last._sort_key, self.last.pk, previous=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.first is None:
+            # 空页时回到游标模式第一页
+            return replace_query_param(self.base_url, self.cursor_query_param, "")
+        return self.encode_cursor(self.first._sort_key, self.first.pk, previous=True)
+
+    def get_paginated_response(self, data):
+        return Response(
+            OrderedDict(
+                [
+                    ("next", self.get_next_link()),
+                    ("previous", self.get_previous_link()),
+                    ("results", data),
+                ]
+            )
+        )
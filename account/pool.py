@@ -0,0 +1,309 @@
+import abc
+import atexit
+import os
+import threading
+import time
+from collections import deque
+from functools import partial
+
+from django.db.utils import OperationalError
+
+# 连接池默认参数，DATABASES[alias]["POOL"] 中的同名项覆盖
+POOL_DEFAULTS = {
+    "MIN_SIZE": 0,
+    "MAX_SIZE": 10,
+    "IDLE_TIMEOUT": 300,
+    "TIMEOUT": 10,
+    "PRE_PING": True,
+    "PING_INTERVAL": 1,
+}
+
+# 进程内全部连接池：(alias, 连接参数) -> ConnectionPool
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PoolTimeout(Exception):
+    """等待空闲连接超时"""
+
+
+class ConnectionPool:
+    """线程安全的进程内连接池，与具体数据库无关
+
+    - 最多同时打开 max_size 个连接，全部借出时等待归还，超过 timeout 秒抛出 PoolTimeout；
+    - 空闲超过 idle_timeout 秒的连接在下次借出时关闭，但至少保留 min_size 个；
+    - 借出空闲不少于 ping_interval 秒的连接前调用 ping(conn)，失败则关闭并换一个；
+    - fork 后子进程不复用父进程的连接（套接字不能跨进程共享），池从空开始。
+    """
+
+    def __init__(self, close, ping=None, min_size=0, max_size=10, idle_timeout=300, timeout=10, ping_interval=1):
+        self._close = close
+        self._ping = ping
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        self._cond = threading.Condition()
+        # 空闲连接 (conn, 归还时间)，右端为最近归还，借出时从右端取（连接最“热”），回收从左端开始
+        self._idle = deque()
+        # 已打开（空闲 + 借出 + 正在创建）的连接数
+        self._size = 0
+        self._pid = os.getpid()
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.timeouts = 0
+        self.created = 0
+        self.closed = 0
+        self.ping_failures = 0
+
+    def _check_pid(self):
+        """fork 后丢弃继承自父进程的连接（不关闭，避免断开父进程的会话）"""
+        pid = os.getpid()
+        if pid != self._pid:
+            self._pid = pid
+            self._idle.clear()
+            self._size = 0
+
+    def _discard(self, conn):
+        try:
+            self._close(conn)
+        except Exception:
+            pass
+
+    def _reap(self, now):
+        """取出空闲超时的连接（持锁调用），返回待关闭列表"""
+        expired = []
+        while self._idle and self._size > self.min_size and now - self._idle[0][1] > self.idle_timeout:
+            expired.append(self._idle.popleft()[0])
+            self._size -= 1
+            self.closed += 1
+        return expired
+
+    def _checkout(self, deadline):
+        """持锁取一个空闲连接或一个新建名额，返回 (conn 或 None, 空闲秒数)"""
+        waited_from = None
+        with self._cond:
+            self._check_pid()
+            while True:
+                now = time.monotonic()
+                expired = self._reap(now)
+                if self._idle:
+                    conn, released_at = self._idle.pop()
+                    result = (conn, now - released_at)
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    result = (None, 0.0)
+                    break
+                remaining = deadline - now
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeout(f"等待数据库连接超过 {self.timeout} 秒（连接池上限 {self.max_size}）")
+                if waited_from is None:
+                    waited_from = now
+                    self.waits += 1
+                self._cond.wait(remaining)
+            self.checkouts += 1
+            if waited_from is not None:
+                self.wait_seconds += time.monotonic() - waited_from
+        for conn in expired:
+            self._discard(conn)
+        return result
+
+    def acquire(self, connect):
+        """借出一个连接，返回 (conn, 是否新建)；没有可用的空闲连接时调用 connect() 新建"""
+        deadline = time.monotonic() + self.timeout
+        while True:
+            conn, idle_for = self._checkout(deadline)
+            if conn is None:
+                try:
+                    conn = connect()
+                except BaseException:
+                    self._forget()
+                    raise
+                with self._cond:
+                    self.created += 1
+                return conn, True
+            if self._ping is None or idle_for < self.ping_interval:
+                return conn, False
+            try:
+                self._ping(conn)
+            except Exception:
+                with self._cond:
+                    self.ping_failures += 1
+                self.release(conn, discard=True)
+                continue
+            return conn, False
+
+    def release(self, conn, discard=False):
+        """归还连接；discard=True 时关闭（连接出错或状态未知）"""
+        with self._cond:
+            if os.getpid() != self._pid:
+                return
+            if discard:
+                self._size -= 1
+                self.closed += 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+                conn = None
+            self._cond.notify()
+        if conn is not None:
+            self._discard(conn)
+
+    def fill(self, connect):
+        """预先打开连接，直到已打开的连接数达到 min_size"""
+        while True:
+            with self._cond:
+                self._check_pid()
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                conn = connect()
+            except BaseException:
+                self._forget()
+                raise
+            with self._cond:
+                self.created += 1
+            self.release(conn)
+
+    def _forget(self):
+        """新建连接失败，释放名额"""
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def close(self):
+        """关闭全部空闲连接；借出中的连接归还后照常入池"""
+        with self._cond:
+            self._check_pid()
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+            self.closed += len(idle)
+        for conn in idle:
+            self._discard(conn)
+
+    def stats(self):
+        with self._cond:
+            idle = len(self._idle)
+            return {
+                "size": self._size,
+                "idle": idle,
+                "in_use": self._size - idle,
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "wait_seconds": round(self.wait_seconds, 6),
+                "timeouts": self.timeouts,
+                "created": self.created,
+                "closed": self.closed,
+                "ping_failures": self.ping_failures,
+            }
+
+
+def get_pool(alias, key, factory):
+    """返回 (alias, key) 对应的连接池，不存在时调用 factory() 创建"""
+    with _pools_lock:
+        pool = _pools.get((alias, key))
+        if pool is None:
+            if not _pools:
+                atexit.register(close_pools)
+            pool = _pools[(alias, key)] = factory()
+        return pool
+
+
+def close_pools():
+    """关闭全部连接池的空闲连接（进程退出时调用）"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close()
+
+
+def pool_stats():
+    """返回各连接池的统计，同一别名的多个池（如测试库与正式库）合并"""
+    with _pools_lock:
+        items = list(_pools.items())
+    merged = {}
+    for (alias, _), pool in items:
+        stats = pool.stats()
+        entry = merged.setdefault(alias, {"alias": alias})
+        for name, value in stats.items():
+            entry[name] = entry.get(name, 0) + value
+    return list(merged.values())
+
+
+class PooledDatabaseWrapperMixin(metaclass=abc.ABCMeta):
+    """DatabaseWrapper 混入：连接时从进程内连接池借出物理连接，关闭时归还而不断开
+
+    参数取 DATABASES[alias]["POOL"]（见 POOL_DEFAULTS），MAX_SIZE 为 0 时不使用连接池。
+    借出的连接跳过 init_connection_state（会话设置在新建时已执行）；归还前回滚未结束的事务，
+    出错后不可用的连接直接关闭。子类必须实现 ping_connection(conn)（未实现时无法实例化）。
+    """
+
+    def pool_options(self):
+        return {**POOL_DEFAULTS, **(self.settings_dict.get("POOL") or {})}
+
+    @property
+    def pool_enabled(self):
+        return self.pool_options()["MAX_SIZE"] > 0
+
+    @abc.abstractmethod
+    def ping_connection(self, conn):
+        """检查空闲的物理连接是否可用，不可用时抛出异常；连接池借出前调用"""
+
+    def get_pool(self, conn_params):
+        options = self.pool_options()
+        key = repr(sorted(conn_params.items()))
+        return get_pool(
+            self.alias,
+            key,
+            lambda: ConnectionPool(
+                close=lambda conn: conn.close(),
+                ping=self.ping_connection if options["PRE_PING"] else None,
+                min_size=options["MIN_SIZE"],
+                max_size=options["MAX_SIZE"],
+                idle_timeout=options["IDLE_TIMEOUT"],
+                timeout=options["TIMEOUT"],
+                ping_interval=options["PING_INTERVAL"],
+            ),
+        )
+
+    def get_new_connection(self, conn_params):
+        self._pool = None
+        self._pool_reused = False
+        if not self.pool_enabled:
+            return super().get_new_connection(conn_params)
+        pool = self.get_pool(conn_params)
+        connect = partial(super().get_new_connection, conn_params)
+        try:
+            conn, created = pool.acquire(connect)
+        except PoolTimeout as e:
+            raise OperationalError(str(e)) from e
+        if pool.min_size:
+            pool.fill(connect)
+        self._pool = pool
+        self._pool_reused = not created
+        return conn
+
+    def init_connection_state(self):
+        if not getattr(self, "_pool_reused", False):
+            super().init_connection_state()
+
+    def _close(self):
+        pool = getattr(self, "_pool", None)
+        if pool is None or self.connection is None:
+            return super()._close()
+        conn = self.connection
+        self._pool = None
+        discard = self.errors_occurred and not self.is_usable()
+        if not discard and (self.in_atomic_block or not self.get_autocommit()):
+            try:
+                conn.rollback()
+            except Exception:
+                discard = True
+        pool.release(conn, discard=discard)
@@ -0,0 +1,145 @@
+import cProfile
+import io
+import itertools
+import os
+import pstats
+import sys
+import threading
+from collections import Counter
+
+# 同一进程同一时间只允许一个 cProfile（Python 3.12 起 profiler 为进程级资源）
+_profile_lock = threading.Lock()
+# 抽样采集结果写文件时的进程内锁
+_write_lock = threading.Lock()
+
+
+def profile_call(func, sort="cumulative", limit=50):
+    """在 cProfile 下执行 func，返回 (结果, 文本摘要)；已有其他请求在分析时返回 (结果, None)"""
+    if not _profile_lock.acquire(blocking=False):
+        return func(), None
+    try:
+        profiler = cProfile.Profile()
+        result = profiler.runcall(func)
+    finally:
+        _profile_lock.release()
+    return result, _summary(profiler, sort, limit)
+
+
+async def aprofile_call(func, sort="cumulative", limit=50):
+    """profile_call 的异步版本：分析 await func() 期间事件循环线程上的调用
+
+    同一事件循环上并发执行的其他请求也会计入；经 sync_to_async 在线程中执行的部分不在分析范围内。
+    """
+    if not _profile_lock.acquire(blocking=False):
+        return await func(), None
+    try:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            result = await func()
+        finally:
+            profiler.disable()
+    finally:
+        _profile_lock.release()
+    return result, _summary(profiler, sort, limit)
+
+
+def _summary(profiler, sort, limit):
+    output = io.StringIO()
+    stats = pstats.Stats(profiler, stream=output)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return output.getvalue()
+
+
+def frame_label(frame):
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+def fold_stack(frame):
+    """将调用栈折叠为 flamegraph 格式：根;...;叶"""
+    labels = []
+    while frame is not None:
+        labels.append(frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class StackSampler:
+    """统计采样器：后台线程按固定间隔读取目标线程的调用栈并计数，不对被测代码插桩"""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[fold_stack(frame)] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+class RequestSampler:
+    """按 1/N 比例对匹配路由的请求做栈采样，结果按进程追加写入 <directory>/stacks-<pid>.folded"""
+
+    def __init__(self, rate, route_pattern, interval, directory):
+        self.rate = rate
+        self.route_pattern = route_pattern
+        self.interval = interval
+        self.directory = directory
+        self._counter = itertools.count()
+
+    def should_sample(self, path):
+        if self.rate <= 0 or not self.route_pattern.search(path):
+            return False
+        return next(self._counter) % self.rate == 0
+
+    def sample(self, func, label):
+        """采样执行 func，栈的根节点为 label（如 "GET /api/main/"）"""
+        with StackSampler(threading.get_ident(), self.interval) as sampler:
+            result = func()
+        if sampler.stacks:
+            self.write(label, sampler.stacks)
+        return result
+
+    async def asample(self, func, label):
+        """采样 await func() 期间事件循环线程的调用栈（包含同一循环上并发的其他请求）"""
+        with StackSampler(threading.get_ident(), self.interval) as sampler:
+            result = await func()
+        if sampler.stacks:
+            self.write(label, sampler.stacks)
+        return result
+
+    def write(self, label, stacks):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"stacks-{os.getpid()}.folded")
+        root = label.replace(";", ",").replace(" ", "_")
+        lines = "".join(f"{root};{stack} {count}\n" for stack, count in stacks.items())
+        with _write_lock, open(path, "a", encoding="utf-8") as handle:
+            handle.write(lines)
+
+
+def read_folded(directory):
+    """合并目录下所有进程的折叠栈，返回 Counter"""
+    stacks = Counter()
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".folded"):
+            continue
+        with open(os.path.join(directory, name), encoding="utf-8") as handle:
+            for line in handle:
+                stack, _, count = line.rstrip("\n").rpartition(" ")
+                if stack and count.isdigit():
+                    stacks[stack] += int(count)
+    return stacks
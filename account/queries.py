@@ -0,0 +1,132 @@
+from django.db.models import F, Q, TextField, Value
+from django.db.models.fields.json import KT
+from django.db.models.functions import Coalesce
+
+from .materialize import data_q, is_materialized, materialized_queryset
+from .metadata import get_field_indexes
+from .search import fulltext_search
+
+# 列表允许排序的业务字段（白名单，防止 SQL 注入）
+SORT_FIELDS = ["account_name", "department", "hospital"]
+
+# 未建全文索引时，首字母搜索使用的业务字段
+SEARCH_FIELD = "account_name"
+
+
+def parse_sort_params(query_params):
+    """解析并校验排序参数，返回 (sort_field, sort_order)"""
+    sort_field = query_params.get("sort_field", "account_name")
+    sort_order = query_params.get("sort_order", "asc")
+
+    if sort_field not in SORT_FIELDS:
+        sort_field = "account_name"
+    if sort_order not in ["asc", "desc"]:
+        sort_order = "asc"
+    return sort_field, sort_order
+
+
+def source_queryset(queryset, object_id, field_names, sort_field, search=None):
+    """列表与导出的数据源：Object 已物化且所需字段的列均已回填时改读物化表，否则返回 queryset（t_account）"""
+    text_names = ()
+    if search:
+        text_names = get_field_indexes(object_id).searchable or (SEARCH_FIELD,)
+    materialized = materialized_queryset(object_id, [*field_names, sort_field], text_names)
+    return queryset if materialized is None else materialized
+
+
+def list_queryset(queryset, query_params, object_id, sort_field, sort_order):
+    """列表的搜索与排序，返回排序后的 queryset
+
+    显式指定排序字段或使用游标分页时，不按相关度排序。
+    """
+    search = query_params.get("search")
+    ranked = False
+    if search:
+        queryset, ranked = search_accounts(queryset, object_id, search)
+        if "sort_field" in query_params or "cursor" in query_params:
+            ranked = False
+    return order_accounts(queryset, object_id, sort_field, sort_order, ranked)
+
+
+def account_list_queryset(queryset, query_params, object_id, field_names, sort_field, sort_order):
+    """列表的数据源、搜索与排序（同步与异步列表共用）：Object 已物化时读取物化表，返回排序后的 queryset"""
+    queryset = source_queryset(queryset, object_id, field_names, sort_field, query_params.get("search"))
+    return list_queryset(queryset, query_params, object_id, sort_field, sort_order)
+
+
+def search_accounts(queryset, object_id, search):
+    """搜索账户，返回 (queryset, ranked)
+
+    Object 存在已建索引的可搜索字段时，在全部可搜索字段上做全文搜索并注解相关度 _rank；
+    否则回退到 account_name 的首字母匹配（JSON 路径扫描）。
+    """
+    if object_id:
+        fields = get_field_indexes(object_id).searchable
+        if fields:
+            return fulltext_search(queryset, object_id, search, fields)
+    queryset = queryset.filter(
+        # data_q(queryset, object_id, SEARCH_FIELD, "icontains", search)  # 模糊匹配
+        data_q(queryset, object_id, SEARCH_FIELD, "istartswith", search)  # 首字母匹配
+    )
+    return queryset, False
+
+
+def order_accounts(queryset, object_id, sort_field, sort_order, ranked=False):
+    """按业务字段排序，注解 _sort_key 并以 id 作为次序键，保证分页稳定
+
+    物化表按类型化列排序（空值在升序时最前、降序时最后）；字段已建索引时内连接影子列
+    （每个账户都有一行，缺值为空字符串，与 JSON 路径排序一致），按 (object, field, value, account)
+    索引顺序读取，不做文件排序；否则回退到 JSON 路径排序。ranked 为 True 时优先按搜索相关度 _rank 降序。
+    """
+    if is_materialized(queryset):
+        queryset = queryset.annotate(_sort_key=F(queryset.model.attr(sort_field)))
+        if ranked:
+            return queryset.order_by("-_rank", F("_sort_key").asc(nulls_first=True), "id")
+        if sort_order == "asc":
+            return queryset.order_by(F("_sort_key").asc(nulls_first=True), "id")
+        return queryset.order_by(F("_sort_key").desc(nulls_last=True), "-id")
+    if sort_field in get_field_indexes(object_id).sortable:
+        # 先过滤再注解：注解与排序复用同一个内连接
+        queryset = queryset.filter(sort_keys__object_id=object_id, sort_keys__field=sort_field).annotate(
+            _sort_key=F("sort_keys__value"), _sort_id=F("sort_keys__account_id")
+        )
+        # 次序键使用影子列的 account_id（即账户 id），排序列全部来自同一索引
+        if ranked:
+            return queryset.order_by("-_rank", "_sort_key", "_sort_id")
+        if sort_order == "asc":
+            return queryset.order_by("_sort_key", "_sort_id")
+        return queryset.order_by("-_sort_key", "-_sort_id")
+    queryset = queryset.annotate(
+        _sort_key=Coalesce(KT(f"data__{sort_field}"), Value(""), output_field=TextField())
+    )
+    if ranked:
+        return queryset.order_by("-_rank", "_sort_key", "id")
+    if sort_order == "asc":
+        return queryset.order_by("_sort_key", "id")
+    return queryset.order_by("-_sort_key", "-id")
+
+
+def seek_after(queryset, sort_key, pk, descending):
+    """键集定位：返回排在 (sort_key, pk) 之后的记录，descending 表示沿降序方向
+
+    物化表的排序值可能为空（见 order_accounts）：空值在升序时排在最前，降序时排在最后。
+    """
+    lookup = "lt" if descending else "gt"
+    if sort_key is None:
+        after = Q(_sort_key__isnull=True, **{f"id__{lookup}": pk})
+        return queryset.filter(after if descending else after | Q(_sort_key__isnull=False))
+    after = Q(**{f"_sort_key__{lookup}": sort_key}) | Q(_sort_key=sort_key, **{f"id__{lookup}": pk})
+    if descending and is_materialized(queryset):
+        after |= Q(_sort_key__isnull=True)
+    return queryset.filter(after)
+
+
+def map_account(account, field_map):
+    """按字段映射生成列表行：{显示名称: 值, "id": 账户 id}"""
+    parsed_data = account.data or {}
+    data = {
+        field_map.get(field, field): parsed_data.get(field, "N/A")
+        for field in field_map
+    }
+    data["id"] = account.id
+    return data
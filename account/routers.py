@@ -0,0 +1,76 @@
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# 当前请求读取使用的副本别名，None 为主库（管理命令、写请求、写入后固定主库的客户端）
+_read_alias = ContextVar("crm_read_alias", default=None)
+
+# 写入后固定读主库：Cookie 名与响应/请求头名，值为固定截止时间（Unix 秒）
+PIN_COOKIE = "crm_primary_until"
+PIN_HEADER = "X-Primary-Until"
+
+
+def replica_weights():
+    """已配置的副本 {别名: 权重}，忽略权重为 0 或未在 DATABASES 中定义的别名"""
+    return {
+        alias: weight
+        for alias, weight in settings.DATABASE_REPLICAS.items()
+        if weight > 0 and alias in connections.settings
+    }
+
+
+def choose_replica():
+    """按权重随机选择一个副本，未配置副本时返回 None"""
+    weights = replica_weights()
+    if not weights:
+        return None
+    return random.choices(list(weights), weights=list(weights.values()))[0]
+
+
+def read_alias():
+    return _read_alias.get()
+
+
+def use_replica(alias):
+    """当前上下文的读取改走 alias（None 为主库），返回用于 reset_replica 的 token"""
+    return _read_alias.set(alias)
+
+
+def reset_replica(token):
+    _read_alias.reset(token)
+
+
+@contextmanager
+def read_from_primary():
+    """块内读取走主库"""
+    token = _read_alias.set(None)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def recently_written(timestamp_ns):
+    """ns 时间戳是否在副本同步延迟窗口（DB_PRIMARY_PIN_SECONDS）之内"""
+    return time.time_ns() - timestamp_ns < settings.DB_PRIMARY_PIN_SECONDS * 1_000_000_000
+
+
+class ReplicaRouter:
+    """读写分离：写入始终走主库（default）；读取走 ReplicaRoutingMiddleware 为当前请求选中的副本
+
+    请求之外（管理命令、信号处理中的写入）没有选中副本，读取同样走主库。
+    副本与主库数据相同，允许任意别名之间建立关联；迁移不做限制，由部署方只对主库执行。
+    """
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
@@ -0,0 +1,138 @@
+import re
+import unicodedata
+from functools import reduce
+from operator import and_, or_
+
+from django.db import transaction
+from django.db.models import Case, IntegerField, Max, OuterRef, Q, Subquery, Sum, When
+
+from .materialize import data_q
+from .metadata import get_field_indexes
+from .models import AccountSearchToken
+
+# 连续的字母、数字或中日韩文字视为一个词
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+# 搜索词最大长度，限制单次查询的词元数量
+MAX_QUERY_LENGTH = 64
+
+
+def normalize(text):
+    """全角转半角并转小写"""
+    return unicodedata.normalize("NFKC", text).lower()
+
+
+def tokenize(value):
+    """将字段值切分为 {词元: 权重}
+
+    每个词取相邻二元组（bigram），适用于中文人名、医院、科室等不分词文本；
+    单字词保留单字，每个词额外保留末字，使单字查询可以用前缀匹配命中任意位置。
+    字段开头的词元权重为 2，其余为 1。
+    """
+    if value is None:
+        return {}
+    tokens = {}
+    for index, word in enumerate(_WORD_RE.findall(normalize(str(value)))):
+        grams = [word[i:i + 2] for i in range(len(word) - 1)] or [word]
+        if len(word) > 1:
+            grams.append(word[-1])
+        for position, gram in enumerate(grams):
+            weight = 2 if index == 0 and position == 0 else 1
+            gram = gram[: AccountSearchToken.TOKEN_MAX_LENGTH]
+            tokens[gram] = max(tokens.get(gram, 0), weight)
+    return tokens
+
+
+def query_grams(search):
+    """将搜索词切分为需全部命中的词元，单字词元按前缀匹配"""
+    grams = []
+    for word in _WORD_RE.findall(normalize(search[:MAX_QUERY_LENGTH])):
+        for gram in [word[i:i + 2] for i in range(len(word) - 1)] or [word]:
+            if gram not in grams:
+                grams.append(gram)
+    return grams
+
+
+def build_search_tokens(accounts, fields=None):
+    """为一批账户生成倒排索引行；fields 为空时使用各 Object 的可搜索字段"""
+    rows = []
+    for account in accounts:
+        names = fields if fields is not None else get_field_indexes(account.object_id).search_fields
+        data = account.data or {}
+        for name in names:
+            rows.extend(
+                AccountSearchToken(
+                    account_id=account.id,
+                    object_id=account.object_id,
+                    field=name,
+                    token=token,
+                    weight=weight,
+                )
+                for token, weight in tokenize(data.get(name)).items()
+            )
+    return rows
+
+
+def sync_search_tokens(accounts, fields=None, using=None):
+    """重建一批账户的倒排索引（先删后插），没有可搜索字段时不访问数据库"""
+    if fields is not None:
+        names = set(fields)
+    else:
+        names = set()
+        for account in accounts:
+            names |= set(get_field_indexes(account.object_id).search_fields)
+    if not names:
+        return 0
+
+    rows = build_search_tokens(accounts, fields)
+    with transaction.atomic(using=using):
+        AccountSearchToken.objects.using(using).filter(
+            account_id__in=[account.id for account in accounts], field__in=names
+        ).delete()
+        AccountSearchToken.objects.using(using).bulk_create(rows)
+    return len(rows)
+
+
+def fulltext_search(queryset, object_id, search, fields):
+    """在倒排索引中查找同时命中全部词元的账户，并注解相关度 _rank
+
+    先用 (object, token) 索引取候选账户，再对候选账户做子串校验，
+    扫描量只与命中词元的账户数有关，与账户总数无关。
+    """
+    grams = query_grams(search)
+    if not grams:
+        # 只有标点或空白的搜索词不匹配任何账户
+        return queryset.none(), False
+
+    conditions = [
+        Q(token__startswith=gram) if len(gram) == 1 else Q(token=gram) for gram in grams
+    ]
+    # 每个查询词元至少命中一次
+    hits = reduce(
+        lambda left, right: left + right,
+        [Max(Case(When(cond, then=1), default=0, output_field=IntegerField())) for cond in conditions],
+    )
+    matches = (
+        AccountSearchToken.objects.filter(object_id=object_id)
+        .filter(reduce(or_, conditions))
+        .values("account_id")
+        .annotate(hits=hits, score=Sum("weight"))
+        .filter(hits=len(grams))
+    )
+
+    # 子串校验：每个词（与词元相同，取规整后的搜索词）都需出现在某个可搜索字段中
+    verify = reduce(
+        and_,
+        [
+            reduce(or_, [data_q(queryset, object_id, name, "icontains", word) for name in fields])
+            for word in _WORD_RE.findall(normalize(search[:MAX_QUERY_LENGTH]))
+        ],
+    )
+    queryset = (
+        queryset.filter(id__in=matches.values("account_id"))
+        .filter(verify)
+        .annotate(
+            _rank=Subquery(matches.filter(account_id=OuterRef("id")).values("score")[:1])
+        )
+    )
+    return queryset, True
@@ -8,6 +8,7 @@ from .models import (
     PageLayoutField,
     Account,
 )
+from .sharding import shard_aliases
 
 
 # Object 序列化器
@@ -15,6 +16,21 @@ class ObjectSerializer(serializers.ModelSerializer):
     class Meta:
         model = Object
         fields = "__all__"
+        read_only_fields = ["shard_locked", "materialized"]
+
+    def validate_shard(self, value):
+        if value not in shard_aliases():
+            raise serializers.ValidationError(f"分片不存在，可选: {', '.join(shard_aliases())}")
+        # 已有账户的 Object 不能直接改分片，数据需由 rebalance_shards 命令迁移
+        if self.instance is not None and value != self.instance.shard:
+            raise serializers.ValidationError("请使用 rebalance_shards 命令迁移分片")
+        return value
+
+    def validate_table_name(self, value):
+        # 物化表以 table_name 为表名，已物化时不能改名
+        if self.instance is not None and self.instance.materialized != "0" and value != self.instance.table_name:
+            raise serializers.ValidationError("已物化的 Object 不能修改 table_name，请先用 materialize_tables --drop 取消物化")
+        return value
 
 
 # ObjectField 序列化器
@@ -22,6 +38,7 @@ class ObjectFieldSerializer(serializers.ModelSerializer):
     class Meta:
         model = ObjectField
         fields = "__all__"
+        read_only_fields = ["sort_indexed", "search_indexed", "materialized"]
 
 
 # PageList 序列化器
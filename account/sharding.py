@@ -0,0 +1,238 @@
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .cache import VersionedCache
+from .indexes import sync_account_indexes
+from .models import Account, AccountCount, AccountSearchToken, AccountSortKey, Object
+
+# 按 Object 分片存储的账户数据表；元数据表只在 default 中维护，分片中仅保存账户外键指向的 Object 行
+SHARDED_MODELS = (Account, AccountCount, AccountSortKey, AccountSearchToken)
+
+# 当前请求/命令处理的账户所在分片，None 为 default
+_current_shard = ContextVar("crm_shard", default=None)
+
+# Object -> (分片, 是否锁定写入) 缓存，Object 保存后失效
+shard_cache = VersionedCache("object_shard", "METADATA_CACHE_SIZE", "METADATA_CACHE_TIMEOUT")
+
+
+class ShardLocked(APIException):
+    """Object 正在迁移到其他分片（切换阶段），暂停写入"""
+
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "数据迁移中，请稍后重试"
+
+
+def shard_aliases():
+    """全部分片别名，default 为第一个"""
+    return [DEFAULT_DB_ALIAS, *settings.DATABASE_SHARDS]
+
+
+def sharding_enabled():
+    return bool(settings.DATABASE_SHARDS)
+
+
+def object_shard(object_id):
+    """Object 所在分片与是否锁定写入，返回 (alias, locked)；未配置分片时不查询"""
+    if not sharding_enabled():
+        return DEFAULT_DB_ALIAS, False
+    info = shard_cache.get_or_set(
+        str(object_id),
+        lambda: Object.objects.using(DEFAULT_DB_ALIAS).filter(id=object_id).values_list("shard", "shard_locked").first(),
+    )
+    if info is None:
+        return DEFAULT_DB_ALIAS, False
+    return info[0], info[1] == "1"
+
+
+def shard_for(object_id):
+    return object_shard(object_id)[0]
+
+
+def writable_shard(object_id):
+    """写入前检查：Object 处于迁移切换阶段时抛出 ShardLocked"""
+    alias, locked = object_shard(object_id)
+    if locked:
+        raise ShardLocked()
+    return alias
+
+
+def locate_accounts(account_ids, for_write=False):
+    """按所在分片分组账户，返回 {alias: [id, ...]}，不存在的 id 不出现在结果中（未配置分片时不查询）
+
+    迁移过程中账户可能同时存在于新旧分片，以 Object 当前的分片为准。
+    """
+    account_ids = list(account_ids)
+    if not sharding_enabled():
+        return {DEFAULT_DB_ALIAS: account_ids}
+    # 结果中保留调用方传入的 id 写法
+    original = {uuid.UUID(str(account_id)): account_id for account_id in account_ids}
+    objects = {}
+    for alias in shard_aliases():
+        rows = Account.objects.using(alias).filter(id__in=list(original)).values_list("id", "object_id")
+        for account_id, object_id in rows:
+            objects.setdefault(object_id, set()).add(original[account_id])
+    groups = {}
+    for object_id, ids in objects.items():
+        alias = writable_shard(object_id) if for_write else shard_for(object_id)
+        groups.setdefault(alias, []).extend(ids)
+    return groups
+
+
+def locate_account(account_id, for_write=False):
+    """单个账户所在分片，不存在时返回 default（随后的查询会得到 404）"""
+    groups = locate_accounts([account_id], for_write=for_write)
+    return next(iter(groups), DEFAULT_DB_ALIAS)
+
+
+def use_shard(alias):
+    """当前上下文的账户数据改走 alias，返回用于 reset_shard 的 token"""
+    return _current_shard.set(alias)
+
+
+def reset_shard(token):
+    _current_shard.reset(token)
+
+
+@contextmanager
+def using_shard(alias):
+    """块内账户数据的读写走 alias"""
+    token = _current_shard.set(alias)
+    try:
+        yield
+    finally:
+        _current_shard.reset(token)
+
+
+def place_object(obj, alias):
+    """在分片中保存一份 Object 行，供账户表外键引用"""
+    if alias != DEFAULT_DB_ALIAS:
+        Object.objects.using(alias).bulk_create([Object(id=obj.id, name=obj.name)], ignore_conflicts=True)
+
+
+def copy_accounts(object_id, source, target, since=None, batch_size=500):
+    """把 Object 的账户从 source 分块覆盖写入 target 并重建 target 中的索引键，逐块 yield 累计复制数
+
+    since 指定时只复制 updated_at 不早于该时间的账户（增量追平）。按主键 upsert（bulk_create update_conflicts），
+    之后回写原 created_at / updated_at（bulk_create 会按 auto_now 改写为当前时间，增量追平依赖原值）。
+    """
+    queryset = Account.objects.using(source).filter(object_id=object_id).order_by("id")
+    if since is not None:
+        queryset = queryset.filter(updated_at__gte=since)
+    update_fields = [field.name for field in Account._meta.concrete_fields if not field.primary_key]
+    # MySQL 的 ON DUPLICATE KEY UPDATE 不能指定冲突列
+    conflict_target = {"unique_fields": ["id"]} if connections[target].features.supports_update_conflicts_with_target else {}
+    total = 0
+    last_id = None
+    while True:
+        chunk = queryset if last_id is None else queryset.filter(id__gt=last_id)
+        accounts = list(chunk[:batch_size])
+        if not accounts:
+            break
+        timestamps = [(account.created_at, account.updated_at) for account in accounts]
+        with transaction.atomic(using=target):
+            Account.objects.using(target).bulk_create(
+                accounts, update_conflicts=True, update_fields=update_fields, **conflict_target
+            )
+            for account, (created_at, updated_at) in zip(accounts, timestamps):
+                account.created_at, account.updated_at = created_at, updated_at
+            Account.objects.using(target).bulk_update(accounts, ["created_at", "updated_at"])
+            sync_account_indexes(accounts, using=target)
+        total += len(accounts)
+        last_id = accounts[-1].id
+        yield total
+
+
+def delete_accounts(alias, account_ids):
+    """物理删除 alias 中的一批账户及其索引键，返回删除的账户数
+
+    不经过 Account 的删除信号（逐行调整计数、使版本失效），用于迁移后清理，调用方自行处理计数与版本。
+    """
+    AccountSortKey.objects.using(alias).filter(account_id__in=account_ids).delete()
+    AccountSearchToken.objects.using(alias).filter(account_id__in=account_ids).delete()
+    return delete_rows(alias, Account, account_ids)
+
+
+def delete_rows(alias, model, pks):
+    """按主键直接执行 DELETE，不收集级联对象、不发送删除信号，返回删除行数"""
+    if not pks:
+        return 0
+    connection = connections[alias]
+    quote = connection.ops.quote_name
+    pk = model._meta.pk
+    params = [pk.get_db_prep_value(value, connection) for value in pks]
+    placeholders = ", ".join(["%s"] * len(params))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {quote(model._meta.db_table)} WHERE {quote(pk.column)} IN ({placeholders})", params
+        )
+        return cursor.rowcount
+
+
+def remove_missing(object_id, source, target, batch_size=500):
+    """删除 target 中 source 已不存在的账户（复制后被物理删除），返回删除数"""
+    removed = 0
+    last_id = None
+    queryset = Account.objects.using(target).filter(object_id=object_id).order_by("id")
+    while True:
+        chunk = queryset if last_id is None else queryset.filter(id__gt=last_id)
+        ids = list(chunk.values_list("id", flat=True)[:batch_size])
+        if not ids:
+            break
+        existing = set(Account.objects.using(source).filter(id__in=ids).values_list("id", flat=True))
+        missing = [account_id for account_id in ids if account_id not in existing]
+        if missing:
+            removed += delete_accounts(target, missing)
+        last_id = ids[-1]
+    return removed
+
+
+def purge_object(object_id, alias, batch_size=500):
+    """分块删除 alias 中某个 Object 的全部账户数据，逐块 yield 累计删除数"""
+    AccountCount.objects.using(alias).filter(object_id=object_id).delete()
+    total = 0
+    while True:
+        ids = list(
+            Account.objects.using(alias).filter(object_id=object_id).values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        with transaction.atomic(using=alias):
+            total += delete_accounts(alias, ids)
+        yield total
+    if alias != DEFAULT_DB_ALIAS:
+        delete_rows(alias, Object, [object_id])
+
+
+class ShardRouter:
+    """账户数据按 Object 分片：写入随实例的 object_id 或当前分片（using_shard）路由，读取走当前分片
+
+    当前分片为 default 或未设置时不作判断，交由 ReplicaRouter 处理（读副本）。
+    元数据表不分片，由后续路由器处理。
+    """
+
+    def db_for_read(self, model, **hints):
+        if model not in SHARDED_MODELS:
+            return None
+        instance = hints.get("instance")
+        if isinstance(instance, Object):
+            return shard_for(instance.pk)
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        shard = _current_shard.get()
+        return None if shard == DEFAULT_DB_ALIAS else shard
+
+    def db_for_write(self, model, **hints):
+        if model not in SHARDED_MODELS:
+            return None
+        instance = hints.get("instance")
+        if isinstance(instance, Object):
+            return shard_for(instance.pk)
+        if instance is not None and getattr(instance, "object_id", None):
+            return shard_for(instance.object_id)
+        return _current_shard.get()
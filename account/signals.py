@@ -0,0 +1,233 @@
+from collections import Counter
+from functools import partial
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.backends.signals import connection_created
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+
+from .conditional import invalidate_accounts
+from .counts import adjust_counts, init_count, reset_counts
+from .indexes import sync_account_indexes
+from .materialize import NOT_MATERIALIZED, drop_table_on, sync_columns
+from .metadata import (
+    get_indexed_field_names,
+    invalidate_field_indexes,
+    invalidate_field_maps,
+    invalidate_layouts,
+)
+from .sharding import place_object, shard_aliases, shard_cache, sharding_enabled
+from .slowlog import install as install_slow_query_log
+from .timing import install as install_request_timer
+from .models import (
+    Object,
+    ObjectField,
+    PageList,
+    PageListField,
+    PageLayout,
+    PageLayoutField,
+    Account,
+)
+
+# 批量写入账户后发送（bulk_create 不触发 post_save），参数: accounts, using
+accounts_bulk_saved = Signal()
+
+# 在数据库内局部更新账户后发送（queryset.update 不触发 post_save），参数: account_ids, fields, object_ids（所属 Object）, using
+accounts_patched = Signal()
+
+# 账户软删除/恢复后发送，参数: account_ids, deleted（"1" 删除 / "0" 恢复）,
+# deltas（各 Object 的计数增量，无法确定时为 None）, object_ids（涉及的 Object）, using
+accounts_soft_deleted = Signal()
+
+
+def _invalidate_field_maps(sender, using=None, **kwargs):
+    invalidate_field_maps(using=using)
+
+
+def _invalidate_layouts(sender, using=None, **kwargs):
+    invalidate_layouts(using=using)
+
+
+# 元数据变更时递增代数（事务提交后再递增一次），所有 worker 的字段映射缓存随之失效
+for _model in (Object, ObjectField, PageList, PageListField):
+    post_save.connect(
+        _invalidate_field_maps, sender=_model, dispatch_uid=f"field_map_{_model.__name__}_save"
+    )
+    post_delete.connect(
+        _invalidate_field_maps, sender=_model, dispatch_uid=f"field_map_{_model.__name__}_delete"
+    )
+
+# 页面布局变更时使编译后的布局失效
+for _model in (PageLayout, PageLayoutField, ObjectField):
+    post_save.connect(
+        _invalidate_layouts, sender=_model, dispatch_uid=f"layout_{_model.__name__}_save"
+    )
+    post_delete.connect(
+        _invalidate_layouts, sender=_model, dispatch_uid=f"layout_{_model.__name__}_delete"
+    )
+
+
+@receiver(pre_save, sender=ObjectField, dispatch_uid="field_index_reset")
+def _reset_field_index(sender, instance, raw=False, update_fields=None, **kwargs):
+    # 取消排序/搜索标记后对应索引不再维护，重新标记时必须重新回填
+    if instance.sortable != "1":
+        instance.sort_indexed = "0"
+    if instance.searchable != "1":
+        instance.search_indexed = "0"
+    if raw or instance._state.adding or "1" not in (instance.sort_indexed, instance.search_indexed):
+        return
+    if update_fields is not None and not {"name", "sortable", "searchable"} & set(update_fields):
+        return
+    previous = ObjectField.objects.filter(pk=instance.pk).values_list("name", "sortable", "searchable").first()
+    if previous is None:
+        return
+    name, sortable, searchable = previous
+    # 改名后已有索引键仍是旧字段名；新标记的索引此前未维护，均须重新回填
+    if name != instance.name or sortable != "1":
+        instance.sort_indexed = "0"
+    if name != instance.name or searchable != "1":
+        instance.search_indexed = "0"
+
+
+@receiver([post_save, post_delete], sender=ObjectField, dispatch_uid="field_index_invalidate")
+def _invalidate_field_indexes(sender, using=None, **kwargs):
+    invalidate_field_indexes(using=using)
+
+
+@receiver(pre_save, sender=ObjectField, dispatch_uid="field_column_track")
+def _track_field_column(sender, instance, raw=False, **kwargs):
+    # 已物化的字段改名、改类型或删除后原列作废，保存后删除旧列并重新加列
+    if raw or instance._state.adding or instance.materialized == NOT_MATERIALIZED:
+        return
+    previous = ObjectField.objects.filter(pk=instance.pk).values_list("name", "type", "deleted").first()
+    if previous != (instance.name, instance.type, instance.deleted):
+        instance.materialized = NOT_MATERIALIZED
+        instance._column_changed = True
+
+
+@receiver(post_save, sender=ObjectField, dispatch_uid="field_column_sync")
+def _sync_field_column(sender, instance, created, raw=False, using=None, **kwargs):
+    # 物化表的列随字段增删改，DDL 在事务提交后执行；其他情况（如恢复已删除字段）由 materialize_tables 命令补齐
+    if raw:
+        return
+    if getattr(instance, "_column_changed", False) or (created and instance.object.materialized != NOT_MATERIALIZED):
+        instance._column_changed = False
+        transaction.on_commit(partial(sync_columns, instance.object_id), using=using)
+
+
+@receiver(post_delete, sender=ObjectField, dispatch_uid="field_column_drop")
+def _drop_field_column(sender, instance, using=None, **kwargs):
+    if instance.materialized != NOT_MATERIALIZED:
+        transaction.on_commit(partial(sync_columns, instance.object_id), using=using)
+
+
+@receiver(post_delete, sender=Object, dispatch_uid="object_table_drop")
+def _drop_object_table(sender, instance, using=None, **kwargs):
+    if instance.materialized != NOT_MATERIALIZED and using == DEFAULT_DB_ALIAS:
+        transaction.on_commit(partial(drop_table_on, instance.shard, instance.table_name), using=using)
+
+
+@receiver(post_save, sender=Account, dispatch_uid="account_indexes")
+def _sync_account_indexes(sender, instance, raw=False, using=None, **kwargs):
+    # 维护可排序字段的影子列与可搜索字段的全文索引
+    if not raw:
+        sync_account_indexes([instance], using=using)
+
+
+@receiver(accounts_bulk_saved, dispatch_uid="account_bulk_indexes")
+def _sync_bulk_account_indexes(sender, accounts, using=None, **kwargs):
+    sync_account_indexes(accounts, using=using)
+
+
+@receiver(accounts_patched, dispatch_uid="account_patched_indexes")
+def _sync_patched_account_indexes(sender, account_ids, fields, using=None, **kwargs):
+    # 补丁未涉及已索引字段时无需回读账户
+    if set(fields) & get_indexed_field_names():
+        accounts = list(Account.objects.using(using).filter(id__in=account_ids))
+        sync_account_indexes(accounts, using=using)
+
+
+# 账户变更后递增账户版本，列表的 ETag 与响应缓存随之失效
+@receiver([post_save, post_delete], sender=Account, dispatch_uid="account_version")
+def _invalidate_account_version(sender, instance, raw=False, using=None, **kwargs):
+    if not raw:
+        invalidate_accounts([instance.object_id], using=using)
+
+
+@receiver(accounts_bulk_saved, dispatch_uid="account_bulk_version")
+def _invalidate_bulk_account_version(sender, accounts, using=None, **kwargs):
+    invalidate_accounts((account.object_id for account in accounts), using=using)
+
+
+@receiver([accounts_patched, accounts_soft_deleted], dispatch_uid="account_patched_version")
+def _invalidate_patched_account_version(sender, object_ids, using=None, **kwargs):
+    invalidate_accounts(object_ids, using=using)
+
+
+# 增量维护各 Object 的未删除账户数（t_account_count），无法确定增量时删除计数行，下次读取时重新统计
+@receiver(post_save, sender=Object, dispatch_uid="account_count_init")
+def _init_account_count(sender, instance, created, raw=False, using=None, **kwargs):
+    if created and not raw:
+        # 计数行与账户在同一分片
+        place_object(instance, instance.shard)
+        init_count(instance.pk, using=instance.shard)
+
+
+@receiver(post_save, sender=Account, dispatch_uid="account_count_save")
+def _count_saved_account(sender, instance, created, raw=False, using=None, **kwargs):
+    if raw:
+        reset_counts([instance.object_id], using=using)
+    elif created:
+        adjust_counts({instance.object_id: int(instance.deleted == "0")}, using=using)
+    else:
+        loaded = getattr(instance, "_loaded_deleted", None)
+        if loaded is None:
+            reset_counts([instance.object_id], using=using)
+        elif loaded != instance.deleted:
+            adjust_counts({instance.object_id: 1 if instance.deleted == "0" else -1}, using=using)
+    instance._loaded_deleted = instance.deleted
+
+
+@receiver(post_delete, sender=Account, dispatch_uid="account_count_delete")
+def _count_deleted_account(sender, instance, using=None, origin=None, **kwargs):
+    # 随 Object 级联删除时计数行也被删除，无需逐条扣减
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if origin_model is Object:
+        return
+    if "deleted" in instance.get_deferred_fields():
+        reset_counts([instance.object_id], using=using)
+    elif instance.deleted == "0":
+        adjust_counts({instance.object_id: -1}, using=using)
+
+
+@receiver(accounts_bulk_saved, dispatch_uid="account_bulk_count")
+def _count_bulk_saved_accounts(sender, accounts, using=None, **kwargs):
+    adjust_counts(Counter(account.object_id for account in accounts if account.deleted == "0"), using=using)
+
+
+@receiver(accounts_soft_deleted, dispatch_uid="account_soft_deleted_count")
+def _count_soft_deleted_accounts(sender, deltas, object_ids, using=None, **kwargs):
+    if deltas is None:
+        reset_counts(object_ids, using=using)
+    else:
+        adjust_counts(deltas, using=using)
+
+
+@receiver(post_save, sender=Object, dispatch_uid="object_shard_invalidate")
+def _invalidate_object_shard(sender, using=None, **kwargs):
+    shard_cache.invalidate(using=using)
+
+
+@receiver(post_delete, sender=Object, dispatch_uid="object_shard_delete")
+def _delete_sharded_accounts(sender, instance, using=None, **kwargs):
+    # 级联删除只在 Object 所在库执行，其他分片中的账户（含迁移中的副本）随分片内的 Object 行一并删除
+    if sharding_enabled() and using == DEFAULT_DB_ALIAS:
+        for alias in shard_aliases():
+            if alias != using:
+                Object.objects.using(alias).filter(pk=instance.pk).delete()
+
+
+# 新建数据库连接时安装慢查询记录与请求计时
+connection_created.connect(install_slow_query_log, dispatch_uid="account.slow_query_log")
+connection_created.connect(install_request_timer, dispatch_uid="account.request_timer")
@@ -0,0 +1,252 @@
+import atexit
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DatabaseError
+
+# 当前请求对应的 (route, action)，由 SlowQueryMiddleware 设置；命令行等场景为空
+_route = ContextVar("slow_query_route", default=("", ""))
+# 正在执行 EXPLAIN 时为 True，避免递归记录
+_explaining = ContextVar("slow_query_explaining", default=False)
+_write_lock = threading.Lock()
+# 本进程已采集过执行计划的指纹
+_explained = set()
+# 写入时按 (指纹, 路由, 动作, 数据库别名) 去重：窗口内首次出现立即写入，其后只累计，窗口结束后写一条汇总
+_pending = {}
+_pending_lock = threading.Lock()
+
+_STRING = re.compile(r"'(?:[^'\\]|\\.|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*\?\s*,)*\s*\?\s*\)", re.IGNORECASE)
+_VALUES_LIST = re.compile(r"(\(\s*\?(?:\s*,\s*\?)*\s*\))(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))+")
+_SPACE = re.compile(r"\s+")
+_QUOTED_NAME = re.compile(r'[`"]')
+
+# 不同数据库的执行计划语句前缀
+EXPLAIN_PREFIX = {
+    "mysql": "EXPLAIN ",
+    "sqlite": "EXPLAIN QUERY PLAN ",
+}
+EXPLAINABLE = ("SELECT", "UPDATE", "DELETE", "WITH")
+
+
+def set_route(route, action):
+    _route.set((route, action))
+
+
+def clear_route():
+    # 不使用 reset(token)：ASGI 下 process_view 可能与 __call__ 运行在不同的上下文中
+    _route.set(("", ""))
+
+
+def normalize_sql(sql):
+    """规整 SQL：参数、字面量替换为 ?，IN 列表与多行 VALUES 折叠，去掉引号并合并空白"""
+    sql = sql.replace("%s", "?")
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _IN_LIST.sub("IN (...)", sql)
+    sql = _VALUES_LIST.sub(r"\1, ...", sql)
+    sql = _QUOTED_NAME.sub("", sql)
+    return _SPACE.sub(" ", sql).strip()
+
+
+def fingerprint(sql):
+    return hashlib.md5(normalize_sql(sql).encode("utf-8")).hexdigest()[:16]
+
+
+def explain(connection, sql, params):
+    """在同一连接上采集执行计划，返回行列表；不支持或失败时返回 None"""
+    prefix = EXPLAIN_PREFIX.get(connection.vendor)
+    if prefix is None or not sql.lstrip().upper().startswith(EXPLAINABLE):
+        return None
+    token = _explaining.set(True)
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            columns = [column[0] for column in cursor.description or ()]
+            return [dict(zip(columns, [str(value) for value in row])) for row in cursor.fetchall()]
+    except DatabaseError:
+        return None
+    finally:
+        _explaining.reset(token)
+
+
+def _redact(value):
+    """参数脱敏：只保留类型与长度，不记录值（参数中可能有客户姓名、电话等）"""
+    if value is None or isinstance(value, bool):
+        return value
+    if isinstance(value, (str, bytes)):
+        return f"<{type(value).__name__}:{len(value)}>"
+    if isinstance(value, (list, tuple)):
+        return [_redact(item) for item in value]
+    return f"<{type(value).__name__}>"
+
+
+def _params_repr(params):
+    """参数的文本表示：默认脱敏，SLOW_QUERY_PARAM_VALUES 开启时记录原值（排查与参数值相关的慢查询）"""
+    if not settings.SLOW_QUERY_PARAM_VALUES:
+        params = _redact(params)
+    text = json.dumps(params, ensure_ascii=False, default=str)
+    return text if len(text) <= 1000 else text[:1000] + "..."
+
+
+def write_entry(entry):
+    """追加一条记录到本进程的文件，超过 SLOW_QUERY_MAX_BYTES 时轮转（保留一个 .1.jsonl 旧文件）"""
+    directory = settings.SLOW_QUERY_DIR
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"slow-queries-{os.getpid()}.jsonl")
+    line = json.dumps(entry, ensure_ascii=False) + "\n"
+    max_bytes = settings.SLOW_QUERY_MAX_BYTES
+    with _write_lock:
+        if max_bytes and os.path.exists(path) and os.path.getsize(path) + len(line.encode("utf-8")) > max_bytes:
+            os.replace(path, os.path.join(directory, f"slow-queries-{os.getpid()}.1.jsonl"))
+        with open(path, "a", encoding="utf-8") as handle:
+            handle.write(line)
+
+
+def record_entry(entry):
+    """按 SLOW_QUERY_DEDUP_SECONDS 去重后写入：同一来源的同一指纹在窗口内只写首条，其余计入下一条汇总"""
+    window = settings.SLOW_QUERY_DEDUP_SECONDS
+    if window <= 0:
+        write_entry(entry)
+        return
+    key = (entry["fingerprint"], entry["route"], entry["action"], entry["alias"])
+    with _pending_lock:
+        pending = _pending.get(key)
+        if pending is not None and entry["ts"] - pending["since"] < window:
+            pending["count"] += 1
+            pending["total_ms"] = round(pending["total_ms"] + entry["ms"], 3)
+            pending["ms"] = max(pending["ms"], entry["ms"])
+            pending["ts"] = entry["ts"]
+            return
+        _pending[key] = {**entry, "since": entry["ts"], "count": 0, "total_ms": 0.0, "ms": 0.0,
+                         "params": None, "plan": None}
+    if pending is not None and pending["count"]:
+        write_entry(_summary(pending))
+    write_entry(entry)
+
+
+def _summary(pending):
+    summary = dict(pending)
+    del summary["since"]
+    return summary
+
+
+def flush_pending():
+    """写出窗口内累计、尚未写入的汇总（进程退出时自动调用）"""
+    with _pending_lock:
+        summaries = [_summary(pending) for pending in _pending.values() if pending["count"]]
+        _pending.clear()
+    for summary in summaries:
+        write_entry(summary)
+
+
+atexit.register(flush_pending)
+
+
+def slow_query_wrapper(execute, sql, params, many, context):
+    """connection.execute_wrapper 回调：记录超过 SLOW_QUERY_MS 的 SQL（默认关闭），
+    开启 SLOW_QUERY_EXPLAIN 时每个指纹在本进程首次出现时附带执行计划"""
+    threshold = settings.SLOW_QUERY_MS
+    if threshold < 0 or _explaining.get():
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    result = execute(sql, params, many, context)
+    elapsed = (time.perf_counter() - start) * 1000
+    if elapsed < threshold:
+        return result
+
+    connection = context["connection"]
+    key = fingerprint(sql)
+    plan = None
+    if settings.SLOW_QUERY_EXPLAIN and not many and key not in _explained:
+        _explained.add(key)
+        plan = explain(connection, sql, params)
+    route, action = _route.get()
+    ms = round(elapsed, 3)
+    record_entry({
+        "ts": time.time(),
+        "fingerprint": key,
+        "sql": sql,
+        "normalized": normalize_sql(sql),
+        # 参数默认不记录，SLOW_QUERY_PARAMS 开启时默认只记录脱敏后的类型与长度
+        "params": _params_repr(params) if settings.SLOW_QUERY_PARAMS and not many else None,
+        "count": 1,
+        "total_ms": ms,
+        "ms": ms,
+        "route": route,
+        "action": action,
+        "vendor": connection.vendor,
+        "alias": connection.alias,
+        "plan": plan,
+    })
+    return result
+
+
+def install(connection, **kwargs):
+    """connection_created 信号处理：为新连接安装慢查询记录（同一连接对象只安装一次）"""
+    if slow_query_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(slow_query_wrapper)
+
+
+def read_entries(directory, since=None):
+    """读取全部进程的慢查询记录"""
+    if not os.path.isdir(directory):
+        return
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".jsonl"):
+            continue
+        with open(os.path.join(directory, name), encoding="utf-8") as handle:
+            for line in handle:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if since is None or entry.get("ts", 0) >= since:
+                    yield entry
+
+
+def aggregate(entries):
+    """按指纹汇总：次数、总耗时、最大耗时、来源路由，以及最近一次采集到的执行计划
+
+    每条记录可能是写入时去重后的汇总（count 条，总耗时 total_ms，最大耗时 ms）。
+    """
+    groups = {}
+    for entry in entries:
+        group = groups.get(entry["fingerprint"])
+        if group is None:
+            group = groups[entry["fingerprint"]] = {
+                "fingerprint": entry["fingerprint"],
+                "normalized": entry["normalized"],
+                "sample_sql": entry["sql"],
+                "sample_params": entry["params"],
+                "count": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+                "routes": {},
+                "plan": None,
+                "last_seen": 0,
+            }
+        count = entry.get("count", 1)
+        group["count"] += count
+        group["total_ms"] += entry.get("total_ms", entry["ms"])
+        if entry["ms"] >= group["max_ms"]:
+            group["max_ms"] = entry["ms"]
+            group["sample_sql"] = entry["sql"]
+            group["sample_params"] = entry["params"]
+        route = f"{entry['route']}.{entry['action']}" if entry["route"] else "-"
+        group["routes"][route] = group["routes"].get(route, 0) + count
+        if entry.get("plan"):
+            group["plan"] = entry["plan"]
+        group["last_seen"] = max(group["last_seen"], entry["ts"])
+    for group in groups.values():
+        group["total_ms"] = round(group["total_ms"], 3)
+        group["avg_ms"] = round(group["total_ms"] / group["count"], 3)
+    return list(groups.values())
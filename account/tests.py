@@ -1,5 +1,44 @@
+import csv
+import gzip
+import io
+import json
+import os
+import re
+import subprocess
+import tempfile
+import threading
+import time
 import uuid
-from django.test import TransactionTestCase
+from datetime import timedelta
+from unittest import mock
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.checks import run_checks
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.apps import apps
+from django.db import connection, connections, transaction
+from django.db.backends.sqlite3 import base as sqlite3_base
+from django.db.models import QuerySet
+from django.db.utils import ConnectionHandler, OperationalError
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from account.benchmark import Scenario, compare_results, percentile, run_scenario
+from account.cache import cache_stats
+from account.checks import check_shared_cache, raise_for_process_cache
+from account.conditional import cached_list_content, list_version
+from account.counts import object_count
+from account.datagen import DatasetGenerator, purge_dataset
+from account.importer import write_checkpoint
+from account.metadata import (
+    field_map_cache, get_field_map, get_indexed_field_names, get_object_field_types, get_page_layout,
+)
+from account.metrics import registry
+from account.pool import ConnectionPool, PooledDatabaseWrapperMixin, PoolTimeout
+from account.profiling import RequestSampler, read_folded
+from account.routers import PIN_COOKIE, PIN_HEADER, choose_replica
 from account.models import (
     Object,
     PageLayout,
@@ -8,7 +47,12 @@ from account.models import (
     PageLayoutField,
     PageListField,
     Account,
+    AccountSortKey,
+    AccountSearchToken,
+    AccountCount,
 )
+from account.search import tokenize
+from account.slowlog import aggregate, fingerprint, flush_pending, normalize_sql, read_entries
 
 
 class TestDataGeneration(TransactionTestCase):
@@ -164,3 +208,1939 @@ class TestDataGeneration(TransactionTestCase):
     def test_account_count(self):
         # 检查 Account 表中是否有 3 条数据
         self.assertEqual(Account.objects.count(), 1)
+
+
+def create_sample_metadata(account_count=1):
+    """创建一套样例元数据与账户，返回 (object, page_list)"""
+    obj = Object.objects.create(name="account", label="医生", table_name="t_accounts")
+    page_list = PageList.objects.create(name="account_list", label="我的医生列表")
+    page_layout = PageLayout.objects.create(name="我的医生详情", page_list=page_list)
+    fields = {
+        name: ObjectField.objects.create(name=name, type="text", object=obj)
+        for name in ("account_name", "hospital", "department", "phone")
+    }
+    for name, label in (("account_name", "医生姓名"), ("hospital", "医院"), ("department", "科室")):
+        PageLayoutField.objects.create(
+            name=label, type="text", object_field=fields[name], page_layout=page_layout
+        )
+        PageListField.objects.create(
+            name=name, type="text", object_field=fields[name], page_list=page_list
+        )
+    for i in range(account_count):
+        Account.objects.create(
+            object=obj,
+            data={
+                "account_name": f"Dr. test{i}",
+                "hospital": f"test Hospital{i}",
+                "department": f"xxxxxtest{i}",
+                "phone": f"1234567890{i}",
+            },
+        )
+    return obj, page_list
+
+
+class TestFieldMapCache(TestCase):
+    def setUp(self):
+        self.object1, self.page_list1 = create_sample_metadata(account_count=3)
+
+    def test_warm_cache_needs_no_queries(self):
+        field_map, error = get_field_map(self.object1.id)
+        self.assertIsNone(error)
+        self.assertEqual(list(field_map), ["account_name", "hospital", "department"])
+        # 缓存预热后不再访问数据库
+        with self.assertNumQueries(0):
+            self.assertEqual(get_field_map(self.object1.id), (field_map, None))
+
+    def test_metadata_change_invalidates_cache(self):
+        get_field_map(self.object1.id)
+        PageListField.objects.filter(name="department").update(hidden="1")
+        field = PageListField.objects.get(name="hospital")
+        field.name = "医院名称"
+        field.save()
+        field_map, _ = get_field_map(self.object1.id)
+        self.assertEqual(field_map["hospital"], "医院名称")
+
+    def test_entries_built_before_commit_are_invalidated(self):
+        field = PageListField.objects.get(name="hospital")
+        with self.captureOnCommitCallbacks(execute=True):
+            field.name = "医院名称"
+            field.save()
+            # 模拟提交前的并发读取者以新代数缓存了旧数据
+            field_map_cache.get_or_set(str(self.object1.id), lambda: ({"hospital": "hospital"}, None))
+        field_map, _ = get_field_map(self.object1.id)
+        self.assertEqual(field_map["hospital"], "医院名称")
+
+    def test_deploy_check_requires_shared_cache(self):
+        self.assertEqual([e.id for e in check_shared_cache(None)], ["account.E001"])
+        shared = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache"}}
+        with override_settings(CACHES=shared):
+            self.assertEqual(check_shared_cache(None), [])
+
+    def test_multi_process_requires_shared_cache(self):
+        # 单进程时只在 --deploy 中报告，多 worker 或 ASGI 下为常规检查
+        self.assertEqual(run_checks(tags=["caches"]), [])
+        for options in ({"WEB_CONCURRENCY": 4}, {"ASGI_SERVER": True}):
+            with self.subTest(**options), override_settings(**options):
+                self.assertEqual([e.id for e in run_checks(tags=["caches"])], ["account.E001"])
+                self.assertEqual(
+                    [e.id for e in run_checks(tags=["caches"], include_deployment_checks=True)], ["account.E001"]
+                )
+                with self.assertRaises(ImproperlyConfigured):
+                    raise_for_process_cache()
+                with override_settings(SILENCED_SYSTEM_CHECKS=["account.E001"]):
+                    raise_for_process_cache()
+
+    @override_settings(ACCOUNT_LIST_CACHE_TIMEOUT=0)
+    def test_list_endpoint_uses_cache(self):
+        url = f"/api/main/?object_id={self.object1.id}"
+        self.client.get(url)
+        # 仅剩分页 COUNT 与数据查询
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["count"], 3)
+        stats = {s["namespace"]: s for s in cache_stats()}
+        self.assertGreater(stats["field_map"]["hits"], 0)
+
+
+class TestPageLayoutCache(TestCase):
+    def setUp(self):
+        self.object1, self.page_list1 = create_sample_metadata(account_count=1)
+        self.account1 = Account.objects.get(object=self.object1)
+
+    def test_retrieve_single_query_on_warm_cache(self):
+        url = f"/api/main/{self.account1.id}/?pagelist_id={self.page_list1.id}"
+        self.client.get(url)
+        # 仅查询 t_account 主键
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["page_layout"]["name"], "我的医生详情")
+        self.assertEqual(response.json()["filtered_data"]["医生姓名"], "Dr. test0")
+
+    def test_layout_change_invalidates_cache(self):
+        layout = get_page_layout(self.page_list1.id)
+        self.assertEqual(layout.fields[0], ("account_name", "医生姓名"))
+        PageLayout.objects.filter(page_list=self.page_list1).get().delete()
+        self.assertIsNone(get_page_layout(self.page_list1.id))
+
+
+class TestCursorPagination(TestCase):
+    def setUp(self):
+        self.object1, _ = create_sample_metadata(account_count=0)
+        for i in range(7):
+            Account.objects.create(
+                object=self.object1,
+                # 制造重复排序值，验证 id 次序键
+                data={"account_name": f"Dr. {i // 2}", "hospital": f"H{6 - i}", "department": "d"},
+            )
+        get_field_map(self.object1.id)
+
+    def walk(self, sort_field, sort_order):
+        url = (
+            f"/api/main/?object_id={self.object1.id}&cursor="
+            f"&page_size=3&sort_field={sort_field}&sort_order={sort_order}"
+        )
+        pages = []
+        while url:
+            with self.assertNumQueries(1):
+                body = self.client.get(url).json()
+            self.assertNotIn("count", body)
+            pages.append(body)
+            url = body["next"]
+        return pages
+
+    def test_forward_walk_matches_full_ordering(self):
+        for sort_field in ("account_name", "hospital"):
+            for sort_order in ("asc", "desc"):
+                pages = self.walk(sort_field, sort_order)
+                ids = [row["id"] for page in pages for row in page["results"]]
+                self.assertEqual(len(ids), 7)
+                self.assertEqual(len(set(ids)), 7)
+                keys = [
+                    Account.objects.get(id=pk).data[sort_field] for pk in ids
+                ]
+                self.assertEqual(keys, sorted(keys, reverse=sort_order == "desc"))
+
+    def test_previous_cursor_returns_previous_page(self):
+        pages = self.walk("account_name", "asc")
+        self.assertIsNone(pages[0]["previous"])
+        body = self.client.get(pages[1]["previous"]).json()
+        self.assertEqual(body["results"], pages[0]["results"])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(f"/api/main/?object_id={self.object1.id}&cursor=%%%")
+        self.assertEqual(response.status_code, 400)
+
+
+class TestSortKeyIndexes(TestCase):
+    def setUp(self):
+        self.object1, _ = create_sample_metadata(account_count=0)
+        for name in ("Carol", "alice", "Bob", "anna"):
+            Account.objects.create(
+                object=self.object1,
+                data={"account_name": name, "hospital": f"{name} Hospital", "department": "d"},
+            )
+
+    def list_names(self, query=""):
+        url = f"/api/main/?object_id={self.object1.id}{query}"
+        return [row["account_name"] for row in self.client.get(url).json()["results"]]
+
+    def test_indexed_sort_matches_json_scan(self):
+        expected = self.list_names("&sort_order=desc")
+
+        field = ObjectField.objects.get(object=self.object1, name="account_name")
+        field.sortable = "1"
+        field.save()
+        call_command("account_indexes", stdout=io.StringIO())
+
+        self.assertEqual(AccountSortKey.objects.filter(object=self.object1).count(), 4)
+        self.assertEqual(self.list_names("&sort_order=desc"), expected)
+
+        # 写入时维护影子列
+        Account.objects.create(object=self.object1, data={"account_name": "Aaron"})
+        self.assertIn("Aaron", self.list_names("&sort_order=desc"))
+
+    def test_check_reports_json_scan(self):
+        out = io.StringIO()
+        call_command("account_indexes", "--check", stdout=out)
+        self.assertIn("排序 hospital: JSON 扫描", out.getvalue())
+
+    def test_unflagging_resets_indexed(self):
+        field = ObjectField.objects.get(object=self.object1, name="hospital")
+        field.sortable, field.sort_indexed = "0", "1"
+        field.save()
+        field.refresh_from_db()
+        self.assertEqual(field.sort_indexed, "0")
+
+    def test_every_account_has_a_sort_key_row(self):
+        field = ObjectField.objects.get(object=self.object1, name="account_name")
+        field.sortable = "1"
+        field.save()
+        Account.objects.create(object=self.object1, data={"hospital": "no name"})
+        call_command("account_indexes", stdout=io.StringIO())
+        Account.objects.create(object=self.object1, data={"hospital": "no name either"})
+
+        # 缺值的账户也有影子列行（空字符串），内连接不会让它们从列表中消失
+        self.assertEqual(AccountSortKey.objects.filter(object=self.object1, field="account_name").count(), 6)
+        self.assertEqual(self.list_names()[:2], ["N/A", "N/A"])
+
+        AccountSortKey.objects.filter(account__data__hospital="no name").delete()
+        out = io.StringIO()
+        call_command("account_indexes", "--check", stdout=out)
+        self.assertIn("排序 account_name: 索引缺少 1 个账户", out.getvalue())
+
+    def test_indexed_sort_reads_index_order(self):
+        from account.queries import order_accounts
+
+        field = ObjectField.objects.get(object=self.object1, name="account_name")
+        field.sortable = "1"
+        field.save()
+        call_command("account_indexes", stdout=io.StringIO())
+        queryset = Account.objects.filter(object_id=self.object1.id, deleted="0")
+        for order in ("asc", "desc"):
+            with self.subTest(order=order):
+                plan = order_accounts(queryset, self.object1.id, "account_name", order)[:20].explain()
+                self.assertIn("t_account_s_object__54b242_idx", plan)
+                self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_renaming_resets_indexed(self):
+        field = ObjectField.objects.get(object=self.object1, name="account_name")
+        field.sortable = "1"
+        field.save()
+        call_command("account_indexes", stdout=io.StringIO())
+
+        field.name = "renamed"
+        field.save()
+        field.refresh_from_db()
+        self.assertEqual(field.sort_indexed, "0")
+        field.name = "account_name"
+        field.save()
+        self.assertEqual(len(self.list_names()), 4)
+
+    def test_flagging_searchable_after_sort_backfill(self):
+        field = ObjectField.objects.get(object=self.object1, name="account_name")
+        field.sortable = "1"
+        field.save()
+        call_command("account_indexes", stdout=io.StringIO())
+
+        # 排序索引已回填，新标记的搜索索引尚未回填，搜索仍走 JSON 扫描
+        field.refresh_from_db()
+        field.searchable = "1"
+        field.save()
+        field.refresh_from_db()
+        self.assertEqual((field.sort_indexed, field.search_indexed), ("1", "0"))
+        self.assertEqual(self.list_names("&search=Bo"), ["Bob"])
+
+        call_command("account_indexes", stdout=io.StringIO())
+        self.assertEqual(self.list_names("&search=ob"), ["Bob"])
+
+
+class TestFulltextSearch(TestCase):
+    def setUp(self):
+        self.object1, _ = create_sample_metadata(account_count=0)
+        for name, hospital, department in (
+            ("张三", "北京协和医院", "心内科"),
+            ("李四", "上海瑞金医院", "心外科"),
+            ("王小明", "北京大学第一医院", "神经内科"),
+            ("Dr. Smith", "Union Hospital", "Cardiology"),
+        ):
+            Account.objects.create(
+                object=self.object1,
+                data={"account_name": name, "hospital": hospital, "department": department},
+            )
+        for field in ObjectField.objects.filter(
+            object=self.object1, name__in=["account_name", "hospital", "department"]
+        ):
+            field.searchable = "1"
+            field.save()
+        call_command("account_indexes", stdout=io.StringIO())
+
+    def search(self, term):
+        url = f"/api/main/?object_id={self.object1.id}&search={term}"
+        return [row["account_name"] for row in self.client.get(url).json()["results"]]
+
+    def test_tokenize_bigrams(self):
+        self.assertEqual(tokenize("心内科"), {"心内": 2, "内科": 1, "科": 1})
+
+    def test_substring_across_fields(self):
+        self.assertEqual(sorted(self.search("北京")), ["张三", "王小明"])
+        self.assertEqual(sorted(self.search("内科")), ["张三", "王小明"])
+        self.assertEqual(self.search("smi"), ["Dr. Smith"])
+        self.assertEqual(self.search("小"), ["王小明"])
+        self.assertEqual(self.search("协和医院"), ["张三"])
+        self.assertEqual(self.search("北医"), [])
+
+    def test_punctuation_only_query_matches_nothing(self):
+        self.assertEqual(self.search("%21%21%20"), [])
+
+    def test_fullwidth_query_is_normalized(self):
+        self.assertEqual(self.search("ＳＭＩ"), ["Dr. Smith"])
+
+    def test_ranking_prefers_field_prefix(self):
+        Account.objects.create(
+            object=self.object1,
+            data={"account_name": "内科主任", "hospital": "社区医院", "department": "内科"},
+        )
+        # 词元位于字段开头且命中多个字段的账户排在前面
+        self.assertEqual(self.search("内科")[0], "内科主任")
+        # 显式指定排序字段时不按相关度排序
+        url = f"/api/main/?object_id={self.object1.id}&search=内科&sort_field=account_name"
+        names = [row["account_name"] for row in self.client.get(url).json()["results"]]
+        self.assertEqual(names, sorted(names))
+
+    def test_index_maintained_on_update_and_delete(self):
+        account = Account.objects.get(data__account_name="李四")
+        account.data["department"] = "神经外科"
+        account.save()
+        self.assertEqual(sorted(self.search("神经")), ["李四", "王小明"])
+        account.delete()
+        self.assertEqual(self.search("神经"), ["王小明"])
+
+    def test_rebuild_command(self):
+        AccountSearchToken.objects.filter(object=self.object1).delete()
+        call_command("rebuild_search_index", stdout=io.StringIO())
+        self.assertEqual(self.search("瑞金"), ["李四"])
+
+    def test_flagging_sortable_after_search_backfill(self):
+        field = ObjectField.objects.get(object=self.object1, name="account_name")
+        field.sortable = "1"
+        field.save()
+        field.refresh_from_db()
+        self.assertEqual((field.sort_indexed, field.search_indexed), ("0", "1"))
+
+        # 影子列尚未回填，排序仍走 JSON 扫描，回填后走索引，结果一致
+        url = f"/api/main/?object_id={self.object1.id}&sort_field=account_name"
+        expected = [row["account_name"] for row in self.client.get(url).json()["results"]]
+        self.assertEqual(len(expected), 4)
+        call_command("account_indexes", stdout=io.StringIO())
+        url += "&sort_order=asc"
+        self.assertEqual([row["account_name"] for row in self.client.get(url).json()["results"]], expected)
+
+
+class TestBulkCreate(TestCase):
+    def setUp(self):
+        self.object1, _ = create_sample_metadata(account_count=0)
+
+    def post(self, payload):
+        return self.client.post("/api/main/bulk/", payload, content_type="application/json")
+
+    def test_atomic_mode_creates_all(self):
+        items = [{"account_name": f"Dr. {i}", "hospital": "H"} for i in range(7)]
+        response = self.post({"object_id": str(self.object1.id), "data": items, "batch_size": 3})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["created"], 7)
+        self.assertEqual(Account.objects.filter(object=self.object1).count(), 7)
+
+    def test_atomic_mode_rejects_invalid_batch(self):
+        items = [{"account_name": "ok"}, {"unknown": "x"}, "not a dict"]
+        response = self.post({"object_id": str(self.object1.id), "data": items})
+        self.assertEqual(response.status_code, 400)
+        statuses = [r["status"] for r in response.json()["results"]]
+        self.assertEqual(statuses, ["created", "error", "error"])
+        self.assertEqual(Account.objects.count(), 0)
+
+    def test_partial_mode_reports_per_item(self):
+        items = [{"account_name": "ok"}, {"unknown": "x"}]
+        response = self.post({"object_id": str(self.object1.id), "data": items, "mode": "partial"})
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.json()["failed"], 1)
+        self.assertEqual(Account.objects.count(), 1)
+
+    def test_bulk_create_maintains_indexes(self):
+        field = ObjectField.objects.get(object=self.object1, name="account_name")
+        field.searchable = field.sortable = "1"
+        field.save()
+        call_command("account_indexes", stdout=io.StringIO())
+        self.post({"object_id": str(self.object1.id), "data": [{"account_name": "王医生"}]})
+        self.assertEqual(AccountSortKey.objects.filter(value="王医生").count(), 1)
+        self.assertTrue(AccountSearchToken.objects.filter(token="王医").exists())
+
+
+class TestMergePatch(TestCase):
+    def setUp(self):
+        self.object1, _ = create_sample_metadata(account_count=2)
+        self.account1, self.account2 = Account.objects.filter(object=self.object1).order_by("data__account_name")
+
+    def patch(self, url, payload):
+        return self.client.patch(url, payload, content_type="application/json")
+
+    def test_patch_merges_in_single_update(self):
+        get_indexed_field_names()
+        get_object_field_types(self.object1.id)
+        # 一条查询读取原数据与所属 Object（校验合并结果，只使该 Object 的列表缓存失效），一条 UPDATE 应用补丁
+        with self.assertNumQueries(2):
+            response = self.patch(
+                f"/api/main/{self.account1.id}/", {"hospital": "新医院", "phone": None}
+            )
+        self.assertEqual(response.status_code, 200)
+        self.account1.refresh_from_db()
+        self.assertEqual(self.account1.data["hospital"], "新医院")
+        self.assertEqual(self.account1.data["account_name"], "Dr. test0")
+        self.assertNotIn("phone", self.account1.data)
+
+    def test_patch_invalidates_only_its_object(self):
+        other, _ = create_sample_metadata(account_count=1)
+        before = (list_version(self.object1.id), list_version(other.id))
+        self.patch(f"/api/main/{self.account1.id}/", {"hospital": "新医院"})
+        self.assertNotEqual(list_version(self.object1.id), before[0])
+        self.assertEqual(list_version(other.id), before[1])
+
+        self.client.delete(f"/api/main/{self.account2.id}/")
+        self.assertEqual(list_version(other.id), before[1])
+
+    def test_patch_validates_merged_data(self):
+        ObjectField.objects.create(object=self.object1, name="visits", type="integer")
+        for payload in ({"visits": "many"}, {"unknown": "x"}):
+            with self.subTest(payload=payload):
+                response = self.patch(f"/api/main/{self.account1.id}/", payload)
+                self.assertEqual(response.status_code, 400)
+        self.account1.refresh_from_db()
+        self.assertNotIn("visits", self.account1.data)
+
+        response = self.patch(f"/api/main/{self.account1.id}/", {"visits": 3})
+        self.assertEqual(response.status_code, 200)
+        self.account1.refresh_from_db()
+        self.assertEqual(self.account1.data["visits"], 3)
+
+    def test_patch_missing_account(self):
+        response = self.patch(f"/api/main/{uuid.uuid4()}/", {"hospital": "x"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_bulk_patch(self):
+        response = self.patch("/api/main/bulk/", {
+            "patches": [
+                {"id": str(self.account1.id), "data": {"department": "儿科"}},
+                {"id": str(self.account2.id), "data": {"department": "儿科"}},
+                {"id": str(uuid.uuid4()), "data": {"department": "外科"}},
+            ]
+        })
+        self.assertEqual(response.json()["updated"], 2)
+        self.assertEqual(response.json()["not_found"], 1)
+        self.assertEqual(Account.objects.filter(data__department="儿科").count(), 2)
+
+    def test_patch_maintains_indexes(self):
+        field = ObjectField.objects.get(object=self.object1, name="hospital")
+        field.searchable = "1"
+        field.save()
+        call_command("account_indexes", stdout=io.StringIO())
+        self.patch(f"/api/main/{self.account1.id}/", {"hospital": "协和医院"})
+        self.assertTrue(
+            AccountSearchToken.objects.filter(account=self.account1, token="协和").exists()
+        )
+
+
+class TestSoftDelete(TestCase):
+    def setUp(self):
+        self.object1, self.page_list1 = create_sample_metadata(account_count=5)
+        self.accounts = list(Account.objects.filter(object=self.object1).order_by("data__account_name"))
+
+    def test_destroy_is_soft(self):
+        account = self.accounts[0]
+        # 软删除 UPDATE + 查询所属 Object + 扣减账户计数
+        with self.assertNumQueries(3):
+            response = self.client.delete(f"/api/main/{account.id}/")
+        self.assertEqual(response.status_code, 204)
+        account.refresh_from_db()
+        self.assertEqual(account.deleted, "1")
+        self.assertEqual(self.client.delete(f"/api/main/{account.id}/").status_code, 404)
+        response = self.client.get(f"/api/main/{account.id}/?pagelist_id={self.page_list1.id}")
+        self.assertEqual(response.status_code, 404)
+
+    def test_bulk_delete_and_restore(self):
+        ids = [str(a.id) for a in self.accounts[:3]]
+        with self.settings(BULK_DELETE_CHUNK_SIZE=2):
+            response = self.client.post(
+                "/api/main/bulk-delete/", {"ids": ids}, content_type="application/json"
+            )
+        self.assertEqual(response.json()["deleted"], 3)
+        self.assertEqual(Account.objects.filter(deleted="0").count(), 2)
+
+        response = self.client.post(
+            "/api/main/bulk-restore/",
+            {"object_id": str(self.object1.id), "search": "Dr. test1"},
+            content_type="application/json",
+        )
+        self.assertEqual(response.json()["restored"], 1)
+        self.assertEqual(Account.objects.filter(deleted="0").count(), 3)
+
+    def test_purge_respects_retention(self):
+        old, recent = self.accounts[0], self.accounts[1]
+        Account.objects.filter(id__in=[old.id, recent.id]).update(deleted="1")
+        Account.objects.filter(id=old.id).update(updated_at=timezone.now() - timedelta(days=40))
+        call_command("purge_deleted_accounts", "--days", "30", "--batch-size", "1", stdout=io.StringIO())
+        self.assertFalse(Account.objects.filter(id=old.id).exists())
+        self.assertTrue(Account.objects.filter(id=recent.id).exists())
+
+
+class TestExport(TestCase):
+    def setUp(self):
+        self.object1, _ = create_sample_metadata(account_count=7)
+        self.url = f"/api/main/export/?object_id={self.object1.id}"
+
+    def test_csv_export_streams_all_rows_in_chunks(self):
+        with self.settings(EXPORT_CHUNK_SIZE=3):
+            response = self.client.get(self.url + "&sort_order=desc")
+            body = b"".join(response.streaming_content).decode("utf-8-sig")
+        rows = list(csv.reader(io.StringIO(body)))
+        self.assertEqual(rows[0], ["account_name", "hospital", "department", "id"])
+        names = [row[0] for row in rows[1:]]
+        self.assertEqual(names, [f"Dr. test{i}" for i in range(6, -1, -1)])
+
+    def test_ndjson_export_with_search_and_gzip(self):
+        response = self.client.get(self.url + "&export_format=ndjson&search=Dr. test1&gzip=1")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        body = gzip.decompress(b"".join(response.streaming_content)).decode("utf-8")
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row["account_name"] for row in rows], ["Dr. test1"])
+
+    def test_export_skips_deleted(self):
+        Account.objects.filter(data__account_name="Dr. test0").update(deleted="1")
+        response = self.client.get(self.url + "&export_format=ndjson")
+        self.assertEqual(len(b"".join(response.streaming_content).splitlines()), 6)
+
+
+class TestImportAccounts(TestCase):
+    def setUp(self):
+        self.object1, _ = create_sample_metadata(account_count=0)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def write(self, name, content):
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, "w", encoding="utf-8", newline="") as handle:
+            handle.write(content)
+        return path
+
+    def run_import(self, path, *args):
+        call_command(
+            "import_accounts", path, "--object", str(self.object1.id), "--workers", "0",
+            *args, stdout=io.StringIO(), stderr=io.StringIO(),
+        )
+
+    def test_csv_import_with_quoted_newlines(self):
+        path = self.write("a.csv", 'account_name,hospital\n"张\n三",协和\n李四,"瑞金,上海"\n')
+        self.run_import(path, "--batch-size", "1")
+        self.assertEqual(Account.objects.get(data__account_name="张\n三").data["hospital"], "协和")
+        self.assertEqual(Account.objects.get(data__account_name="李四").data["hospital"], "瑞金,上海")
+        self.assertFalse(os.path.exists(path + ".checkpoint"))
+
+    def test_ndjson_import_skips_invalid_and_resumes(self):
+        lines = [json.dumps({"account_name": f"Dr. {i}"}) for i in range(5)]
+        lines.insert(2, json.dumps({"unknown": "x"}))
+        path = self.write("a.ndjson", "\n".join(lines) + "\n")
+        checkpoint = path + ".checkpoint"
+
+        # 模拟前 3 行已导入后中断
+        offset = sum(len(line.encode("utf-8")) + 1 for line in lines[:3])
+        with open(checkpoint, "w", encoding="utf-8") as handle:
+            json.dump({"path": os.path.abspath(path), "offset": offset, "records": 3,
+                       "imported": 2, "rejected": 1}, handle)
+        self.run_import(path, "--resume", "--batch-size", "2")
+        names = sorted(a.data["account_name"] for a in Account.objects.all())
+        self.assertEqual(names, ["Dr. 2", "Dr. 3", "Dr. 4"])
+
+    def test_strict_mode_stops_on_invalid(self):
+        path = self.write("a.jsonl", '{"account_name": "ok"}\n{bad\n')
+        with self.assertRaises(CommandError):
+            self.run_import(path, "--strict", "--batch-size", "1")
+        self.assertEqual(Account.objects.count(), 1)
+        self.assertTrue(os.path.exists(path + ".checkpoint"))
+
+    def test_resume_after_crash_before_checkpoint_is_idempotent(self):
+        path = self.write("a.jsonl", "".join(json.dumps({"account_name": f"Dr. {i}"}) + "\n" for i in range(4)))
+        calls = []
+
+        def crash_after_first_chunk(checkpoint_path, state):
+            # 第 1 次为初始检查点，第 2 次为第一块提交后：模拟块已提交、检查点未写入时中断
+            calls.append(state["records"])
+            if len(calls) == 2:
+                raise KeyboardInterrupt
+            write_checkpoint(checkpoint_path, state)
+
+        with mock.patch("account.management.commands.import_accounts.write_checkpoint", crash_after_first_chunk):
+            with self.assertRaises(KeyboardInterrupt):
+                self.run_import(path, "--batch-size", "2")
+        self.assertEqual(Account.objects.count(), 2)
+
+        self.run_import(path, "--resume", "--batch-size", "2")
+        names = sorted(a.data["account_name"] for a in Account.objects.all())
+        self.assertEqual(names, ["Dr. 0", "Dr. 1", "Dr. 2", "Dr. 3"])
+        self.assertEqual(AccountCount.objects.get(object=self.object1).count, 4)
+
+    def test_values_are_checked_against_field_types(self):
+        ObjectField.objects.create(object=self.object1, name="age", type="integer")
+        ObjectField.objects.create(object=self.object1, name="active", type="boolean")
+        path = self.write("a.jsonl", '{"account_name": "a", "age": 30}\n{"account_name": "b", "age": "30"}\n')
+        self.run_import(path)
+        self.assertEqual([a.data["account_name"] for a in Account.objects.all()], ["a"])
+
+        # CSV 的字符串值按类型转换，无法转换的记录无效
+        path = self.write("a.csv", "account_name,age,active\nc,41,true\nd,abc,false\ne,,0\n")
+        self.run_import(path)
+        self.assertEqual(Account.objects.get(data__account_name="c").data, {"account_name": "c", "age": 41, "active": True})
+        self.assertEqual(Account.objects.get(data__account_name="e").data, {"account_name": "e", "active": False})
+        self.assertFalse(Account.objects.filter(data__account_name="d").exists())
+
+
+class TestGenerateDataset(TestCase):
+    def test_generator_is_deterministic(self):
+        first = DatasetGenerator(seed=7, hospitals=50, departments=10)
+        second = DatasetGenerator(seed=7, hospitals=50, departments=10)
+        self.assertEqual(
+            [first.account_data(["field_1"]) for _ in range(20)],
+            [second.account_data(["field_1"]) for _ in range(20)],
+        )
+
+    def test_ids_follow_seed(self):
+        def generate():
+            generator = DatasetGenerator(seed=7, hospitals=50, departments=10)
+            obj, page_list = generator.create_metadata("seeded")
+            for _ in generator.create_accounts(obj, 5):
+                pass
+            ids = (
+                obj.id, page_list.id,
+                sorted(ObjectField.objects.filter(object=obj).values_list("id", flat=True)),
+                list(Account.objects.filter(object=obj).order_by("id").values_list("id", "data")),
+            )
+            purge_dataset(obj)
+            return ids
+
+        self.assertEqual(generate(), generate())
+
+    def test_command_refuses_existing_seed(self):
+        args = ["generate_dataset", "--accounts", "3", "--seed", "5"]
+        call_command(*args, stdout=io.StringIO())
+        with self.assertRaises(CommandError):
+            call_command(*args, "--prefix", "again", stdout=io.StringIO())
+        self.assertEqual(Object.objects.count(), 1)
+
+    def test_hospitals_are_skewed(self):
+        generator = DatasetGenerator(seed=1, hospitals=100, skew=1.2)
+        hospitals = [generator.account_data()["hospital"] for _ in range(2000)]
+        top = max(set(hospitals), key=hospitals.count)
+        self.assertEqual(top, generator.hospitals[0])
+        self.assertGreater(hospitals.count(top), 2000 / 100 * 5)
+
+    def test_command_creates_metadata_and_accounts(self):
+        call_command(
+            "generate_dataset", "--objects", "2", "--accounts", "25", "--batch-size", "10",
+            "--extra-fields", "2", "--blob-size", "20", "--prefix", "cap", stdout=io.StringIO(),
+        )
+        obj = Object.objects.get(name="cap_1")
+        self.assertEqual(Account.objects.filter(object=obj).count(), 25)
+        self.assertEqual(Account.objects.filter(object__name="cap_2").count(), 25)
+        self.assertEqual(
+            set(get_field_map(obj.id)[0]), {"account_name", "hospital", "department"}
+        )
+        account = Account.objects.filter(object=obj).first()
+        self.assertIn("field_2", account.data)
+        self.assertIn("notes", account.data)
+
+
+class TestBenchmarkApi(TestCase):
+    def test_percentile_and_compare(self):
+        self.assertEqual(percentile([5, 1, 3, 2, 4], 50), 3)
+        self.assertEqual(percentile([5, 1, 3, 2, 4], 99), 5)
+        baseline = {"scenarios": {"a": {"p50_ms": 10.0, "queries": 2}, "b": {"p50_ms": 10.0, "queries": 2}}}
+        current = {"scenarios": {
+            "a": {"p50_ms": 11.0, "queries": 2},
+            "b": {"p50_ms": 13.0, "queries": 3},
+            "c": {"p50_ms": 99.0, "queries": 9},
+        }}
+        regressions = compare_results(baseline, current, 0.2)
+        self.assertEqual([name for name, _ in regressions], ["b", "b"])
+
+    def test_command_writes_results_and_fails_on_regression(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        output = os.path.join(tmpdir.name, "result.json")
+        args = ["--accounts", "30", "--repeat", "2", "--warmup", "1", "--only", "account_name.asc"]
+        call_command("benchmark_api", *args, "--output", output, stdout=io.StringIO(), stderr=io.StringIO())
+        with open(output, encoding="utf-8") as handle:
+            results = json.load(handle)
+        self.assertEqual(
+            set(results["scenarios"]),
+            {"list.account_name.asc.page1", "list.account_name.asc.deep", "list.account_name.asc.search"},
+        )
+        self.assertEqual(results["scenarios"]["list.account_name.asc.page1"]["status"], [200])
+        # 临时数据集在结束后删除
+        self.assertFalse(Object.objects.filter(name="benchmark").exists())
+        self.assertFalse(PageList.objects.filter(name="benchmark_list").exists())
+        self.assertFalse(Account.objects.exclude(object__in=Object.objects.all()).exists())
+
+        for result in results["scenarios"].values():
+            result["queries"] = 0
+        baseline = os.path.join(tmpdir.name, "baseline.json")
+        with open(baseline, "w", encoding="utf-8") as handle:
+            json.dump(results, handle)
+        with self.assertRaises(CommandError):
+            call_command("benchmark_api", *args, "--baseline", baseline, stdout=io.StringIO(), stderr=io.StringIO())
+
+    def test_writes_on_existing_object_go_to_scratch_dataset(self):
+        object1, _ = create_sample_metadata(account_count=2)
+        before = list(Account.objects.filter(object=object1).values_list("id", "data", "deleted"))
+        args = ["--object", str(object1.id), "--repeat", "2", "--warmup", "1", "--only", "e"]
+        out = io.StringIO()
+        call_command("benchmark_api", *args, stdout=out, stderr=io.StringIO())
+        results = json.loads(out.getvalue())
+        for name in ("retrieve", "create", "update", "destroy"):
+            self.assertEqual(results["scenarios"][name]["status"][0] // 100, 2, name)
+        self.assertEqual(list(Account.objects.filter(object=object1).values_list("id", "data", "deleted")), before)
+        self.assertEqual(list(Object.objects.all()), [object1])
+
+    def test_bench_bulk_create_purges_scratch_object(self):
+        out = io.StringIO()
+        call_command("bench_bulk_create", "--count", "5", "--single-count", "2", stdout=out)
+        self.assertIn("已删除基准测试写入的数据", out.getvalue())
+        self.assertFalse(Object.objects.exists())
+        self.assertFalse(Account.objects.exists())
+
+
+def create_scaled_metadata(n):
+    """按规模 n 创建元数据与账户：n 个账户、n 个额外字段（含列表/布局字段）、n 套额外的 Object / PageList / PageLayout"""
+    obj, page_list = create_sample_metadata(account_count=n)
+    page_layout = PageLayout.objects.get(page_list=page_list)
+    for i in range(n):
+        field = ObjectField.objects.create(name=f"extra_{i}", type="text", object=obj)
+        PageListField.objects.create(name=f"extra_{i}", type="text", object_field=field, page_list=page_list)
+        PageLayoutField.objects.create(name=f"额外{i}", type="text", object_field=field, page_layout=page_layout)
+        Object.objects.create(name=f"object_{i}", table_name=f"t_object_{i}")
+        extra_list = PageList.objects.create(name=f"list_{i}")
+        PageLayout.objects.create(name=f"layout_{i}", page_list=extra_list)
+    return obj, page_list, page_layout
+
+
+class TestQueryBudgets(TestCase):
+    """每个路由动作的查询数预算：元数据与账户从 1 增长到 100 时查询数必须不变且不超过预算"""
+
+    SCALES = (1, 100)
+
+    # (路由 basename, 动作) -> 规模为 100 时允许的最大查询数（冷缓存）
+    # 账户增删与 Object 新建/删除包含维护 t_account_count 的查询；局部更新包含校验合并结果时读取的字段类型
+    BUDGETS = {
+        ("main", "list"): 6, ("main", "retrieve"): 3, ("main", "create"): 7, ("main", "update"): 5,
+        ("main", "partial_update"): 4, ("main", "destroy"): 3, ("main", "export"): 5, ("main", "bulk"): 7,
+        ("main", "bulk_partial_update"): 5, ("main", "bulk_delete"): 3, ("main", "bulk_restore"): 1,
+        ("object", "list"): 1, ("object", "retrieve"): 1, ("object", "create"): 2, ("object", "update"): 2,
+        ("object", "partial_update"): 2, ("object", "destroy"): 18,
+        ("objectfield", "list"): 1, ("objectfield", "retrieve"): 1, ("objectfield", "create"): 2,
+        ("objectfield", "update"): 3, ("objectfield", "partial_update"): 2, ("objectfield", "destroy"): 6,
+        ("pagelist", "list"): 1, ("pagelist", "retrieve"): 1, ("pagelist", "create"): 1,
+        ("pagelist", "update"): 2, ("pagelist", "partial_update"): 2, ("pagelist", "destroy"): 10,
+        ("pagelistfield", "list"): 1, ("pagelistfield", "retrieve"): 1, ("pagelistfield", "create"): 3,
+        ("pagelistfield", "update"): 4, ("pagelistfield", "partial_update"): 2,
+        ("pagelistfield", "destroy"): 2,
+        ("pagelayout", "list"): 1, ("pagelayout", "retrieve"): 1, ("pagelayout", "create"): 2,
+        ("pagelayout", "update"): 3, ("pagelayout", "partial_update"): 2, ("pagelayout", "destroy"): 5,
+        ("pagelayoutfield", "list"): 1, ("pagelayoutfield", "retrieve"): 1, ("pagelayoutfield", "create"): 3,
+        ("pagelayoutfield", "update"): 4, ("pagelayoutfield", "partial_update"): 2,
+        ("pagelayoutfield", "destroy"): 2,
+        ("account", "list"): 1, ("account", "retrieve"): 1, ("account", "create"): 4,
+        ("account", "update"): 4, ("account", "partial_update"): 4, ("account", "destroy"): 5,
+    }
+    # 级联删除由 Django 按每批 100 行删除关联行（关联模型注册了信号，需先查出实例），
+    # 查询数随关联行数分批增长，只校验预算不校验恒定
+    CASCADE_DELETES = {("object", "destroy"), ("pagelist", "destroy"), ("pagelayout", "destroy")}
+
+    def build_requests(self, n, obj, page_list, page_layout):
+        """返回 {(basename, 动作): (方法, 路径, 请求体)}"""
+        accounts = [str(pk) for pk in Account.objects.filter(object=obj).order_by("id").values_list("id", flat=True)]
+        account, other = accounts[0], accounts[-1]
+        object_id = str(obj.id)
+        field = ObjectField.objects.get(object=obj, name="account_name")
+        list_field = PageListField.objects.filter(page_list=page_list, object_field=field).first()
+        layout_field = PageLayoutField.objects.filter(page_layout=page_layout, object_field=field).first()
+        data = {"account_name": "Dr. budget", "hospital": "budget Hospital"}
+        requests = {
+            ("main", "list"): ("get", f"/api/main/?object_id={object_id}", None),
+            ("main", "retrieve"): ("get", f"/api/main/{account}/?pagelist_id={page_list.id}", None),
+            ("main", "create"): ("post", "/api/main/", {"object_id": object_id, "data": data}),
+            ("main", "update"): ("put", f"/api/main/{account}/", data),
+            ("main", "partial_update"): ("patch", f"/api/main/{account}/", {"phone": "1"}),
+            ("main", "destroy"): ("delete", f"/api/main/{other}/", None),
+            ("main", "export"): ("get", f"/api/main/export/?object_id={object_id}", None),
+            ("main", "bulk"): ("post", "/api/main/bulk/", {"object_id": object_id, "data": [data] * n}),
+            ("main", "bulk_partial_update"): (
+                "patch", "/api/main/bulk/", {"patches": [{"id": pk, "data": {"phone": "2"}} for pk in accounts]},
+            ),
+            ("main", "bulk_delete"): ("post", "/api/main/bulk-delete/", {"ids": accounts}),
+            ("main", "bulk_restore"): ("post", "/api/main/bulk-restore/", {"object_id": object_id}),
+        }
+        resources = {
+            "object": (obj, {"name": "budget"}),
+            "objectfield": (field, {"name": "budget", "object": object_id}),
+            "pagelist": (page_list, {"name": "budget"}),
+            "pagelistfield": (
+                list_field, {"name": "budget", "object_field": str(field.id), "page_list": str(page_list.id)},
+            ),
+            "pagelayout": (page_layout, {"name": "budget", "page_list": str(page_list.id)}),
+            "pagelayoutfield": (
+                layout_field, {"name": "budget", "object_field": str(field.id), "page_layout": str(page_layout.id)},
+            ),
+            "account": (Account.objects.get(id=account), {"object": object_id, "data": data}),
+        }
+        for basename, (instance, body) in resources.items():
+            prefix = self.prefixes[basename]
+            detail = f"/api/{prefix}/{instance.pk}/"
+            requests.update({
+                (basename, "list"): ("get", f"/api/{prefix}/", None),
+                (basename, "retrieve"): ("get", detail, None),
+                (basename, "create"): ("post", f"/api/{prefix}/", body),
+                (basename, "update"): ("put", detail, body),
+                (basename, "partial_update"): ("patch", detail, {"name": "budget2"} if "name" in body else body),
+                (basename, "destroy"): ("delete", detail, None),
+            })
+        return requests
+
+    def setUp(self):
+        from account.urls import router
+
+        self.prefixes = {basename: prefix for prefix, viewset, basename in router.registry}
+        self.actions = set()
+        for prefix, viewset, basename in router.registry:
+            names = {"list", "retrieve", "create", "update", "partial_update", "destroy"}
+            for extra in viewset.get_extra_actions():
+                names.update(extra.mapping.values())
+            self.actions.update((basename, name) for name in names)
+
+    def count_queries(self, n):
+        """在回滚的事务中按规模 n 造数，逐个动作在冷缓存下统计查询数"""
+        counts = {}
+        with transaction.atomic():
+            obj, page_list, page_layout = create_scaled_metadata(n)
+            requests = self.build_requests(n, obj, page_list, page_layout)
+            for key, (method, path, body) in requests.items():
+                # 每个动作在独立的保存点中执行，互不影响
+                with transaction.atomic():
+                    cache.clear()
+                    with CaptureQueriesContext(connection) as ctx:
+                        kwargs = {} if body is None else {"data": json.dumps(body), "content_type": "application/json"}
+                        response = getattr(self.client, method)(path, **kwargs)
+                        if response.streaming:
+                            b"".join(response.streaming_content)
+                    self.assertLess(response.status_code, 400, f"{key}: {response.status_code}")
+                    counts[key] = len(ctx.captured_queries)
+                    transaction.set_rollback(True)
+            transaction.set_rollback(True)
+        return counts
+
+    def test_every_action_has_budget(self):
+        self.assertEqual(set(self.BUDGETS), self.actions)
+
+    def test_query_counts_are_constant_and_within_budget(self):
+        small, large = (self.count_queries(n) for n in self.SCALES)
+        for key, budget in self.BUDGETS.items():
+            with self.subTest(action=key):
+                if key not in self.CASCADE_DELETES:
+                    self.assertEqual(large[key], small[key], f"{key} 的查询数随数据规模增长")
+                self.assertLessEqual(large[key], budget)
+
+
+class TestRequestTiming(TestCase):
+    def setUp(self):
+        self.object1, self.page_list1 = create_sample_metadata(account_count=3)
+
+    def test_disabled_by_default(self):
+        response = self.client.get(f"/api/main/?object_id={self.object1.id}")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("Server-Timing", response)
+
+    @override_settings(REQUEST_TIMING_ENABLED=True)
+    def test_list_emits_server_timing_and_log(self):
+        with self.assertLogs("account.timing", level="INFO") as logs:
+            response = self.client.get(f"/api/main/?object_id={self.object1.id}")
+        self.assertEqual(response.status_code, 200)
+        metrics = {item.split(";")[0] for item in response["Server-Timing"].split(", ")}
+        self.assertEqual(metrics, {"total", "db", "metadata", "query", "paginate", "render"})
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record["path"], "/api/main/")
+        self.assertEqual(record["status"], 200)
+        # 冷缓存：字段映射 3 条 + 账户计数 + 分页查询
+        self.assertEqual(record["db_queries"], 5)
+        self.assertEqual(set(record["spans"]), {"metadata", "query", "paginate", "render"})
+
+    @override_settings(REQUEST_TIMING_ENABLED=True, REQUEST_TIMING_HEADER=False)
+    def test_retrieve_spans_without_header(self):
+        account = Account.objects.filter(object=self.object1).first()
+        with self.assertLogs("account.timing", level="INFO") as logs:
+            response = self.client.get(f"/api/main/{account.id}/?pagelist_id={self.page_list1.id}")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("Server-Timing", response)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(set(record["spans"]), {"metadata", "query", "render"})
+
+
+class TestMetrics(TestCase):
+    def setUp(self):
+        self.object1, self.page_list1 = create_sample_metadata(account_count=2)
+        registry.counters.clear()
+        registry.histograms.clear()
+
+    def key(self, name, **labels):
+        return name, tuple(sorted(labels.items()))
+
+    def test_records_requests_per_route_and_action(self):
+        self.client.get(f"/api/main/?object_id={self.object1.id}")
+        self.client.get(f"/api/main/?object_id={self.object1.id}")
+        self.client.get("/api/main/")
+        self.client.get("/api/objects/")
+
+        counters, histograms = registry.collect()
+        requests = "crm_http_requests_total"
+        self.assertEqual(counters[self.key(requests, route="main", action="list", method="GET", status="200")], 2)
+        self.assertEqual(counters[self.key(requests, route="main", action="list", method="GET", status="400")], 1)
+        self.assertEqual(counters[self.key(requests, route="object", action="list", method="GET", status="200")], 1)
+        duration = histograms[self.key("crm_http_request_duration_seconds", route="main", action="list")]
+        self.assertEqual(duration[2], 3)
+        # 第二次列表请求命中字段映射缓存
+        hit = self.key(
+            "crm_metadata_cache_requests_total", route="main", action="list", namespace="field_map", result="hit"
+        )
+        self.assertGreaterEqual(counters[hit], 1)
+
+        with override_settings(METRICS_TOKEN="secret"):
+            body = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer secret").content.decode()
+        self.assertIn("# TYPE crm_http_request_duration_seconds histogram", body)
+        self.assertIn('crm_http_request_duration_seconds_bucket{action="list",route="main",le="+Inf"} 3', body)
+        self.assertIn('crm_metadata_cache_hit_ratio{namespace="field_map"}', body)
+
+    def test_aggregates_worker_files(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        other = {
+            "pid": 1,
+            "counters": [["crm_db_queries_total", [["action", "list"], ["route", "main"]], 7]],
+            "histograms": [],
+        }
+        with open(os.path.join(tmpdir.name, "metrics-1.json"), "w", encoding="utf-8") as handle:
+            json.dump(other, handle)
+        with override_settings(METRICS_DIR=tmpdir.name):
+            registry.inc("crm_db_queries_total", {"route": "main", "action": "list"}, 3)
+            counters, _ = registry.collect()
+            self.assertTrue(os.path.exists(os.path.join(tmpdir.name, f"metrics-{os.getpid()}.json")))
+        self.assertEqual(counters[self.key("crm_db_queries_total", route="main", action="list")], 10)
+
+    def test_merges_dead_and_skips_stale_worker_files(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        # 已退出进程的 pid
+        process = subprocess.Popen(["true"])
+        process.wait()
+        labels = [["action", "list"], ["route", "main"]]
+        snapshot = {
+            "counters": [
+                ["crm_db_pool_connections", [["alias", "default"], ["state", "idle"]], 5],
+                ["crm_http_request_errors_total", labels, 4],
+            ],
+            "histograms": [["crm_http_request_duration_seconds", labels, [1] + [0] * 10, 0.001, 1]],
+        }
+        for pid in (process.pid, 1):
+            with open(os.path.join(tmpdir.name, f"metrics-{pid}.json"), "w", encoding="utf-8") as handle:
+                json.dump({"pid": pid, **snapshot}, handle)
+        stale = time.time() - 3600
+        os.utime(os.path.join(tmpdir.name, "metrics-1.json"), (stale, stale))
+
+        errors = self.key("crm_http_request_errors_total", route="main", action="list")
+        duration = self.key("crm_http_request_duration_seconds", route="main", action="list")
+        with override_settings(METRICS_DIR=tmpdir.name, METRICS_STALE_SECONDS=300):
+            for _ in range(2):
+                counters, histograms = registry.collect()
+                # 已退出 worker 的计数器与直方图并入汇总文件（只合并一次），gauge 丢弃
+                self.assertNotIn(self.key("crm_db_pool_connections", alias="default", state="idle"), counters)
+                self.assertEqual(counters[errors], 4)
+                self.assertEqual(histograms[duration][2], 1)
+        self.assertFalse(os.path.exists(os.path.join(tmpdir.name, f"metrics-{process.pid}.json")))
+        self.assertTrue(os.path.exists(os.path.join(tmpdir.name, "aggregate.json")))
+        self.assertTrue(os.path.exists(os.path.join(tmpdir.name, "metrics-1.json")))
+
+    def test_endpoints_require_staff_or_token(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        self.assertEqual(self.client.get("/api/cache-stats/").status_code, 403)
+        with override_settings(METRICS_TOKEN="secret"):
+            self.assertEqual(self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer wrong").status_code, 403)
+            self.assertEqual(self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer secret").status_code, 200)
+        staff = User.objects.create_user("ops", password="pw", is_staff=True)
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get("/api/cache-stats/").status_code, 200)
+
+
+class TestProfiling(TestCase):
+    def setUp(self):
+        self.object1, self.page_list1 = create_sample_metadata(account_count=2)
+        self.url = f"/api/main/?object_id={self.object1.id}&profile=1"
+
+    @override_settings(PROFILE_QUERY_ENABLED=True)
+    def test_profile_param_for_staff_only(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response["Content-Type"], "application/json")
+
+        staff = User.objects.create_user("staff", password="x", is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(self.url)
+        self.assertEqual(response["X-Profile-Status"], "200")
+        self.assertIn("function calls", response.content.decode())
+
+    @override_settings(PROFILE_QUERY_ENABLED=False)
+    def test_profile_param_disabled(self):
+        staff = User.objects.create_user("staff", password="x", is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(self.url)
+        self.assertEqual(response["Content-Type"], "application/json")
+
+    def test_sampler_writes_folded_stacks(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        sampler = RequestSampler(2, re.compile(r"^/api/main/"), 0.001, tmpdir.name)
+        self.assertEqual(
+            [sampler.should_sample(path) for path in ("/api/main/", "/api/main/", "/api/objects/", "/api/main/")],
+            [True, False, False, True],
+        )
+
+        def slow():
+            time.sleep(0.05)
+            return "ok"
+
+        self.assertEqual(sampler.sample(slow, "GET /api/main/"), "ok")
+        stacks = read_folded(tmpdir.name)
+        self.assertTrue(stacks)
+        stack = max(stacks, key=stacks.get)
+        self.assertTrue(stack.startswith("GET_/api/main/;"))
+        self.assertIn("slow", stack)
+
+        output = os.path.join(tmpdir.name, "merged.txt")
+        call_command("merge_profiles", "--dir", tmpdir.name, "--output", output, stdout=io.StringIO())
+        with open(output, encoding="utf-8") as handle:
+            self.assertEqual(sum(int(line.rsplit(" ", 1)[1]) for line in handle), sum(stacks.values()))
+
+
+class TestSlowQueryLog(TestCase):
+    def setUp(self):
+        self.object1, self.page_list1 = create_sample_metadata(account_count=2)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def test_normalize_sql(self):
+        self.assertEqual(
+            normalize_sql('SELECT "a"."id" FROM "a" WHERE "a"."id" IN (%s, %s, %s) AND x = 5 AND y = \'z\''),
+            "SELECT a.id FROM a WHERE a.id IN (...) AND x = ? AND y = ?",
+        )
+        self.assertEqual(fingerprint("SELECT 1 WHERE id IN (%s)"), fingerprint("SELECT 2  WHERE id IN (%s, %s)"))
+
+    def slow_log(self, **options):
+        return override_settings(
+            SLOW_QUERY_MS=0, SLOW_QUERY_DIR=self.tmpdir.name, ACCOUNT_LIST_CACHE_TIMEOUT=0, **options
+        )
+
+    def page_entries(self):
+        return [e for e in read_entries(self.tmpdir.name) if e["normalized"].startswith("SELECT t_account.id")]
+
+    def test_logs_slow_queries_with_route_and_plan(self):
+        with self.slow_log(SLOW_QUERY_EXPLAIN=True):
+            self.client.get(f"/api/main/?object_id={self.object1.id}")
+            self.client.get(f"/api/main/?object_id={self.object1.id}")
+            flush_pending()
+        groups = {group["normalized"]: group for group in aggregate(read_entries(self.tmpdir.name))}
+        page_query = next(group for sql, group in groups.items() if sql.startswith("SELECT t_account.id"))
+        self.assertEqual(page_query["count"], 2)
+        self.assertEqual(page_query["routes"], {"main.list": 2})
+        self.assertTrue(page_query["plan"])
+
+        output = io.StringIO()
+        call_command("slow_query_report", "--dir", self.tmpdir.name, "--plans", stdout=output)
+        self.assertIn("main.list×2", output.getvalue())
+        self.assertIn("执行计划", output.getvalue())
+
+    def test_dedups_by_fingerprint_at_write_time(self):
+        with self.slow_log(SLOW_QUERY_DEDUP_SECONDS=60):
+            for _ in range(3):
+                self.client.get(f"/api/main/?object_id={self.object1.id}")
+            self.assertEqual(len(self.page_entries()), 1)
+            flush_pending()
+        entries = self.page_entries()
+        self.assertEqual([e["count"] for e in entries], [1, 2])
+        self.assertEqual(sum(g["count"] for g in aggregate(entries)), 3)
+
+    def test_params_are_opt_in_and_redacted(self):
+        url = f"/api/main/?object_id={self.object1.id}&search=Dr.%20test0"
+        with self.slow_log(SLOW_QUERY_DEDUP_SECONDS=0):
+            self.client.get(url)
+        self.assertEqual({e["params"] for e in self.page_entries()}, {None})
+
+        with self.slow_log(SLOW_QUERY_DEDUP_SECONDS=0, SLOW_QUERY_PARAMS=True):
+            self.client.get(url + "&sort_order=asc")
+        params = [e["params"] for e in read_entries(self.tmpdir.name) if e["params"]]
+        self.assertTrue(params)
+        self.assertFalse(any("test0" in p for p in params))
+
+    def test_param_values_are_opt_in(self):
+        url = f"/api/main/?object_id={self.object1.id}&search=Dr.%20test0"
+        with self.slow_log(SLOW_QUERY_DEDUP_SECONDS=0, SLOW_QUERY_PARAMS=True, SLOW_QUERY_PARAM_VALUES=True):
+            self.client.get(url)
+        params = [e["params"] for e in read_entries(self.tmpdir.name) if e["params"]]
+        self.assertTrue(any("test0" in p for p in params))
+
+    def test_rotates_at_size_cap(self):
+        with self.slow_log(SLOW_QUERY_DEDUP_SECONDS=0, SLOW_QUERY_MAX_BYTES=2000):
+            for _ in range(3):
+                self.client.get(f"/api/main/?object_id={self.object1.id}")
+        for name in os.listdir(self.tmpdir.name):
+            self.assertLessEqual(os.path.getsize(os.path.join(self.tmpdir.name, name)), 2000)
+        self.assertIn(f"slow-queries-{os.getpid()}.1.jsonl", os.listdir(self.tmpdir.name))
+
+    def test_disabled(self):
+        with override_settings(SLOW_QUERY_MS=-1, SLOW_QUERY_DIR=self.tmpdir.name):
+            self.client.get(f"/api/main/?object_id={self.object1.id}")
+        self.assertEqual(list(read_entries(self.tmpdir.name)), [])
+
+
+class TestConditionalGet(TestCase):
+    def setUp(self):
+        self.object1, self.page_list1 = create_sample_metadata(account_count=3)
+        self.list_url = f"/api/main/?object_id={self.object1.id}"
+        self.account = Account.objects.filter(object=self.object1).first()
+        self.detail_url = f"/api/main/{self.account.id}/?pagelist_id={self.page_list1.id}"
+
+    def test_list_not_modified_until_accounts_change(self):
+        response = self.client.get(self.list_url)
+        etag = response["ETag"]
+        self.assertTrue(response.has_header("Last-Modified"))
+
+        get_field_map(self.object1.id)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(response.content, b"")
+
+        # 查询参数不同则 ETag 不同
+        self.assertNotEqual(self.client.get(self.list_url + "&page_size=2")["ETag"], etag)
+
+        self.client.patch(
+            f"/api/main/{self.account.id}/", json.dumps({"phone": "1"}), content_type="application/json"
+        )
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_list_etag_changes_with_metadata(self):
+        etag = self.client.get(self.list_url)["ETag"]
+        field = PageListField.objects.filter(page_list=self.page_list1).first()
+        field.hidden = "1"
+        field.save()
+        self.assertEqual(self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_detail_not_modified(self):
+        response = self.client.get(self.detail_url)
+        etag = response["ETag"]
+        get_page_layout(self.page_list1.id)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get(self.detail_url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(response.status_code, 304)
+
+        self.client.put(
+            f"/api/main/{self.account.id}/", json.dumps({"phone": "2"}), content_type="application/json"
+        )
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["account_data"]["phone"], "2")
+
+
+class TestListResponseCache(TestCase):
+    def setUp(self):
+        self.object1, self.page_list1 = create_sample_metadata(account_count=3)
+        self.url = f"/api/main/?object_id={self.object1.id}"
+
+    def test_repeated_list_served_from_cache(self):
+        first = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second["ETag"], first["ETag"])
+        # 不同页大小是不同的缓存条目
+        self.assertEqual(len(self.client.get(self.url + "&page_size=1").json()["results"]), 1)
+
+    def test_invalidated_by_account_and_metadata_changes(self):
+        self.client.get(self.url)
+        account = Account.objects.filter(object=self.object1).first()
+        self.client.patch(f"/api/main/{account.id}/", json.dumps({"account_name": "Dr. zzz"}),
+                          content_type="application/json")
+        names = [row["account_name"] for row in self.client.get(self.url).json()["results"]]
+        self.assertIn("Dr. zzz", names)
+
+        account.delete()
+        self.assertEqual(self.client.get(self.url).json()["count"], 2)
+
+        field = PageListField.objects.get(page_list=self.page_list1, name="hospital")
+        field.name = "医院名称"
+        field.save()
+        row = self.client.get(self.url).json()["results"][0]
+        self.assertIn("医院名称", row)
+        self.assertNotIn("hospital", row)
+
+    def test_dashless_object_id_shares_version(self):
+        url = f"/api/main/?object_id={self.object1.id.hex}"
+        self.assertEqual(self.client.get(url).json()["count"], 3)
+        Account.objects.create(object=self.object1, data={"account_name": "Dr. new"})
+        self.assertEqual(self.client.get(url).json()["count"], 4)
+
+    def test_concurrent_misses_build_once(self):
+        calls = []
+        results = []
+
+        def builder():
+            calls.append(1)
+            time.sleep(0.2)
+            return b"payload"
+
+        def worker():
+            results.append(cached_list_content(self.object1.id, "etag", "http://testserver/x", builder))
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [b"payload"] * 4)
+
+
+class TestAccountCounts(TestCase):
+    def setUp(self):
+        self.object1, self.page_list1 = create_sample_metadata(account_count=3)
+        self.url = f"/api/main/?object_id={self.object1.id}"
+
+    def stored_count(self):
+        return AccountCount.objects.get(object=self.object1).count
+
+    def test_counter_follows_writes(self):
+        self.assertEqual(self.stored_count(), 3)
+        self.client.post("/api/main/", json.dumps({"object_id": str(self.object1.id), "data": {"account_name": "Dr. a"}}),
+                         content_type="application/json")
+        self.client.post("/api/main/bulk/", json.dumps({"object_id": str(self.object1.id), "data": [{"account_name": "Dr. b"}] * 2}),
+                         content_type="application/json")
+        self.assertEqual(self.stored_count(), 6)
+
+        ids = [str(pk) for pk in Account.objects.filter(object=self.object1).values_list("id", flat=True)[:2]]
+        self.client.post("/api/main/bulk-delete/", json.dumps({"ids": ids}), content_type="application/json")
+        # 包含已删除账户的重复请求不重复扣减
+        self.client.post("/api/main/bulk-delete/", json.dumps({"ids": ids}), content_type="application/json")
+        self.assertEqual(self.stored_count(), 4)
+        self.client.post("/api/main/bulk-restore/", json.dumps({"ids": ids[:1]}), content_type="application/json")
+        self.assertEqual(self.stored_count(), 5)
+
+        account = Account.objects.get(id=ids[1])
+        account.deleted = "0"
+        account.save()
+        Account.objects.filter(object=self.object1, deleted="0").first().delete()
+        self.assertEqual(self.stored_count(), 5)
+        self.assertEqual(self.stored_count(), Account.objects.filter(object=self.object1, deleted="0").count())
+
+    def test_list_reads_counter_instead_of_count(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.json()["count"], 3)
+        self.assertEqual(response.json()["count_mode"], "exact")
+        self.assertFalse([q for q in queries if "COUNT(" in q["sql"] and "t_account_count" not in q["sql"]])
+
+        # 计数行丢失时统计一次并补写
+        AccountCount.objects.filter(object=self.object1).delete()
+        Account.objects.create(object=self.object1, data={"account_name": "Dr. new"})
+        self.assertEqual(self.client.get(self.url).json()["count"], 4)
+        self.assertEqual(self.stored_count(), 4)
+
+    def test_write_during_recount_is_not_lost(self):
+        AccountCount.objects.filter(object=self.object1).delete()
+        count = QuerySet.count
+
+        def count_then_write(queryset):
+            # 统计完成、写入结果之前另一个请求新增账户
+            result = count(queryset)
+            Account.objects.create(object=self.object1, data={"account_name": "Dr. late"})
+            return result
+
+        with mock.patch.object(QuerySet, "count", count_then_write):
+            self.assertEqual(object_count(self.object1.id), 3)
+        # 过时的统计结果未写入，下次读取重新统计
+        self.assertFalse(AccountCount.objects.filter(object=self.object1).exists())
+        self.assertEqual(object_count(self.object1.id), 4)
+        self.assertEqual(self.stored_count(), 4)
+
+    def test_rebuild_command_fixes_drift(self):
+        AccountCount.objects.filter(object=self.object1).update(count=99)
+        out = io.StringIO()
+        call_command("account_counts", stdout=out)
+        self.assertIn("99 -> 3", out.getvalue())
+        self.assertEqual(self.stored_count(), 3)
+
+    def test_search_count_cached_and_approximate(self):
+        url = self.url + "&search=Dr&page_size=1"
+        self.assertEqual(self.client.get(url).json()["count"], 3)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url + "&page=2")
+        self.assertEqual(response.json()["count"], 3)
+        self.assertFalse([q for q in queries if "COUNT(" in q["sql"]])
+
+        # 估算值只在有界统计达到上限时使用，窄搜索仍返回精确值
+        with mock.patch("account.counts.estimate_count", return_value=250000):
+            data = self.client.get(self.url + "&search=Dr. test").json()
+        self.assertEqual((data["count"], data["count_mode"]), (3, "exact"))
+        with override_settings(ACCOUNT_COUNT_APPROX_THRESHOLD=2), \
+                mock.patch("account.counts.estimate_count", return_value=250000):
+            data = self.client.get(self.url + "&search=Dr. t").json()
+            self.assertEqual((data["count"], data["count_mode"]), (250000, "approximate"))
+            data = self.client.get(self.url + "&search=Dr. test1").json()
+            self.assertEqual((data["count"], data["count_mode"]), (1, "exact"))
+        with override_settings(ACCOUNT_COUNT_APPROX_THRESHOLD=2), \
+                mock.patch("account.counts.estimate_count", return_value=None):
+            data = self.client.get(self.url + "&search=Dr. te").json()
+        self.assertEqual((data["count"], data["count_mode"]), (3, "approximate"))
+        with override_settings(ACCOUNT_COUNT_APPROX_THRESHOLD=0), \
+                mock.patch("account.counts.estimate_count", return_value=250000):
+            data = self.client.get(self.url + "&search=hospital").json()
+        self.assertEqual(data["count_mode"], "exact")
+
+
+class TestAsyncViews(TestCase):
+    def setUp(self):
+        self.object1, self.page_list1 = create_sample_metadata(account_count=3)
+        self.account = Account.objects.filter(object=self.object1).first()
+
+    async def test_list_matches_sync_view(self):
+        query = f"?object_id={self.object1.id}&sort_field=hospital&sort_order=desc&page_size=2&page=2"
+        expected = (await sync_to_async(self.client.get)(f"/api/main/{query}")).json()
+        response = await self.async_client.get(f"/api/async/main/{query}")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["results"], expected["results"])
+        self.assertEqual((data["count"], data["count_mode"]), (3, "exact"))
+        self.assertIsNone(data["next"])
+        self.assertIn("/api/async/main/", data["previous"])
+
+        response = await self.async_client.get(f"/api/async/main/{query}", headers={"if-none-match": response["ETag"]})
+        self.assertEqual(response.status_code, 304)
+        response = await self.async_client.get(f"/api/async/main/?object_id={self.object1.id}&page=9")
+        self.assertEqual(response.status_code, 404)
+        response = await self.async_client.get("/api/async/main/")
+        self.assertEqual(response.status_code, 400)
+
+    async def test_list_search_and_response_cache(self):
+        url = f"/api/async/main/?object_id={self.object1.id}&search=Dr"
+        first = await self.async_client.get(url)
+        self.assertEqual(first.json()["count"], 3)
+        second = await self.async_client.get(url)
+        self.assertEqual(second.content, first.content)
+        with override_settings(ACCOUNT_LIST_CACHE_TIMEOUT=0):
+            uncached = await self.async_client.get(url)
+        self.assertEqual(uncached.json()["results"], first.json()["results"])
+
+    async def test_detail_matches_sync_view(self):
+        suffix = f"{self.account.id}/?pagelist_id={self.page_list1.id}"
+        expected = await sync_to_async(self.client.get)(f"/api/main/{suffix}")
+        response = await self.async_client.get(f"/api/async/main/{suffix}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), expected.json())
+        self.assertEqual(response["ETag"], expected["ETag"])
+
+        response = await self.async_client.get(f"/api/async/main/{suffix}", headers={"if-none-match": response["ETag"]})
+        self.assertEqual(response.status_code, 304)
+        response = await self.async_client.get(f"/api/async/main/{uuid.uuid4()}/?pagelist_id={self.page_list1.id}")
+        self.assertEqual(response.status_code, 404)
+        response = await self.async_client.post(f"/api/async/main/{suffix}")
+        self.assertEqual(response.status_code, 405)
+
+    @override_settings(REQUEST_TIMING_ENABLED=True, SLOW_QUERY_MS=-1)
+    async def test_async_middleware_counts_queries(self):
+        with self.assertLogs("account.timing", level="INFO") as logs:
+            response = await self.async_client.get(f"/api/async/main/?object_id={self.object1.id}")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Server-Timing", response)
+        record = json.loads(logs.records[0].getMessage())
+        # 经 sync_to_async 在线程中执行的查询同样计入
+        self.assertGreater(record["db_queries"], 0)
+        self.assertEqual(set(record["spans"]), {"metadata", "query", "paginate", "render"})
+
+
+class TestBenchmarkAsync(TransactionTestCase):
+    def test_command_compares_sync_and_async(self):
+        out = io.StringIO()
+        call_command(
+            "benchmark_async", accounts=30, requests=6, concurrency=2, workers=1, stdout=out, stderr=io.StringIO()
+        )
+        results = json.loads(out.getvalue())
+        self.assertEqual(set(results["scenarios"]), {"list", "retrieve"})
+        for result in results["scenarios"].values():
+            self.assertEqual(result["sync"]["requests"], 6)
+            self.assertEqual(result["async"]["status"], [200])
+            self.assertGreater(result["speedup"], 0)
+        # 临时数据集在结束后删除
+        self.assertFalse(Object.objects.exists())
+
+
+class FakeConnection:
+    def __init__(self, n):
+        self.n = n
+        self.alive = True
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class TestConnectionPool(TestCase):
+    def make_pool(self, **kwargs):
+        self.opened = []
+
+        def connect():
+            conn = FakeConnection(len(self.opened))
+            self.opened.append(conn)
+            return conn
+
+        def ping(conn):
+            if not conn.alive:
+                raise OSError("gone")
+
+        self.connect = connect
+        options = {"max_size": 2, "timeout": 0.2, "ping_interval": 0}
+        options.update(kwargs)
+        return ConnectionPool(close=lambda conn: conn.close(), ping=ping, **options)
+
+    def test_reuses_released_connections(self):
+        pool = self.make_pool()
+        conn, created = pool.acquire(self.connect)
+        self.assertTrue(created)
+        pool.release(conn)
+        again, created = pool.acquire(self.connect)
+        self.assertIs(again, conn)
+        self.assertFalse(created)
+        stats = pool.stats()
+        self.assertEqual((stats["checkouts"], stats["created"], stats["in_use"]), (2, 1, 1))
+
+    def test_waits_then_times_out_at_max_size(self):
+        pool = self.make_pool()
+        first, _ = pool.acquire(self.connect)
+        pool.acquire(self.connect)
+        threading.Timer(0.05, pool.release, args=(first,)).start()
+        conn, created = pool.acquire(self.connect)
+        self.assertIs(conn, first)
+        with self.assertRaises(PoolTimeout):
+            pool.acquire(self.connect)
+        stats = pool.stats()
+        self.assertEqual((stats["waits"], stats["timeouts"], stats["created"]), (2, 1, 2))
+        self.assertGreater(stats["wait_seconds"], 0)
+
+    def test_pre_ping_replaces_dead_connection(self):
+        pool = self.make_pool()
+        conn, _ = pool.acquire(self.connect)
+        pool.release(conn)
+        conn.alive = False
+        fresh, created = pool.acquire(self.connect)
+        self.assertIsNot(fresh, conn)
+        self.assertTrue(created)
+        self.assertTrue(conn.closed)
+        stats = pool.stats()
+        self.assertEqual((stats["ping_failures"], stats["size"]), (1, 1))
+
+    def test_idle_timeout_keeps_min_size(self):
+        pool = self.make_pool(min_size=1, max_size=3, idle_timeout=0)
+        pool.fill(self.connect)
+        self.assertEqual(pool.stats()["idle"], 1)
+        conns = [pool.acquire(self.connect)[0] for _ in range(3)]
+        for conn in conns:
+            pool.release(conn)
+        time.sleep(0.01)
+        pool.release(pool.acquire(self.connect)[0])
+        self.assertEqual(pool.stats()["size"], 1)
+        self.assertEqual(sum(conn.closed for conn in conns), 2)
+
+    def test_release_discard_closes(self):
+        pool = self.make_pool()
+        conn, _ = pool.acquire(self.connect)
+        pool.release(conn, discard=True)
+        self.assertTrue(conn.closed)
+        self.assertEqual(pool.stats()["size"], 0)
+
+    def test_backend_must_implement_ping(self):
+        class DatabaseWrapper(PooledDatabaseWrapperMixin, sqlite3_base.DatabaseWrapper):
+            pass
+
+        with self.assertRaises(TypeError):
+            DatabaseWrapper({"ENGINE": "account.backends.sqlite3", "NAME": ":memory:"}, "default")
+
+
+class TestPooledBackend(TestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.connections = ConnectionHandler(
+            {
+                "default": {
+                    "ENGINE": "account.backends.sqlite3",
+                    "NAME": os.path.join(tmpdir.name, "pool.sqlite3"),
+                    "POOL": {"MAX_SIZE": 1, "TIMEOUT": 0.1, "PING_INTERVAL": 0},
+                }
+            }
+        )
+        self.db = self.connections["default"]
+        self.addCleanup(self.connections.close_all)
+        self.addCleanup(self.close_pool)
+
+    def close_pool(self):
+        pool = getattr(self.db, "_pool", None) or self.pool
+        pool.close()
+
+    def test_close_returns_connection_to_pool(self):
+        with self.db.cursor() as cursor:
+            cursor.execute("CREATE TABLE t (id integer)")
+        raw = self.db.connection
+        self.pool = self.db._pool
+        self.db.close()
+        self.assertIsNone(self.db.connection)
+        with self.db.cursor() as cursor:
+            cursor.execute("SELECT count(*) FROM t")
+        self.assertIs(self.db.connection, raw)
+        stats = self.pool.stats()
+        self.assertEqual((stats["checkouts"], stats["created"], stats["ping_failures"]), (2, 1, 0))
+        names = {name for name, labels, _ in registry.snapshot()["counters"] if ["alias", "default"] in labels}
+        self.assertIn("crm_db_pool_checkouts_total", names)
+        self.assertIn("crm_db_pool_connections", names)
+
+    def test_open_transaction_is_rolled_back_on_release(self):
+        with self.db.cursor() as cursor:
+            cursor.execute("CREATE TABLE t (id integer)")
+        self.pool = self.db._pool
+        self.db.set_autocommit(False)
+        with self.db.cursor() as cursor:
+            cursor.execute("INSERT INTO t VALUES (1)")
+        self.db.close()
+        with self.db.cursor() as cursor:
+            cursor.execute("SELECT count(*) FROM t")
+            self.assertEqual(cursor.fetchone()[0], 0)
+        self.assertTrue(self.db.get_autocommit())
+
+    def test_checkout_timeout_raises_operational_error(self):
+        self.db.ensure_connection()
+        self.pool = self.db._pool
+        other = ConnectionHandler({"default": self.db.settings_dict})["default"]
+        with self.assertRaises(OperationalError):
+            other.ensure_connection()
+        self.assertEqual(self.pool.stats()["timeouts"], 1)
+
+
+class ExtraDatabaseTestCase(TestCase):
+    """测试期间加入 extra_databases 中的 SQLite 数据库（临时文件，已执行迁移）"""
+
+    extra_databases = ()
+    # 额外的别名在 setUpClass 中才加入，测试运行器收集数据库时尚不存在
+    databases = "__all__"
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        for alias in cls.extra_databases:
+            connections.settings[alias] = connections.configure_settings(
+                {
+                    "default": connections.settings["default"],
+                    alias: {"ENGINE": "django.db.backends.sqlite3", "NAME": os.path.join(cls.tmpdir.name, f"{alias}.sqlite3")},
+                }
+            )[alias]
+            call_command("migrate", database=alias, verbosity=0)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        for alias in cls.extra_databases:
+            connections[alias].close()
+            del connections[alias]
+            del connections.settings[alias]
+        cls.tmpdir.cleanup()
+
+
+@override_settings(DATABASE_REPLICAS={"replica": 1}, DB_PRIMARY_PIN_SECONDS=5, ACCOUNT_LIST_CACHE_TIMEOUT=0)
+class TestReplicaRouting(ExtraDatabaseTestCase):
+    """第二个 SQLite 数据库作为副本：复制主库数据后只改主库，副本即为“尚未同步”的状态"""
+
+    extra_databases = ("replica",)
+
+    def setUp(self):
+        self.object1, _ = create_sample_metadata(account_count=2)
+        for model in apps.get_app_config("account").get_models():
+            model.objects.using("replica").bulk_create(list(model.objects.all()))
+        self.account1 = Account.objects.get(object=self.object1, data__account_name="Dr. test0")
+        self.account1.data["account_name"] = "Dr. primary"
+        self.account1.save()
+
+    def names(self, response):
+        self.assertEqual(response.status_code, 200)
+        return {row["account_name"] for row in response.json()["results"]}
+
+    def test_reads_go_to_replica(self):
+        with CaptureQueriesContext(connections["replica"]) as replica:
+            response = self.client.get(f"/api/main/?object_id={self.object1.id}")
+        self.assertIn("Dr. test0", self.names(response))
+        self.assertGreater(len(replica.captured_queries), 0)
+
+    def test_benchmark_counts_queries_on_every_alias(self):
+        scenario = Scenario("list", "get", "/api/main/", {"object_id": str(self.object1.id)})
+        scenario.request(self.client, 0)
+        with CaptureQueriesContext(connection) as primary, CaptureQueriesContext(connections["replica"]) as replica:
+            scenario.request(self.client, 0)
+        self.assertGreater(len(replica.captured_queries), 0)
+        result = run_scenario(self.client, scenario, repeat=1)
+        self.assertEqual(result["queries"], len(primary.captured_queries) + len(replica.captured_queries))
+
+    def test_write_pins_client_to_primary(self):
+        response = self.client.patch(
+            f"/api/main/{self.account1.id}/", {"hospital": "新医院"}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(PIN_HEADER, response)
+        self.assertIn(PIN_COOKIE, response.cookies)
+        # 浏览器带回 Cookie
+        self.assertIn("Dr. primary", self.names(self.client.get(f"/api/main/?object_id={self.object1.id}")))
+        # 其他客户端在请求头中带回截止时间
+        other = self.client_class(headers={PIN_HEADER: response[PIN_HEADER]})
+        self.assertIn("Dr. primary", self.names(other.get(f"/api/main/?object_id={self.object1.id}")))
+        # 截止时间已过则恢复读副本
+        expired = self.client_class(headers={PIN_HEADER: str(time.time() - 1)})
+        self.assertIn("Dr. test0", self.names(expired.get(f"/api/main/?object_id={self.object1.id}")))
+
+    def test_zero_weight_replica_is_skipped(self):
+        with override_settings(DATABASE_REPLICAS={"replica": 0, "missing": 5}):
+            self.assertIsNone(choose_replica())
+            response = self.client.get(f"/api/main/?object_id={self.object1.id}")
+        self.assertIn("Dr. primary", self.names(response))
+
+    def test_cache_rebuilt_from_primary_right_after_write(self):
+        # 写入刚使缓存失效时从主库重建，旧数据不会以新代数写入缓存
+        with override_settings(ACCOUNT_LIST_CACHE_TIMEOUT=300):
+            self.assertIn("Dr. primary", self.names(self.client.get(f"/api/main/?object_id={self.object1.id}")))
+            with override_settings(DB_PRIMARY_PIN_SECONDS=0):
+                self.account1.save()
+                self.assertIn("Dr. test0", self.names(self.client.get(f"/api/main/?object_id={self.object1.id}")))
+
+
+@override_settings(DATABASE_SHARDS=["shard1"], ACCOUNT_LIST_CACHE_TIMEOUT=0)
+class TestSharding(ExtraDatabaseTestCase):
+    extra_databases = ("shard1",)
+
+    def setUp(self):
+        self.object1, self.page_list1 = create_sample_metadata(account_count=3)
+
+    def list_names(self, object_id):
+        response = self.client.get(f"/api/main/?object_id={object_id}")
+        self.assertEqual(response.status_code, 200)
+        return sorted(row["account_name"] for row in response.json()["results"])
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # 迁移要求共享缓存后端，文件缓存可在进程间共享
+        cache_dir = os.path.join(cls.tmpdir.name, "cache")
+        shared = {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": cache_dir}
+        cls.enterClassContext(override_settings(CACHES={"default": shared}))
+
+    def move_to_shard(self):
+        call_command(
+            "rebalance_shards", object_id=str(self.object1.id), target="shard1", grace=0, batch_size=2,
+            stdout=io.StringIO(),
+        )
+        self.object1.refresh_from_db()
+
+    def test_rebalance_requires_shared_cache(self):
+        local = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+        with override_settings(CACHES={"default": local}), self.assertRaises(CommandError):
+            call_command("rebalance_shards", object_id=str(self.object1.id), target="shard1", stdout=io.StringIO())
+        self.assertFalse(Account.objects.using("shard1").exists())
+
+    def test_rebalance_moves_accounts(self):
+        AccountSortKey.objects.create(
+            account=Account.objects.filter(object=self.object1).first(), object=self.object1, field="x", value="1"
+        )
+        before = {a.id: a.updated_at for a in Account.objects.filter(object=self.object1)}
+        self.move_to_shard()
+        self.assertEqual(self.object1.shard, "shard1")
+        self.assertEqual(self.object1.shard_locked, "0")
+        # 原分片已清理，复制保留原 updated_at
+        self.assertFalse(Account.objects.using("default").filter(object=self.object1).exists())
+        self.assertFalse(AccountSortKey.objects.using("default").exists())
+        moved = {a.id: a.updated_at for a in Account.objects.using("shard1").filter(object=self.object1)}
+        self.assertEqual(moved, before)
+        self.assertEqual(AccountCount.objects.using("shard1").get(object_id=self.object1.id).count, 3)
+
+        self.assertEqual(self.list_names(self.object1.id), ["Dr. test0", "Dr. test1", "Dr. test2"])
+        with override_settings(DATABASE_SHARDS=[]):
+            self.assertEqual(self.list_names(self.object1.id), [])
+
+    def test_account_actions_follow_object_shard(self):
+        self.move_to_shard()
+        response = self.client.post(
+            "/api/main/", {"object_id": str(self.object1.id), "data": {"account_name": "Dr. new"}},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201)
+        account = Account.objects.using("shard1").get(data__account_name="Dr. new")
+        self.assertEqual(AccountCount.objects.using("shard1").get(object_id=self.object1.id).count, 4)
+
+        response = self.client.get(f"/api/main/{account.id}/?pagelist_id={self.page_list1.id}")
+        self.assertEqual(response.json()["account_data"]["account_name"], "Dr. new")
+        response = self.client.patch(
+            f"/api/main/{account.id}/", {"hospital": "协和医院"}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post(
+            "/api/main/bulk-delete/", {"ids": [str(account.id)]}, content_type="application/json"
+        )
+        self.assertEqual(response.json()["deleted"], 1)
+        account = Account.objects.using("shard1").get(id=account.id)
+        self.assertEqual((account.data["hospital"], account.deleted), ("协和医院", "1"))
+
+        response = self.client.get(f"/api/main/export/?object_id={self.object1.id}&export_format=ndjson")
+        self.assertEqual(len(b"".join(response.streaming_content).splitlines()), 3)
+
+    def test_new_object_on_shard(self):
+        response = self.client.post("/api/objects/", {"name": "sharded", "shard": "shard1"})
+        self.assertEqual(response.status_code, 201)
+        object_id = response.json()["id"]
+        self.assertTrue(AccountCount.objects.using("shard1").filter(object_id=object_id).exists())
+        response = self.client.post("/api/objects/", {"name": "bad", "shard": "shard9"})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.patch(f"/api/objects/{object_id}/", {"shard": "default"}, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_locked_object_rejects_writes(self):
+        self.object1.shard_locked = "1"
+        self.object1.save()
+        response = self.client.post(
+            "/api/main/", {"object_id": str(self.object1.id), "data": {"account_name": "x"}},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("error", response.json())
+        account = Account.objects.filter(object=self.object1).first()
+        self.assertEqual(self.client.delete(f"/api/main/{account.id}/").status_code, 503)
+        # 读取不受影响
+        self.assertEqual(len(self.list_names(self.object1.id)), 3)
+
+
+@override_settings(ACCOUNT_LIST_CACHE_TIMEOUT=0)
+class TestMaterializedTables(TransactionTestCase):
+    """物化表的建表与加列为 DDL，SQLite 不能在测试事务内执行，使用 TransactionTestCase"""
+
+    def setUp(self):
+        self.object1, self.page_list1 = create_sample_metadata(account_count=4)
+        # 超长与非字符串的值无法由短文本列精确表示，展示时读取 t_account
+        Account.objects.create(
+            object=self.object1, data={"account_name": "Dr. long", "hospital": "医" * 300, "phone": 12345}
+        )
+        self.url = f"/api/main/?object_id={self.object1.id}"
+
+    def tearDown(self):
+        self.object1.refresh_from_db()
+        call_command("materialize_tables", object_id=str(self.object1.id), drop=True, stdout=io.StringIO())
+
+    def enable(self):
+        call_command("materialize_tables", object_id=str(self.object1.id), enable=True, stdout=io.StringIO())
+        self.object1.refresh_from_db()
+
+    def get(self, url):
+        """返回 (响应 JSON, 是否读取了物化表)"""
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        used = any('"t_accounts"' in query["sql"] for query in ctx.captured_queries)
+        return response.json(), used
+
+    def export(self, query=""):
+        response = self.client.get(f"/api/main/export/?object_id={self.object1.id}&export_format=ndjson{query}")
+        return [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+
+    def test_list_and_export_read_table_with_same_results(self):
+        queries = ["", "&sort_order=desc", "&sort_field=hospital", "&search=Dr. test", "&page_size=2&page=2"]
+        expected = [self.get(self.url + query)[0] for query in queries]
+        exported = self.export("&sort_order=desc")
+        self.enable()
+        self.assertEqual(self.object1.materialized, "2")
+        states = ObjectField.objects.filter(object=self.object1).values_list("materialized", flat=True)
+        self.assertEqual(set(states), {"2"})
+        for query, data in zip(queries, expected):
+            with self.subTest(query=query):
+                self.assertEqual(self.get(self.url + query), (data, True))
+        self.assertEqual(self.export("&sort_order=desc"), exported)
+
+        # 游标分页逐页遍历
+        names, url = [], self.url + "&cursor=&page_size=2&sort_order=desc"
+        while url:
+            data, used = self.get(url)
+            self.assertTrue(used)
+            names += [row["account_name"] for row in data["results"]]
+            url = data["next"]
+        self.assertEqual(names, [row["account_name"] for row in exported])
+
+    def test_async_list_reads_table_like_sync_view(self):
+        self.enable()
+        for query in ("", "&sort_order=desc&page_size=2&page=2", "&search=Dr. long"):
+            with self.subTest(query=query):
+                expected, _ = self.get(self.url + query)
+                with CaptureQueriesContext(connection) as ctx:
+                    response = async_to_sync(self.async_client.get)(
+                        f"/api/async/main/?object_id={self.object1.id}{query}"
+                    )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json()["results"], expected["results"])
+                self.assertTrue(any('"t_accounts"' in q["sql"] for q in ctx.captured_queries))
+        rows = self.get(self.url + "&search=Dr. long")[0]["results"]
+        self.assertEqual(rows[0]["hospital"], "医" * 300)
+
+    def test_export_loads_overflow_rows_per_chunk(self):
+        for i in range(5):
+            Account.objects.create(object=self.object1, data={"account_name": f"Dr. long{i}", "hospital": "院" * 300})
+        self.enable()
+        with self.settings(EXPORT_CHUNK_SIZE=4), CaptureQueriesContext(connection) as ctx:
+            rows = self.export()
+        self.assertEqual(len(rows), 10)
+        self.assertEqual(rows[0]["hospital"], "医" * 300)
+        # 按账户名排序分 3 块，6 个溢出行落在前两块，每块一次读取原始数据，不逐行查询
+        overflow = [q["sql"] for q in ctx.captured_queries if 'FROM "t_account" WHERE "t_account"."id"' in q["sql"]]
+        self.assertEqual(len(overflow), 2)
+        self.assertTrue(all(" IN " in sql for sql in overflow))
+
+    def test_writes_keep_table_in_sync(self):
+        self.enable()
+        self.client.post(
+            "/api/main/", {"object_id": str(self.object1.id), "data": {"account_name": "Dr. new"}},
+            content_type="application/json",
+        )
+        account = Account.objects.get(data__account_name="Dr. test0")
+        self.client.put(
+            f"/api/main/{account.id}/", {"account_name": "Dr. put", "hospital": "h"}, content_type="application/json"
+        )
+        other = Account.objects.get(data__account_name="Dr. test1")
+        self.client.patch(f"/api/main/{other.id}/", {"hospital": "协和医院"}, content_type="application/json")
+        self.client.delete(f"/api/main/{Account.objects.get(data__account_name='Dr. test2').id}/")
+
+        data, used = self.get(self.url + "&page_size=100")
+        self.assertTrue(used)
+        rows = {row["account_name"]: row for row in data["results"]}
+        self.assertEqual(sorted(rows), ["Dr. long", "Dr. new", "Dr. put", "Dr. test1", "Dr. test3"])
+        self.assertEqual(rows["Dr. new"]["hospital"], "N/A")
+        self.assertEqual(rows["Dr. test1"]["hospital"], "协和医院")
+        self.assertEqual(rows["Dr. long"]["hospital"], "医" * 300)
+
+    def test_search_overflow_limited_to_object_and_prune(self):
+        self.enable()
+        with CaptureQueriesContext(connection) as ctx:
+            data, used = self.get(self.url + "&search=Dr. lo")
+        self.assertTrue(used)
+        self.assertEqual([row["account_name"] for row in data["results"]], ["Dr. long"])
+        # 溢出行的子查询只查该 Object 的账户
+        sql = next(q["sql"] for q in ctx.captured_queries if '"t_accounts"' in q["sql"])
+        subquery = sql[sql.index('"t_accounts"."id" IN'):]
+        self.assertIn('"object_id" = ', subquery[: subquery.index('"t_accounts"."overflow"')])
+
+        # 绕过信号物理删除的账户由 materialize_tables 清理
+        account = Account.objects.get(data__account_name="Dr. test0")
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM t_account WHERE id = %s", [account.id.hex])
+        out = io.StringIO()
+        call_command("materialize_tables", object_id=str(self.object1.id), stdout=out)
+        self.assertIn("清理已删除账户的物化行 1 条", out.getvalue())
+        data, used = self.get(self.url + "&page_size=100")
+        self.assertTrue(used)
+        self.assertNotIn("Dr. test0", [row["account_name"] for row in data["results"]])
+
+    def test_field_changes_add_and_backfill_columns(self):
+        self.enable()
+        table = self.object1.table_name
+        field = ObjectField.objects.create(object=self.object1, name="title", type="integer")
+        columns = {c.name for c in connection.introspection.get_table_description(connection.cursor(), table)}
+        self.assertIn("title", columns)
+        field.refresh_from_db()
+        self.assertEqual(field.materialized, "1")
+        account = Account.objects.get(data__account_name="Dr. test0")
+        account.data["title"] = 3
+        account.save()
+        PageListField.objects.create(name="职称", object_field=field, page_list=self.page_list1)
+
+        # 新列回填完成前列表读取 t_account
+        data, used = self.get(self.url)
+        self.assertFalse(used)
+        call_command("materialize_tables", stdout=io.StringIO())
+        self.assertEqual(self.get(self.url), (data, True))
+        rows = {row["account_name"]: row for row in data["results"]}
+        self.assertEqual((rows["Dr. test0"]["职称"], rows["Dr. test1"]["职称"]), (3, "N/A"))
+
+        # 改名：删除旧列并加新列，等待回填
+        field.name = "level"
+        field.save()
+        columns = {c.name for c in connection.introspection.get_table_description(connection.cursor(), table)}
+        self.assertIn("level", columns)
+        self.assertNotIn("title", columns)
+        self.assertFalse(self.get(self.url)[1])
+
+    def test_refuses_unusable_table_names(self):
+        for table_name in ("t_account", "objects", "bad name", ""):
+            Object.objects.filter(pk=self.object1.pk).update(table_name=table_name)
+            with self.subTest(table_name=table_name), self.assertRaises(CommandError):
+                self.enable()
+        self.assertFalse(Object.objects.exclude(materialized="0").exists())
+        self.client.patch(f"/api/objects/{self.object1.id}/", {"materialized": "2"}, content_type="application/json")
+        self.assertEqual(Object.objects.get(pk=self.object1.pk).materialized, "0")
+
+    def test_drop_returns_to_account_table(self):
+        self.enable()
+        response = self.client.patch(
+            f"/api/objects/{self.object1.id}/", {"table_name": "t_other"}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+        call_command("materialize_tables", object_id=str(self.object1.id), drop=True, stdout=io.StringIO())
+        self.assertNotIn(self.object1.table_name, connection.introspection.table_names())
+        data, used = self.get(self.url)
+        self.assertFalse(used)
+        self.assertEqual(data["count"], 5)
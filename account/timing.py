@@ -0,0 +1,96 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# 当前请求的计时器，未启用计时中间件时为 None
+_current = ContextVar("request_timer", default=None)
+
+
+class RequestTimer:
+    """记录一次请求的总耗时、SQL 次数与耗时，以及视图内的命名阶段耗时"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.total_ms = 0.0
+        self.queries = 0
+        self.sql_ms = 0.0
+        self.spans = {}
+        # 元数据缓存命中情况：{namespace: [命中数, 未命中数]}
+        self.cache = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        """connection.execute_wrapper 回调：统计每条 SQL 的执行耗时"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql_ms += (time.perf_counter() - start) * 1000
+
+    def record_cache(self, namespace, hit):
+        counts = self.cache.setdefault(namespace, [0, 0])
+        counts[0 if hit else 1] += 1
+
+    def add_span(self, name, duration_ms):
+        # 同名阶段多次出现时累加
+        self.spans[name] = self.spans.get(name, 0.0) + duration_ms
+
+    def finish(self):
+        self.total_ms = (time.perf_counter() - self.started) * 1000
+
+    def server_timing(self):
+        """生成 Server-Timing 响应头"""
+        metrics = [f"total;dur={self.total_ms:.1f}", f'db;dur={self.sql_ms:.1f};desc="{self.queries} queries"']
+        metrics += [f"{name};dur={duration:.1f}" for name, duration in self.spans.items()]
+        return ", ".join(metrics)
+
+    def as_dict(self):
+        return {
+            "total_ms": round(self.total_ms, 3),
+            "db_queries": self.queries,
+            "db_ms": round(self.sql_ms, 3),
+            "spans": {name: round(duration, 3) for name, duration in self.spans.items()},
+        }
+
+
+def execute_wrapper(execute, sql, params, many, context):
+    """所有连接共用的 execute_wrapper：SQL 计入当前请求的计时器
+
+    计时器保存在 ContextVar 中，异步视图经 sync_to_async 在线程中执行的查询同样计入。
+    """
+    timer = _current.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    return timer(execute, sql, params, many, context)
+
+
+def install(connection, **kwargs):
+    """connection_created 信号处理：为新连接安装请求计时（同一连接对象只安装一次）"""
+    if execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(execute_wrapper)
+
+
+def current_timer():
+    return _current.get()
+
+
+def activate(timer):
+    return _current.set(timer)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+@contextmanager
+def span(name):
+    """记录视图内一个命名阶段的耗时；未启用计时时只做一次 ContextVar 读取"""
+    timer = _current.get()
+    if timer is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.add_span(name, (time.perf_counter() - start) * 1000)
@@ -0,0 +1,101 @@
+import time
+
+from django.db import router, transaction
+from django.utils import timezone
+
+from .counts import soft_deleted_deltas
+from .expressions import JSONMergePatch
+from .models import Account
+from .signals import accounts_patched, accounts_soft_deleted
+
+
+def account_object_ids(account_ids, using=None):
+    """一组账户所属的 Object，用于只使这些 Object 的列表缓存失效"""
+    using = using or router.db_for_write(Account)
+    return set(
+        Account.objects.using(using).filter(id__in=list(account_ids)).values_list("object_id", flat=True).distinct()
+    )
+
+
+def patch_accounts(account_ids, patch, object_ids=None):
+    """对一组账户的 data 应用同一份合并补丁，单条 UPDATE 完成且不读取原数据，返回更新行数
+
+    object_ids 为账户所属的 Object（调用方已知时传入，否则更新后查询一次）。
+    """
+    using = router.db_for_write(Account)
+    updated = (
+        Account.objects.using(using)
+        .filter(id__in=account_ids, deleted="0")
+        .update(data=JSONMergePatch("data", patch), updated_at=timezone.now())
+    )
+    if updated:
+        if object_ids is None:
+            object_ids = account_object_ids(account_ids, using=using)
+        accounts_patched.send(
+            sender=Account, account_ids=list(account_ids), fields=set(patch), object_ids=set(object_ids), using=using
+        )
+    return updated
+
+
+def set_deleted_ids(account_ids, deleted):
+    """软删除（deleted="1"）或恢复（deleted="0"）指定账户，单条 UPDATE 完成，返回处理行数"""
+    using = router.db_for_write(Account)
+    current = "0" if deleted == "1" else "1"
+    updated = (
+        Account.objects.using(using)
+        .filter(id__in=account_ids, deleted=current)
+        .update(deleted=deleted, updated_at=timezone.now())
+    )
+    if updated:
+        # 按新状态统计各 Object 的变更行数，同时得到计数增量与涉及的 Object
+        deltas, object_ids = soft_deleted_deltas(account_ids, deleted, updated, using=using)
+        accounts_soft_deleted.send(
+            sender=Account,
+            account_ids=list(account_ids),
+            deleted=deleted,
+            deltas=deltas,
+            object_ids=object_ids,
+            using=using,
+        )
+    return updated
+
+
+def set_deleted(queryset, deleted, chunk_size=500):
+    """分批软删除或恢复查询集中的账户，返回处理行数
+
+    按主键分块，每块一条 UPDATE 并独立提交，大批量操作不会长时间持有行锁。
+    """
+    current = "0" if deleted == "1" else "1"
+    queryset = queryset.filter(deleted=current).order_by("id")
+    total = 0
+    last_id = None
+    while True:
+        chunk = queryset if last_id is None else queryset.filter(id__gt=last_id)
+        ids = list(chunk.values_list("id", flat=True)[:chunk_size])
+        if not ids:
+            break
+        total += set_deleted_ids(ids, deleted)
+        last_id = ids[-1]
+    return total
+
+
+def purge_deleted(before, batch_size=1000, pause=0.0):
+    """物理删除 updated_at 早于 before 的软删除账户，每批一个事务，逐批 yield 累计删除数"""
+    using = router.db_for_write(Account)
+    total = 0
+    while True:
+        ids = list(
+            Account.objects.using(using)
+            .filter(deleted="1", updated_at__lt=before)
+            .order_by("id")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        with transaction.atomic(using=using):
+            # Account 注册了 post_delete 接收者，删除前需读取实例，只读取必要的列
+            Account.objects.using(using).filter(id__in=ids, deleted="1").only("id", "object_id", "deleted").delete()
+        total += len(ids)
+        yield total
+        if pause:
+            time.sleep(pause)
@@ -1,5 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from . import async_views
 from .views import (
     MainViewSet,
     ObjectViewSet,
@@ -9,6 +10,7 @@ from .views import (
     PageLayoutViewSet,
     PageLayoutFieldViewSet,
     AccountViewSet,
+    cache_stats_view,
 )
 
 router = DefaultRouter()
@@ -23,5 +25,9 @@ router.register(r"accounts", AccountViewSet)
 
 
 urlpatterns = [
+    path("cache-stats/", cache_stats_view, name="cache-stats"),
+    # 账户列表与详情的异步实现，在 ASGI 下部署时使用（config/asgi.py）
+    path("async/main/", async_views.account_list, name="main-async-list"),
+    path("async/main/<uuid:pk>/", async_views.account_detail, name="main-async-detail"),
     path("", include(router.urls)),  # 让 DRF 自动处理所有路由
 ]
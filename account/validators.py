@@ -0,0 +1,89 @@
+import math
+from datetime import date
+
+# ObjectField.type 的取值分组（与物化表列类型一致），其他类型按文本处理、不校验值
+INTEGER_TYPES = ("integer", "int")
+NUMBER_TYPES = ("number", "float", "decimal")
+BOOLEAN_TYPES = ("boolean", "bool")
+DATE_TYPES = ("date",)
+
+# CSV 中布尔值的写法
+CSV_BOOLEANS = {"true": True, "1": True, "false": False, "0": False}
+
+
+def validate_account_data(data, field_names):
+    """校验单条账户业务数据，返回错误信息列表（为空表示通过）
+
+    field_names 为 Object 已定义的字段名；未定义任何字段时不限制字段名。
+    """
+    if not isinstance(data, dict):
+        return ["data 参数格式应为字典"]
+
+    errors = []
+    for key, value in data.items():
+        if not isinstance(key, str):
+            errors.append(f"字段名应为字符串: {key!r}")
+        elif field_names and key not in field_names:
+            errors.append(f"未定义的字段: {key}")
+        elif isinstance(value, (dict, list)):
+            errors.append(f"字段 {key} 的值应为标量")
+    return errors
+
+
+def _is_date(value):
+    try:
+        return isinstance(value, str) and date.fromisoformat(value).isoformat() == value
+    except ValueError:
+        return False
+
+
+def validate_field_types(data, field_types):
+    """按 ObjectField.type 校验值的类型，返回错误信息列表；值为 null 或字段未定义时不校验"""
+    errors = []
+    for key, value in data.items():
+        field_type = field_types.get(key)
+        if value is None:
+            continue
+        if field_type in INTEGER_TYPES:
+            ok = isinstance(value, int) and not isinstance(value, bool)
+        elif field_type in NUMBER_TYPES:
+            ok = isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+        elif field_type in BOOLEAN_TYPES:
+            ok = isinstance(value, bool)
+        elif field_type in DATE_TYPES:
+            ok = _is_date(value)
+        else:
+            continue
+        if not ok:
+            errors.append(f"字段 {key} 的值与类型 {field_type} 不符: {value!r}")
+    return errors
+
+
+def coerce_csv_row(row, field_types):
+    """CSV 的值均为字符串，按 ObjectField.type 转换为 JSON 值，返回 (数据, 错误信息列表)
+
+    非文本字段的空单元格视为未填写，不写入该字段。
+    """
+    data = {}
+    errors = []
+    for key, value in row.items():
+        field_type = field_types.get(key)
+        if field_type not in INTEGER_TYPES + NUMBER_TYPES + BOOLEAN_TYPES or not isinstance(value, str):
+            data[key] = value
+            continue
+        text = value.strip()
+        if not text:
+            continue
+        try:
+            if field_type in BOOLEAN_TYPES:
+                data[key] = CSV_BOOLEANS[text.lower()]
+            elif field_type in INTEGER_TYPES:
+                data[key] = int(text)
+            else:
+                number = float(text)
+                if not math.isfinite(number):
+                    raise ValueError(text)
+                data[key] = int(text) if text.lstrip("+-").isdigit() else number
+        except (KeyError, ValueError):
+            errors.append(f"字段 {key} 的值与类型 {field_type} 不符: {value!r}")
+    return data, errors
@@ -1,12 +1,17 @@
 import json
 from rest_framework.viewsets import ModelViewSet
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.decorators import action, api_view
+from rest_framework.renderers import JSONRenderer
 from rest_framework import status
-from django.db import transaction
+from rest_framework.permissions import SAFE_METHODS
+from django.conf import settings
+from django.db import DatabaseError, router, transaction
 from django.db.models import Q
 from django.core.exceptions import ObjectDoesNotExist
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from .models import (
     Object,
     ObjectField,
@@ -16,6 +21,43 @@ from .models import (
     PageLayoutField,
     Account,
 )
+from .cache import cache_stats
+from .conditional import (
+    cached_list_content,
+    detail_validators,
+    is_conditional,
+    list_validators,
+    not_modified,
+    set_validators,
+)
+from .export import EXPORT_FORMATS, iter_export
+from .expressions import merge_patch
+from .materialize import load_overflow
+from .metrics import metrics_authorized, registry, render_metrics
+from .metadata import get_field_map, get_object_field_names, get_object_field_types, get_page_layout
+from .pagination import AccountPagination, AccountCursorPagination
+from .queries import (
+    account_list_queryset,
+    map_account,
+    order_accounts,
+    parse_sort_params,
+    search_accounts,
+    source_queryset,
+)
+from .signals import accounts_bulk_saved
+from .timing import current_timer, span
+from .updates import account_object_ids, patch_accounts, set_deleted, set_deleted_ids
+from .validators import validate_account_data, validate_field_types
+from .sharding import (
+    ShardLocked,
+    locate_account,
+    locate_accounts,
+    reset_shard,
+    shard_for,
+    use_shard,
+    using_shard,
+    writable_shard,
+)
 from .serializers import (
     ObjectSerializer,
     ObjectFieldSerializer,
@@ -27,32 +69,113 @@ from .serializers import (
 )
 
 
-# 自定义分页
-class AccountPagination(PageNumberPagination):
-    page_size = 20  # 每页显示 20 条数据
-    page_size_query_param = "page_size"
-    max_page_size = 100
+class _Uncacheable(Exception):
+    """列表结果不可缓存时携带原响应跳出缓存生成"""
+
+    def __init__(self, response):
+        self.response = response
+
+
+def account_detail_data(account, page_layout):
+    """账户详情响应数据：按页面布局映射的字段 + 原始业务数据"""
+    # 替换 key，使其变为 pagelayoutfield 里的 name
+    formatted_account_data = {
+        label: account.data.get(field, "") for field, label in page_layout.fields
+    }
+
+    # # 追加基础字段**
+    # filtered_data.update({
+    #     "id": str(account.id),
+    #     "updated_at": account.updated_at.strftime("%Y-%m-%d %H:%M:%S"),
+    #     "created_at": account.created_at.strftime("%Y-%m-%d %H:%M:%S"),
+    # })
+
+    return {
+        "page_layout": {
+            "name": page_layout.name
+        },
+        "filtered_data": formatted_account_data,
+        "account_data": {
+            "account_name": account.data.get("account_name"),
+            "hospital": account.data.get("hospital"),
+            "department": account.data.get("department"),
+            "phone": account.data.get("phone"),
+            **account.data,  # 其他未列出的字段保持原顺序
+        }
+    }
 
 
 class MainViewSet(ModelViewSet):
     serializer_class = AccountSerializer
     pagination_class = AccountPagination
+    cursor_pagination_class = AccountCursorPagination
+
+    @property
+    def paginator(self):
+        """请求带 cursor 参数时切换为游标分页（导出、无限滚动），否则使用页码分页"""
+        if not hasattr(self, "_paginator"):
+            if "cursor" in self.request.query_params:
+                self._paginator = self.cursor_pagination_class()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # 账户数据按 Object 分片存储，整个请求在其分片上读写
+        self._shard_token = use_shard(self.request_shard(request, kwargs.get("pk")))
+
+    def request_shard(self, request, pk=None):
+        """按 object_id 参数或账户 id 确定分片，写请求在 Object 迁移切换阶段抛出 ShardLocked
+
+        按 id 列表批量操作的请求可能涉及多个分片，返回 None，由动作内按分片分组执行。
+        """
+        write = request.method not in SAFE_METHODS
+        object_id = request.query_params.get("object_id")
+        if object_id is None and write and isinstance(request.data, dict):
+            object_id = request.data.get("object_id")
+        try:
+            if object_id:
+                return writable_shard(object_id) if write else shard_for(object_id)
+            if pk is not None:
+                return locate_account(pk, for_write=write)
+        except (ValueError, DjangoValidationError):
+            # 参数格式错误，交由动作返回 400/404
+            pass
+        return None
+
+    def handle_exception(self, exc):
+        if isinstance(exc, ShardLocked):
+            return Response({"error": str(exc.detail)}, status=exc.status_code)
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        """恢复请求前的分片；启用请求计时时在视图内渲染响应，以便记录 render 阶段耗时"""
+        token = getattr(self, "_shard_token", None)
+        if token is not None:
+            reset_shard(token)
+            self._shard_token = None
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if current_timer() is not None and hasattr(response, "render"):
+            with span("render"):
+                response.render()
+        return response
 
     def get_queryset(self):
         """保持通用性：仅过滤未删除数据"""
         queryset = Account.objects.filter(deleted="0")
-
-        # 搜索功能
-        search = self.request.query_params.get("search")
-        if search:
-            # JSON 字段模糊搜索
-            queryset = queryset.filter(
-                # Q(data__account_name__icontains=search)  # 模糊匹配
-                Q(data__account_name__istartswith=search)  # 首字母匹配
-            )
-
         return queryset
 
+    def source_queryset(self, object_id, field_map, sort_field):
+        """列表与导出的数据源：物化表覆盖展示、排序与搜索字段时读取物化表，否则读取 t_account"""
+        return source_queryset(
+            self.get_queryset().filter(object_id=object_id),
+            object_id,
+            field_map,
+            sort_field,
+            self.request.query_params.get("search"),
+        )
+
     def list(self, request, *args, **kwargs):
         """获取全部账户信息（Object + ObjectField + PageList + PageListField + t_account）"""
         try:
@@ -62,52 +185,135 @@ class MainViewSet(ModelViewSet):
                 return Response(
                     {"error": "缺少 object_id 参数"}, status=status.HTTP_400_BAD_REQUEST
                 )
-            # 获取排序字段和排序顺序
-            sort_field = request.query_params.get('sort_field', 'account_name')
-            sort_order = request.query_params.get('sort_order', 'asc')
-
-            # 确保字段有效，防止 SQL 注入
-            if sort_field not in ['account_name', 'department', 'hospital']:
-                sort_field = 'account_name'
-
-            if sort_order not in ['asc', 'desc']:
-                sort_order = 'asc'
+            # 获取排序字段和排序顺序（确保字段有效，防止 SQL 注入）
+            sort_field, sort_order = parse_sort_params(request.query_params)
 
             # 获取字段映射
-            field_map, error = get_field_map(object_id)
+            with span("metadata"):
+                field_map, error = get_field_map(object_id)
             if error:
                 return Response({"error": error}, status=status.HTTP_404_NOT_FOUND)
 
-            # 查询数据
-            queryset = self.get_queryset().filter(object_id=object_id)
-            # 排序
-            if sort_order == 'asc':
-                sorted_queryset = queryset.order_by(f"data__{sort_field}")
+            # 条件请求：数据与元数据版本未变时直接返回 304，不查询也不序列化
+            etag, last_modified = list_validators(object_id, request.query_params)
+            response = not_modified(request, etag, last_modified)
+            if response is not None:
+                return response
+
+            # 响应缓存：只缓存 JSON 格式的成功响应
+            if settings.ACCOUNT_LIST_CACHE_TIMEOUT > 0 and request.accepted_renderer.format == "json":
+                try:
+                    content = cached_list_content(
+                        object_id,
+                        etag,
+                        request.build_absolute_uri(),
+                        lambda: self.render_list_page(object_id, field_map, sort_field, sort_order),
+                    )
+                except _Uncacheable as e:
+                    return e.response
+                response = HttpResponse(content, content_type="application/json")
             else:
-                sorted_queryset = queryset.order_by(f"-data__{sort_field}")
-            # 分页
+                response = self.list_page(object_id, field_map, sort_field, sort_order)
+            return set_validators(response, etag, last_modified)
+        except ValidationError as e:
+            return Response(e.detail, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response(
+                {"code": 500, "error": f"服务器内部错误: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+    def list_page(self, object_id, field_map, sort_field, sort_order):
+        """查询、分页并映射一页账户，返回 Response"""
+        with span("query"):
+            # 查询数据（Object 已物化时读取物化表），搜索并排序
+            sorted_queryset = account_list_queryset(
+                self.get_queryset().filter(object_id=object_id),
+                self.request.query_params,
+                object_id,
+                field_map,
+                sort_field,
+                sort_order,
+            )
+        # 分页（传入 cursor 参数时使用游标分页）
+        with span("paginate"):
             page = self.paginate_queryset(sorted_queryset)
 
-            if page is None:
+        if page is None:
+            return Response(
+                {"error": "分页数据不存在"}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        # 动态生成返回数据
+        with span("render"):
+            load_overflow(page)
+            result = [map_account(account, field_map) for account in page]
+
+        return self.get_paginated_response(result)
+
+    def render_list_page(self, object_id, field_map, sort_field, sort_order):
+        """生成一页列表并渲染为 JSON 字节串；非 200 响应不缓存"""
+        response = self.list_page(object_id, field_map, sort_field, sort_order)
+        if response.status_code != status.HTTP_200_OK:
+            raise _Uncacheable(response)
+        with span("render"):
+            return JSONRenderer().render(response.data)
+
+    @action(detail=False, methods=["get"], url_path="export")
+    def export(self, request):
+        """流式导出某个 Object 的全部未删除账户（CSV / NDJSON）
+
+        参数: object_id, export_format=csv|ndjson, gzip=1，并支持列表的 search、sort_field、sort_order。
+        按排序键分块查询并逐块输出，内存占用与账户数量无关。
+        """
+        try:
+            object_id = request.query_params.get("object_id")
+            if not object_id:
+                return Response(
+                    {"error": "缺少 object_id 参数"}, status=status.HTTP_400_BAD_REQUEST
+                )
+            export_format = request.query_params.get("export_format", "csv")
+            if export_format not in EXPORT_FORMATS:
                 return Response(
-                    {"error": "分页数据不存在"}, status=status.HTTP_404_NOT_FOUND
+                    {"error": "export_format 参数应为 csv 或 ndjson"}, status=status.HTTP_400_BAD_REQUEST
                 )
+            sort_field, sort_order = parse_sort_params(request.query_params)
 
-            # 动态生成返回数据
-            result = []
-            for account in page:
-                parsed_data = account.data
-                data = {
-                    field_map.get(field, field): parsed_data.get(field, "N/A")
-                    for field in field_map
-                }
-                data["id"] = account.id
-                result.append(data)
+            field_map, error = get_field_map(object_id)
+            if error:
+                return Response({"error": error}, status=status.HTTP_404_NOT_FOUND)
 
-            return self.get_paginated_response(result)
+            queryset = self.source_queryset(object_id, field_map, sort_field)
+            search = request.query_params.get("search")
+            if search:
+                queryset, _ = search_accounts(queryset, object_id, search)
+            # 导出按排序键分块，不使用相关度排序
+            queryset = order_accounts(queryset, object_id, sort_field, sort_order)
+            # 响应体在视图返回后才生成，此时请求的分片/副本已恢复，先固定查询所用的数据库
+            queryset = queryset.using(queryset.db)
+
+            compress = request.query_params.get("gzip") == "1" or "gzip" in request.META.get(
+                "HTTP_ACCEPT_ENCODING", ""
+            )
+            response = StreamingHttpResponse(
+                iter_export(
+                    queryset,
+                    field_map,
+                    export_format,
+                    descending=sort_order == "desc",
+                    chunk_size=settings.EXPORT_CHUNK_SIZE,
+                    compress=compress,
+                ),
+                content_type=EXPORT_FORMATS[export_format],
+            )
+            response["Content-Disposition"] = f'attachment; filename="accounts_{object_id}.{export_format}"'
+            response["Vary"] = "Accept-Encoding"
+            if compress:
+                response["Content-Encoding"] = "gzip"
+            return response
         except Exception as e:
             return Response(
-                {"code": 500, "error": f"服务器内部错误: {str(e)}"},
+                {"error": f"服务器内部错误: {str(e)}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
@@ -123,50 +329,31 @@ class MainViewSet(ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
+            # 条件请求先只读取 updated_at，未修改时返回 304，不读取 data 也不序列化
+            if is_conditional(request):
+                with span("query"):
+                    version = Account.objects.filter(id=pk, deleted="0").values_list("id", "updated_at").first()
+                if version is None:
+                    return Response({"error": "账户不存在"}, status=status.HTTP_404_NOT_FOUND)
+                response = not_modified(request, *detail_validators(*version, pagelist_id))
+                if response is not None:
+                    return response
+
             # 获取Account业务数据
             try:
-                account = Account.objects.get(id=pk)
+                with span("query"):
+                    account = Account.objects.get(id=pk, deleted="0")
             except Account.DoesNotExist:
                 return Response({"error": "账户不存在"}, status=status.HTTP_404_NOT_FOUND)
 
-            # 获取PageLayout对象
-            try:
-                page_layout = PageLayout.objects.get(page_list_id=pagelist_id)
-            except PageLayout.DoesNotExist:
+            # 获取编译后的页面布局（缓存）
+            with span("metadata"):
+                page_layout = get_page_layout(pagelist_id)
+            if page_layout is None:
                 return Response({"error": "PageLayout 未找到"}, status=status.HTTP_404_NOT_FOUND)
 
-            # 获取PageLayoutField对象
-            page_layout_fields = PageLayoutField.objects.filter(page_layout=page_layout)
-
-            # 匹配所有PageLayoutField和ObjectField内对应的mapping
-            display_labels = dict(page_layout_fields.values_list("object_field__name", "name"))
-
-            # 过滤出业务数据
-            filtered_data = {field: account.data.get(field, "") for field in display_labels.keys()}
-
-            # 替换 key，使其变为 pagelayoutfield 里的 name
-            formatted_account_data = {display_labels[field] : value for field, value in filtered_data.items()}
-
-            # # 追加基础字段**
-            # filtered_data.update({
-            #     "id": str(account.id),
-            #     "updated_at": account.updated_at.strftime("%Y-%m-%d %H:%M:%S"),
-            #     "created_at": account.created_at.strftime("%Y-%m-%d %H:%M:%S"),
-            # })
-
-            return Response({
-                "page_layout": {
-                    "name": page_layout.name
-                },
-                "filtered_data": formatted_account_data,
-                "account_data": {
-                    "account_name": account.data.get("account_name"),
-                    "hospital": account.data.get("hospital"),
-                    "department": account.data.get("department"),
-                    "phone": account.data.get("phone"),
-                    **account.data,  # 其他未列出的字段保持原顺序
-                }
-            }, status=status.HTTP_200_OK)
+            response = Response(account_detail_data(account, page_layout), status=status.HTTP_200_OK)
+            return set_validators(response, *detail_validators(account.id, account.updated_at, pagelist_id))
 
         except Exception as e:
             return Response(
@@ -177,7 +364,7 @@ class MainViewSet(ModelViewSet):
     def create(self, request):
         """创建账户（Object + t_account）"""
         try:
-            with transaction.atomic():  # 保证数据一致性
+            with transaction.atomic(using=router.db_for_write(Account)):  # 保证数据一致性
                 # 获取前端传入参数
                 object_id = request.data.get("object_id")
                 account_data = request.data.get("data", {})
@@ -223,12 +410,97 @@ class MainViewSet(ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
+    @action(detail=False, methods=["post"], url_path="bulk")
+    def bulk(self, request):
+        """批量创建账户（Object + t_account）
+
+        请求体: {"object_id": ..., "data": [{...}, ...], "mode": "atomic" | "partial", "batch_size": 500}
+        atomic 模式下任一条校验失败则全部不写入；partial 模式下写入通过校验的记录并逐条返回结果。
+        """
+        try:
+            object_id = request.data.get("object_id")
+            items = request.data.get("data")
+            mode = request.data.get("mode", "atomic")
+
+            if not object_id:
+                return Response(
+                    {"error": "缺少 object_id 参数"}, status=status.HTTP_400_BAD_REQUEST
+                )
+            if not isinstance(items, list) or not items:
+                return Response({"error": "data 参数应为非空列表"}, status=status.HTTP_400_BAD_REQUEST)
+            if len(items) > settings.BULK_CREATE_MAX_ITEMS:
+                return Response(
+                    {"error": f"单次最多创建 {settings.BULK_CREATE_MAX_ITEMS} 条"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            if mode not in ("atomic", "partial"):
+                return Response({"error": "mode 参数应为 atomic 或 partial"}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                batch_size = int(request.data.get("batch_size", settings.BULK_CREATE_BATCH_SIZE))
+            except (TypeError, ValueError):
+                return Response({"error": "batch_size 参数应为整数"}, status=status.HTTP_400_BAD_REQUEST)
+            batch_size = max(1, min(batch_size, settings.BULK_CREATE_BATCH_SIZE))
+
+            if not Object.objects.filter(id=object_id).exists():
+                return Response(
+                    {"error": "关联的 Object 不存在"},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+
+            # 一次性校验全部记录
+            field_names = get_object_field_names(object_id)
+            results = []
+            accounts = []
+            for index, item in enumerate(items):
+                errors = validate_account_data(item, field_names)
+                if errors:
+                    results.append({"index": index, "status": "error", "errors": errors})
+                else:
+                    account = Account(object_id=object_id, data=item)
+                    accounts.append((index, account))
+                    results.append({"index": index, "status": "created", "id": account.id})
+
+            if mode == "atomic":
+                if len(accounts) < len(items):
+                    return Response(
+                        {"error": "数据校验失败，未创建任何记录", "results": results},
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
+                with transaction.atomic(using=router.db_for_write(Account)):
+                    for start in range(0, len(accounts), batch_size):
+                        batch = [account for _, account in accounts[start:start + batch_size]]
+                        Account.objects.bulk_create(batch)
+                        accounts_bulk_saved.send(sender=Account, accounts=batch)
+            else:
+                # partial 模式下每批一个事务，某批失败不影响其他批次
+                for start in range(0, len(accounts), batch_size):
+                    chunk = accounts[start:start + batch_size]
+                    batch = [account for _, account in chunk]
+                    try:
+                        with transaction.atomic(using=router.db_for_write(Account)):
+                            Account.objects.bulk_create(batch)
+                            accounts_bulk_saved.send(sender=Account, accounts=batch)
+                    except DatabaseError as e:
+                        for index, _ in chunk:
+                            results[index] = {"index": index, "status": "error", "errors": [str(e)]}
+
+            created = sum(1 for result in results if result["status"] == "created")
+            return Response(
+                {"message": "批量创建完成", "created": created, "failed": len(items) - created, "results": results},
+                status=status.HTTP_201_CREATED if created == len(items) else status.HTTP_207_MULTI_STATUS,
+            )
+        except Exception as e:
+            return Response(
+                {"error": f"服务器内部错误: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
     def update(self, request, pk=None):
         """更新 Account 数据"""
         try:
-            with transaction.atomic():  # 开启事务
+            with transaction.atomic(using=router.db_for_write(Account)):  # 开启事务
                 # 获取 Account 实例
-                account = Account.objects.get(id=pk)
+                account = Account.objects.get(id=pk, deleted="0")
 
                 # 更新 Account 的 data 字段
                 account_data = request.data  # 直接使用请求的数据
@@ -250,21 +522,163 @@ class MainViewSet(ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
+    def partial_update(self, request, pk=None):
+        """局部更新 Account 数据（RFC 7396 合并补丁，值为 null 表示删除该字段）
+
+        先读取原数据，按 Object 的字段定义与类型校验合并后的结果；补丁仍在数据库内以单条 UPDATE 应用，
+        不会覆盖其他字段的并发修改。
+        """
+        try:
+            patch = request.data
+            errors = validate_account_data(patch, None)
+            if errors:
+                return Response({"error": errors}, status=status.HTTP_400_BAD_REQUEST)
+            if not patch:
+                return Response({"error": "补丁不能为空"}, status=status.HTTP_400_BAD_REQUEST)
+
+            row = (
+                Account.objects.using(router.db_for_write(Account))
+                .filter(id=pk, deleted="0")
+                .values_list("object_id", "data")
+                .first()
+            )
+            if row is None:
+                return Response({"error": "Account 不存在"}, status=status.HTTP_404_NOT_FOUND)
+            object_id, data = row
+            field_types = get_object_field_types(object_id)
+            merged = merge_patch(data, patch)
+            errors = validate_account_data(merged, field_types) or validate_field_types(merged, field_types)
+            if errors:
+                return Response({"error": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+            if not patch_accounts([pk], patch, object_ids={object_id}):
+                return Response({"error": "Account 不存在"}, status=status.HTTP_404_NOT_FOUND)
+            return Response({"message": "更新成功"}, status=status.HTTP_200_OK)
+        except Exception as e:
+            return Response(
+                {"error": f"服务器内部错误: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+    @bulk.mapping.patch
+    def bulk_partial_update(self, request):
+        """批量局部更新：{"patches": [{"id": ..., "data": {...}}, ...]}
+
+        相同补丁的账户合并为一条 UPDATE ... WHERE id IN (...)，同一分片的全部补丁在同一事务内应用。
+        """
+        try:
+            patches = request.data.get("patches")
+            if not isinstance(patches, list) or not patches:
+                return Response({"error": "patches 参数应为非空列表"}, status=status.HTTP_400_BAD_REQUEST)
+            if len(patches) > settings.BULK_UPDATE_MAX_ITEMS:
+                return Response(
+                    {"error": f"单次最多更新 {settings.BULK_UPDATE_MAX_ITEMS} 条"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            # 校验并按补丁内容分组
+            groups = {}
+            errors = []
+            for index, item in enumerate(patches):
+                if not isinstance(item, dict) or not item.get("id"):
+                    errors.append({"index": index, "errors": ["缺少 id"]})
+                    continue
+                patch = item.get("data")
+                item_errors = validate_account_data(patch, None) or ([] if patch else ["补丁不能为空"])
+                if item_errors:
+                    errors.append({"index": index, "errors": item_errors})
+                    continue
+                key = json.dumps(patch, sort_keys=True)
+                groups.setdefault(key, (patch, []))[1].append(item["id"])
+            if errors:
+                return Response(
+                    {"error": "数据校验失败，未更新任何记录", "results": errors},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            updated = 0
+            shards = locate_accounts({account_id for _, ids in groups.values() for account_id in ids}, for_write=True)
+            for alias, shard_ids in shards.items():
+                with using_shard(alias), transaction.atomic(using=alias):
+                    # 一次查出本分片账户所属的 Object，各补丁只使这些 Object 的列表缓存失效
+                    object_ids = account_object_ids(shard_ids, using=alias)
+                    shard_ids = set(shard_ids) if len(shards) > 1 else None
+                    for patch, ids in groups.values():
+                        if shard_ids is not None:
+                            ids = [account_id for account_id in ids if account_id in shard_ids]
+                        if ids:
+                            updated += patch_accounts(ids, patch, object_ids=object_ids)
+            return Response(
+                {"message": "批量更新完成", "updated": updated, "not_found": len(patches) - updated},
+                status=status.HTTP_200_OK,
+            )
+        except APIException as e:
+            return Response({"error": str(e.detail)}, status=e.status_code)
+        except Exception as e:
+            return Response(
+                {"error": f"服务器内部错误: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
     def destroy(self, request, pk=None):
-        """删除Account账户"""
+        """删除Account账户（软删除，单条 UPDATE 设置 deleted 标记）"""
         try:
-            with transaction.atomic():
-                account = Account.objects.get(id=pk)
-                account.delete()
-                return Response(status=status.HTTP_204_NO_CONTENT)
-        except Account.DoesNotExist:
-            return Response({"error": "账户不存在"}, status=status.HTTP_404_NOT_FOUND)
+            if not set_deleted_ids([pk], "1"):
+                return Response({"error": "账户不存在"}, status=status.HTTP_404_NOT_FOUND)
+            return Response(status=status.HTTP_204_NO_CONTENT)
         except Exception as e:
             return Response(
                 {"error": f"删除失败: {str(e)}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    @action(detail=False, methods=["post"], url_path="bulk-delete")
+    def bulk_delete(self, request):
+        """批量软删除：{"ids": [...]} 或 {"object_id": ..., "search": ...}"""
+        return self._bulk_set_deleted(request, "1")
+
+    @action(detail=False, methods=["post"], url_path="bulk-restore")
+    def bulk_restore(self, request):
+        """批量恢复软删除的账户：{"ids": [...]} 或 {"object_id": ..., "search": ...}"""
+        return self._bulk_set_deleted(request, "0")
+
+    def _bulk_set_deleted(self, request, deleted):
+        try:
+            ids = request.data.get("ids")
+            object_id = request.data.get("object_id")
+            chunk_size = settings.BULK_DELETE_CHUNK_SIZE
+            if ids is not None:
+                if not isinstance(ids, list) or not ids:
+                    return Response({"error": "ids 参数应为非空列表"}, status=status.HTTP_400_BAD_REQUEST)
+                # 按分片、按块更新，每块独立提交
+                count = 0
+                for alias, shard_ids in locate_accounts(ids, for_write=True).items():
+                    with using_shard(alias):
+                        count += sum(
+                            set_deleted_ids(shard_ids[start:start + chunk_size], deleted)
+                            for start in range(0, len(shard_ids), chunk_size)
+                        )
+            elif object_id:
+                queryset = Account.objects.filter(object_id=object_id)
+                search = request.data.get("search")
+                if search:
+                    queryset, _ = search_accounts(queryset, object_id, search)
+                count = set_deleted(queryset, deleted, chunk_size=chunk_size)
+            else:
+                return Response(
+                    {"error": "缺少 ids 或 object_id 参数"}, status=status.HTTP_400_BAD_REQUEST
+                )
+
+            key = "deleted" if deleted == "1" else "restored"
+            return Response({"message": "操作成功", key: count}, status=status.HTTP_200_OK)
+        except APIException as e:
+            return Response({"error": str(e.detail)}, status=e.status_code)
+        except Exception as e:
+            return Response(
+                {"error": f"服务器内部错误: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
 
 class ObjectViewSet(ModelViewSet):
     queryset = Object.objects.all()
@@ -297,38 +711,25 @@ class PageLayoutFieldViewSet(ModelViewSet):
 
 
 class AccountViewSet(ModelViewSet):
-    queryset = Account.objects.all()
+    # Account.__str__ 访问 object，预先关联避免逐行查询
+    queryset = Account.objects.select_related("object")
     serializer_class = AccountSerializer
 
 
-def get_field_map(object_id):
-    """生成字段映射"""
-    try:
-        obj = Object.objects.get(id=object_id)
-    except Object.DoesNotExist:
-        return {}, "Object 不存在"
-
-    # ✅ 查询关联的 PageList
-    page_list = (
-        PageList.objects.filter(pagelistfield__object_field__object=obj, deleted="0")
-        .distinct()
-        .first()
-    )
-    if not page_list:
-        return {}, "未找到页面配置"
-
-    # ✅ 查询 PageListField 并生成字段映射
-    page_list_fields = PageListField.objects.filter(
-        page_list=page_list, deleted="0", hidden="0"
-    )
-
-    if not page_list_fields.exists():
-        return {}, "未配置展示字段"
+@api_view(["GET"])
+def cache_stats_view(request):
+    """查看元数据缓存命中情况（仅 staff 用户或携带指标令牌）"""
+    if not metrics_authorized(request):
+        return Response({"error": "无权访问"}, status=status.HTTP_403_FORBIDDEN)
+    return Response({"caches": cache_stats()}, status=status.HTTP_200_OK)
 
-    # ✅ 映射规则：{业务字段名: 显示名称}
-    field_map = {field.object_field.name: field.name for field in page_list_fields}
 
-    return field_map, None
+def metrics_view(request):
+    """Prometheus 文本格式的指标（汇总全部 worker，仅 staff 用户或携带指标令牌）"""
+    if not metrics_authorized(request):
+        return JsonResponse({"error": "无权访问"}, status=403)
+    counters, histograms = registry.collect()
+    return HttpResponse(render_metrics(counters, histograms), content_type="text/plain; version=0.0.4; charset=utf-8")
 
 
 def parse_data_field(data):
@@ -0,0 +1,12 @@
+import os
+from django.core.asgi import get_asgi_application
+
+from account.checks import raise_for_process_cache
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+# 以 ASGI 服务器运行（见 settings.ASGI_SERVER）
+os.environ.setdefault("SERVER", "asgi")
+
+application = get_asgi_application()
+
+raise_for_process_cache()
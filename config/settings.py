@@ -26,6 +26,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # 放在最外层，计时覆盖其余中间件
+    "account.middleware.RequestTimingMiddleware",
+    "account.middleware.MetricsMiddleware",
+    "account.middleware.SlowQueryMiddleware",
+    # 在任何查询之前为读请求选定副本
+    "account.middleware.ReplicaRoutingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
@@ -34,6 +40,8 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    # 依赖 request.user，放在认证中间件之后
+    "account.middleware.ProfilingMiddleware",
 ]
 
 ROOT_URLCONF = "config.urls"
@@ -56,10 +64,10 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "config.wsgi.application"
 
-# 数据库配置（使用 MySQL）
+# 数据库配置（使用 MySQL，经 account.backends.mysql 复用连接池中的连接）
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.mysql",
+        "ENGINE": "account.backends.mysql",
         "NAME": os.getenv("DB_NAME", "crm_db"),
         "USER": os.getenv("DB_USER", "root"),
         "PASSWORD": os.getenv("DB_PASSWORD", "password"),
@@ -68,7 +76,147 @@ DATABASES = {
         "OPTIONS": {
             "init_command": "SET sql_mode='STRICT_TRANS_TABLES'",
         },
+        # 连接池：最少保留/最多打开的连接数（MAX_SIZE 为 0 时每次请求新建连接）、空闲连接保留时间（秒）、
+        # 连接全部借出时的最长等待（秒）、借出前是否检查连接可用，以及空闲不足多少秒时跳过检查
+        "POOL": {
+            "MIN_SIZE": int(os.getenv("DB_POOL_MIN_SIZE", "0")),
+            "MAX_SIZE": int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+            "IDLE_TIMEOUT": int(os.getenv("DB_POOL_IDLE_TIMEOUT", "300")),
+            "TIMEOUT": int(os.getenv("DB_POOL_TIMEOUT", "10")),
+            "PRE_PING": os.getenv("DB_POOL_PRE_PING", "True") == "True",
+            "PING_INTERVAL": int(os.getenv("DB_POOL_PING_INTERVAL", "1")),
+        },
+    }
+}
+
+# default 的只读副本：逗号分隔的 "主机[:端口][*权重]"（权重默认 1），依次定义为 replica1、replica2……，
+# 其余连接参数与连接池同 default；读请求按权重选择副本，为空时读写全部走 default
+DATABASE_REPLICAS = {}
+for _i, _spec in enumerate(filter(None, os.getenv("DB_REPLICAS", "").split(",")), 1):
+    _address, _, _weight = _spec.strip().partition("*")
+    _host, _, _port = _address.partition(":")
+    DATABASES[f"replica{_i}"] = {
+        **DATABASES["default"],
+        "HOST": _host,
+        "PORT": _port or DATABASES["default"]["PORT"],
+        # 测试时副本指向测试主库
+        "TEST": {"MIRROR": "default"},
     }
+    DATABASE_REPLICAS[f"replica{_i}"] = int(_weight or "1")
+
+# 账户数据分片：逗号分隔的 "别名=主机[:端口][/库名]"，其余连接参数同 default；default 本身始终是一个分片，
+# Object.shard 指定其账户所在分片，rebalance_shards 命令在分片间迁移
+DATABASE_SHARDS = []
+for _spec in filter(None, os.getenv("DB_SHARDS", "").split(",")):
+    _alias, _, _address = _spec.strip().partition("=")
+    _address, _, _name = _address.partition("/")
+    _host, _, _port = _address.partition(":")
+    DATABASES[_alias] = {
+        **DATABASES["default"],
+        "NAME": _name or DATABASES["default"]["NAME"],
+        "HOST": _host,
+        "PORT": _port or DATABASES["default"]["PORT"],
+    }
+    DATABASE_SHARDS.append(_alias)
+
+# 分片路由在前：账户数据按 Object 路由到分片，其余读写再由副本路由处理
+DATABASE_ROUTERS = ["account.sharding.ShardRouter", "account.routers.ReplicaRouter"]
+
+# 写入后该客户端的读请求继续走主库的时长（秒），应大于副本同步延迟；缓存条目失效后同样在该时长内从主库重建
+DB_PRIMARY_PIN_SECONDS = int(os.getenv("DB_PRIMARY_PIN_SECONDS", "5"))
+
+# 缓存配置：多 worker 部署必须使用 Redis/Memcached 等共享缓存，保证缓存代数在各 worker 与管理命令间一致。
+# 通过 CACHE_BACKEND / CACHE_LOCATION 配置，默认 DEBUG 下为进程内缓存，生产（DEBUG=False）为 Redis
+if DEBUG:
+    _CACHE_DEFAULTS = ("django.core.cache.backends.locmem.LocMemCache", "crm_project")
+else:
+    _CACHE_DEFAULTS = ("django.core.cache.backends.redis.RedisCache", "redis://127.0.0.1:6379/1")
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("CACHE_BACKEND", _CACHE_DEFAULTS[0]),
+        "LOCATION": os.getenv("CACHE_LOCATION", _CACHE_DEFAULTS[1]),
+    }
+}
+
+# 服务进程数（gunicorn/uvicorn 同名环境变量）与是否以 ASGI 服务器运行（SERVER=asgi，config/asgi.py 中默认设置）；
+# 多 worker 或 ASGI 下使用进程内缓存时系统检查报 account.E001，服务拒绝启动
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+ASGI_SERVER = os.getenv("SERVER") == "asgi"
+
+# 元数据缓存：进程内 LRU 条目数上限与共享缓存过期时间（秒）
+METADATA_CACHE_SIZE = int(os.getenv("METADATA_CACHE_SIZE", "512"))
+METADATA_CACHE_TIMEOUT = int(os.getenv("METADATA_CACHE_TIMEOUT", "3600"))
+
+# 账户列表响应与搜索总数缓存：进程内条目数上限、过期时间（秒，0 为关闭）、并发未命中时等待其他 worker 生成的最长时间（秒）
+ACCOUNT_LIST_CACHE_SIZE = int(os.getenv("ACCOUNT_LIST_CACHE_SIZE", "256"))
+ACCOUNT_LIST_CACHE_TIMEOUT = int(os.getenv("ACCOUNT_LIST_CACHE_TIMEOUT", "300"))
+ACCOUNT_LIST_CACHE_LOCK_TIMEOUT = int(os.getenv("ACCOUNT_LIST_CACHE_LOCK_TIMEOUT", "5"))
+
+# 带搜索条件的列表总数：最多精确统计到该行数，超过时返回估算值（count_mode=approximate，0 为始终精确统计）
+ACCOUNT_COUNT_APPROX_THRESHOLD = int(os.getenv("ACCOUNT_COUNT_APPROX_THRESHOLD", "100000"))
+
+# 批量创建账户：每批 bulk_create 的记录数上限与单次请求的记录数上限
+BULK_CREATE_BATCH_SIZE = int(os.getenv("BULK_CREATE_BATCH_SIZE", "500"))
+BULK_CREATE_MAX_ITEMS = int(os.getenv("BULK_CREATE_MAX_ITEMS", "10000"))
+
+# 批量局部更新（合并补丁）单次请求的记录数上限
+BULK_UPDATE_MAX_ITEMS = int(os.getenv("BULK_UPDATE_MAX_ITEMS", "1000"))
+
+# 批量软删除/恢复每块更新的记录数；软删除账户保留天数，超期由 purge_deleted_accounts 物理删除
+BULK_DELETE_CHUNK_SIZE = int(os.getenv("BULK_DELETE_CHUNK_SIZE", "500"))
+ACCOUNT_PURGE_RETENTION_DAYS = int(os.getenv("ACCOUNT_PURGE_RETENTION_DAYS", "30"))
+
+# 导出账户时每次查询的记录数
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "2000"))
+
+# 请求计时：是否启用计时中间件、是否输出 Server-Timing 响应头、耗时不低于该值（毫秒）的请求才记录日志
+REQUEST_TIMING_ENABLED = os.getenv("REQUEST_TIMING_ENABLED", "False") == "True"
+REQUEST_TIMING_HEADER = os.getenv("REQUEST_TIMING_HEADER", "True") == "True"
+REQUEST_TIMING_LOG_MIN_MS = int(os.getenv("REQUEST_TIMING_LOG_MIN_MS", "0"))
+
+# 指标：是否启用指标中间件；多 worker 部署时各进程将指标写入 METRICS_DIR（为空则只输出当前进程），写入间隔（秒）
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True") == "True"
+METRICS_DIR = os.getenv("METRICS_DIR", "")
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "1"))
+# 超过该时长（秒）未更新的 worker 指标文件不计入汇总
+METRICS_STALE_SECONDS = int(os.getenv("METRICS_STALE_SECONDS", "300"))
+# /metrics 与 /api/cache-stats/ 的访问令牌（请求头 Authorization: Bearer <token>），为空时只有 staff 用户可访问
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# 性能分析：staff 用户 ?profile=1 返回 cProfile 摘要（默认仅 DEBUG 下启用）及摘要行数；
+# 生产环境抽样：每 N 个匹配路由的请求采样 1 个（0 为关闭）、采样间隔（毫秒）、折叠栈输出目录
+PROFILE_QUERY_ENABLED = os.getenv("PROFILE_QUERY_ENABLED", str(DEBUG)) == "True"
+PROFILE_TOP_N = int(os.getenv("PROFILE_TOP_N", "50"))
+PROFILE_SAMPLE_RATE = int(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_SAMPLE_ROUTES = os.getenv("PROFILE_SAMPLE_ROUTES", r"^/api/main/")
+PROFILE_SAMPLE_INTERVAL_MS = int(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", str(BASE_DIR / "profiles"))
+
+# 慢查询记录：耗时不低于该值（毫秒）的 SQL 写入 SLOW_QUERY_DIR（默认 -1 关闭），是否附带执行计划；
+# 是否记录参数（默认脱敏为类型与长度，SLOW_QUERY_PARAM_VALUES 开启时记录原值，可能包含客户姓名、电话等，仅用于排查），
+# 单个文件大小上限（字节，超过后轮转，0 为不限），同一指纹的去重窗口（秒，0 为不去重）
+SLOW_QUERY_MS = int(os.getenv("SLOW_QUERY_MS", "-1"))
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "False") == "True"
+SLOW_QUERY_PARAMS = os.getenv("SLOW_QUERY_PARAMS", "False") == "True"
+SLOW_QUERY_PARAM_VALUES = os.getenv("SLOW_QUERY_PARAM_VALUES", "False") == "True"
+SLOW_QUERY_MAX_BYTES = int(os.getenv("SLOW_QUERY_MAX_BYTES", str(10 * 1024 * 1024)))
+SLOW_QUERY_DEDUP_SECONDS = int(os.getenv("SLOW_QUERY_DEDUP_SECONDS", "60"))
+SLOW_QUERY_DIR = os.getenv("SLOW_QUERY_DIR", str(BASE_DIR / "logs" / "slow_queries"))
+
+# 日志：请求计时以单行 JSON 输出到控制台
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "account.timing": {
+            "handlers": ["console"],
+            "level": os.getenv("REQUEST_TIMING_LOG_LEVEL", "INFO"),
+            "propagate": False,
+        },
+    },
 }
 
 # 密码验证
@@ -2,9 +2,11 @@ from django.contrib import admin
 from django.urls import path, include
 from django.views.generic import TemplateView
 from django.urls import re_path
+from account.views import metrics_view
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/", include("account.urls")),
+    path("metrics", metrics_view, name="metrics"),
     re_path(r"^.*$", TemplateView.as_view(template_name="index.html")),
 ]
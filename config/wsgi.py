@@ -1,6 +1,10 @@
 import os
 from django.core.wsgi import get_wsgi_application
 
+from account.checks import raise_for_process_cache
+
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
 
 application = get_wsgi_application()
+
+raise_for_process_cache()